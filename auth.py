@@ -1,11 +1,28 @@
+import copy
+import os
+import threading
+
 import yaml
 import streamlit_authenticator as stauth
 
+# Parsed config.yaml per path, reused until the file's mtime or size changes (e.g. after a registration)
+_configs = {}
+_configs_lock = threading.Lock()
+
 def load_auth_config(config_path="config.yaml"):
-    """Loads authentication configuration from a YAML file."""
-    with open(config_path) as file:
-        config = yaml.safe_load(file)
-    return config
+    """Loads authentication configuration from a YAML file, parsing it again only when the file changes."""
+    stat = os.stat(config_path)
+    version = (stat.st_mtime_ns, stat.st_size)
+    with _configs_lock:
+        cached = _configs.get(config_path)
+    if cached is None or cached[0] != version:
+        with open(config_path) as file:
+            config = yaml.safe_load(file)
+        cached = (version, config)
+        with _configs_lock:
+            _configs[config_path] = cached
+    # The authenticator writes into the credentials it is given, so each caller gets its own copy
+    return copy.deepcopy(cached[1])
 
 def get_authenticator(config):
     """Creates and returns an authentication object using the provided config."""
@@ -15,4 +32,4 @@ def get_authenticator(config):
         config['cookie']['key'],
         config['cookie']['expiry_days']
     )
-    return authenticator
\ No newline at end of file
+    return authenticator
@@ -0,0 +1,324 @@
+"""Detection benchmark on synthetic data: python benchmark.py --kind tabular descriptive --rows 10000 1000000"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from metrics import METRICS, StageMetrics, stage, timed_chunks
+from synthetic import GENERATORS, write_dataset
+
+DEFAULT_ROWS = [10_000, 100_000, 1_000_000]
+DEFAULT_DATA_DIR = "tmp/benchmark_data"
+DEFAULT_RESULTS = "benchmark_results.jsonl"
+DEFAULT_CHUNKSIZE = 50_000
+# Entities of at most this many input rows are kept for the indexing, search and export stages
+DEFAULT_MAX_INDEX_ROWS = 1_000_000
+SEARCH_QUERIES = 50
+STARTUP_REPEATS = 5
+# What main.py imported before rendering anything, versus what the login page needs now
+EAGER_IMPORTS = ["yaml", "bcrypt", "numpy", "pandas", "streamlit", "auth", "spacy", "nlp_models", "detection",
+                 "streaming", "result_cache", "jobs", "upload_store", "ingest", "ner_memo", "indexing",
+                 "entity_store", "redaction", "export", "plotly.express", "wordcloud", "pyzipper", "dashboard",
+                 "metrics"]
+LOGIN_IMPORTS = ["streamlit", "auth"]
+# Runs in a fresh interpreter: imports the given modules, then parses config.yaml cold and cached
+STARTUP_PROBE = """
+import importlib, json, sys, time
+missing = []
+start = time.perf_counter()
+for name in sys.argv[1:]:
+    try:
+        importlib.import_module(name)
+    except ImportError:
+        missing.append(name)
+result = {"imports": time.perf_counter() - start, "missing": missing}
+if "auth" not in missing:
+    from auth import load_auth_config
+    for key in ("config_cold", "config_cached"):
+        start = time.perf_counter()
+        load_auth_config()
+        result[key] = time.perf_counter() - start
+print(json.dumps(result))
+"""
+
+
+class _LocalUpload:
+    # The slice of Streamlit's UploadedFile that ingest_upload reads
+    def __init__(self, path):
+        self.name = os.path.basename(path)
+        self._file = open(path, "rb")
+
+    def read(self, size=-1):
+        return self._file.read(size)
+
+    def seek(self, offset):
+        return self._file.seek(offset)
+
+    def close(self):
+        self._file.close()
+
+
+def dataset_path(data_dir, kind, rows, duplicate_rate, pii_rate, seed):
+    return os.path.join(data_dir, f"{kind}_{rows}_dup{duplicate_rate:g}_pii{pii_rate:g}_seed{seed}.csv")
+
+
+def run_case(case, data_file, options):
+    """Runs every pipeline stage over data_file and returns (stage summary, entity counts, total seconds).
+
+    case holds everything that affects the measurement and is what results are compared by.
+    """
+    from detection import entity_risk_scores
+    from entity_store import EntityStore
+    from export import build_encrypted_zip
+    from ingest import ingest_upload
+    from streaming import detect_chunk
+    from upload_store import UploadStore
+
+    # Library stages (ingest, read_csv, detection, zip_export, ...) record into METRICS themselves
+    METRICS.max_samples = None
+    METRICS.reset()
+    engine = {"tabular": "Tabular Data", "descriptive": "Descriptive Data"}[case["kind"]]
+    work_dir = tempfile.mkdtemp(prefix="benchmark_", dir=options["work_dir"])
+    start = time.perf_counter()
+    try:
+        upload = _LocalUpload(data_file)
+        try:
+            ingest_upload(upload, work_dir, UploadStore(os.path.join(work_dir, "uploads.db")))
+        finally:
+            upload.close()
+
+        nlp = memo = None
+        if case["kind"] == "descriptive" and case["model"]:
+            from nlp_models import load_model
+            nlp = load_model(case["model"])
+            if case["memo"]:
+                from ner_memo import NER_MEMO
+                memo = NER_MEMO
+
+        pii_parts, hii_parts, kept_rows = [], [], 0
+        for chunk in timed_chunks("read_csv", pd.read_csv(data_file, chunksize=case["chunksize"])):
+            pii, hii, _ = detect_chunk(chunk, engine, nlp, case["batch_size"], memo=memo)
+            # Per-entity scores, as the job worker adds them before writing results
+            with stage("entity_scores", len(chunk)):
+                pii = pii.assign(Risk_Score=entity_risk_scores(pii["Type"]))
+                hii = hii.assign(Risk_Score=entity_risk_scores(hii["Type"]))
+            if kept_rows < case["max_index_rows"]:
+                pii_parts.append(pii)
+                hii_parts.append(hii)
+                kept_rows += len(chunk)
+
+        pii = pd.concat(pii_parts, ignore_index=True)
+        hii = pd.concat(hii_parts, ignore_index=True)
+        entities = {"pii": len(pii), "hii": len(hii), "kept_rows": kept_rows}
+
+        with stage("keyword_index", kept_rows):
+            store = EntityStore.from_frames(pii, hii)
+            store.pii.keyword_index()
+            store.hii.keyword_index()
+        candidates = pii["Entity"].dropna().astype(str).to_numpy(dtype=object)
+        if len(candidates):
+            # Substrings of real entities, like a user typing part of a name or email
+            rng = np.random.default_rng(case["seed"])
+            for value in candidates[rng.integers(0, len(candidates), SEARCH_QUERIES)]:
+                offset = int(rng.integers(0, max(len(value) - 4, 1)))
+                with stage("keyword_search"):
+                    store.pii.contains(value[offset:offset + 5])
+
+        if options["meili_url"]:
+            from indexing import build_documents, get_client, index_documents
+            documents = build_documents(list(zip(pii["Entity"], pii["Type"])) + list(zip(hii["Entity"], hii["Type"])))
+            with stage("meilisearch_index", len(documents)):
+                index_documents(get_client(options["meili_url"], options["meili_key"]),
+                                f"benchmark_{uuid.uuid4().hex[:8]}", documents)
+
+        buffer = build_encrypted_zip("benchmark", {"pii": pii, "hii": hii}, parquet=case["parquet"])
+        buffer.seek(0, os.SEEK_END)
+        entities["export_bytes"] = buffer.tell()
+        buffer.close()
+        return METRICS.snapshot(), entities, time.perf_counter() - start
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def _probe_startup(modules):
+    output = subprocess.run([sys.executable, "-c", STARTUP_PROBE, *modules], capture_output=True, text=True,
+                            check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def run_startup(repeats=STARTUP_REPEATS):
+    """Times, in fresh interpreters, the imports main.py used to run before any page versus the login page's.
+
+    Returns (stage summary, modules that are not installed here and were skipped).
+    """
+    timings = StageMetrics(max_samples=None)
+    missing = set()
+    for _ in range(repeats):
+        for name, modules in (("eager_imports", EAGER_IMPORTS), ("login_imports", LOGIN_IMPORTS)):
+            probe = _probe_startup(modules)
+            timings.record(name, probe["imports"])
+            missing.update(probe["missing"])
+            if name == "login_imports" and "config_cold" in probe:
+                timings.record("auth_config_parse", probe["config_cold"])
+                timings.record("auth_config_cached", probe["config_cached"])
+    return timings.snapshot(), sorted(missing)
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment():
+    """Describes the machine and library versions a result was measured with."""
+    return {
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+    }
+
+
+def load_results(path):
+    """Reads a results file written by this benchmark, one JSON record per line."""
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def compare(record, baseline):
+    """Prints each stage's rows/sec and p50 change against the newest baseline record for the same case."""
+    previous = [r for r in baseline if r["case"] == record["case"]]
+    if not previous:
+        print("  no baseline for this case")
+        return
+    previous = previous[-1]
+    print(f"  vs {previous['run_id']} ({previous['environment'].get('commit')}):")
+    for name, stats in record["stages"].items():
+        old = previous["stages"].get(name)
+        if not old:
+            continue
+        p50 = f"p50 {old['p50_ms']:.1f} -> {stats['p50_ms']:.1f} ms"
+        if stats["rows_per_sec"] and old["rows_per_sec"]:
+            change = (stats["rows_per_sec"] / old["rows_per_sec"] - 1) * 100
+            print(f"    {name:<17} {change:+7.1f}% rows/s  {p50}")
+        else:
+            print(f"    {name:<17} {'':>14}  {p50}")
+
+
+def print_record(record):
+    case = record["case"]
+    print(f"\n{case['kind']} {case['rows']:,} rows (dup {case['duplicate_rate']:g}, pii {case['pii_rate']:g}"
+          f"{', model ' + case['model'] if case['model'] else ''}): {record['seconds']:.2f}s, "
+          f"{record['rows_per_sec']:,.0f} rows/s, peak RSS {record['peak_rss_mb']:,.0f} MB")
+    print(f"  {'stage':<17} {'calls':>6} {'wall s':>9} {'cpu s':>9} {'rows/s':>12} {'p50 ms':>9} {'p90 ms':>9} "
+          f"{'p99 ms':>9} {'peak MB':>9}")
+    for name, stats in record["stages"].items():
+        rate = f"{stats['rows_per_sec']:,.0f}" if stats["rows_per_sec"] else "-"
+        print(f"  {name:<17} {stats['calls']:>6} {stats['wall_seconds']:>9.3f} {stats['cpu_seconds']:>9.3f} "
+              f"{rate:>12} {stats['p50_ms']:>9.1f} {stats['p90_ms']:>9.1f} {stats['p99_ms']:>9.1f} "
+              f"{stats['peak_rss_mb']:>9.0f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the detection pipeline on synthetic PII/HII data.")
+    parser.add_argument("--kind", nargs="+", choices=list(GENERATORS), default=list(GENERATORS))
+    parser.add_argument("--rows", nargs="+", type=int, default=DEFAULT_ROWS)
+    parser.add_argument("--duplicate-rate", type=float, default=0.2, help="Fraction of rows repeating an earlier row")
+    parser.add_argument("--pii-rate", type=float, default=0.5, help="Fraction of rows carrying personal data")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--model", default=None,
+                        help="spaCy model for the NER stage on descriptive data (trf, lg, sm); patterns only if unset")
+    parser.add_argument("--memo", action="store_true", help="Reuse NER results for repeated texts")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--max-index-rows", type=int, default=DEFAULT_MAX_INDEX_ROWS)
+    parser.add_argument("--parquet", action="store_true", help="Add Parquet entries to the export stage")
+    parser.add_argument("--meili-url", default=None, help="Also time indexing into this Meilisearch server")
+    parser.add_argument("--meili-key", default=None)
+    parser.add_argument("--data-dir", default=DEFAULT_DATA_DIR, help="Generated datasets are kept and reused here")
+    parser.add_argument("--out", default=DEFAULT_RESULTS, help="JSON lines file results are appended to")
+    parser.add_argument("--compare", default=None, help="Earlier results file to compare against")
+    parser.add_argument("--startup", action="store_true",
+                        help="Measure app cold start (imports before the login page) instead of detection")
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.data_dir, exist_ok=True)
+    baseline = load_results(args.compare) if args.compare else None
+    options = {"meili_url": args.meili_url, "meili_key": args.meili_key, "work_dir": args.data_dir}
+    env = environment()
+    run_id = time.strftime("%Y%m%dT%H%M%S")
+
+    if args.startup:
+        stages, missing = run_startup()
+        record = {"run_id": run_id, "timestamp": time.time(), "environment": env,
+                  "case": {"kind": "startup", "repeats": STARTUP_REPEATS}, "missing_modules": missing,
+                  "stages": stages}
+        with open(args.out, "a") as f:
+            f.write(json.dumps(record) + "\n")
+        print(f"Cold start over {STARTUP_REPEATS} fresh interpreters"
+              + (f" (not installed, skipped: {', '.join(missing)})" if missing else "") + ":")
+        for name, stats in stages.items():
+            print(f"  {name:<20} p50 {stats['p50_ms']:>9.1f} ms   max {stats['max_ms']:>9.1f} ms")
+        if baseline is not None:
+            compare(record, baseline)
+        return 0
+
+    for kind in args.kind:
+        for rows in args.rows:
+            case = {
+                "kind": kind, "rows": rows, "duplicate_rate": args.duplicate_rate, "pii_rate": args.pii_rate,
+                "seed": args.seed, "model": args.model if kind == "descriptive" else None,
+                "memo": args.memo, "chunksize": args.chunksize, "batch_size": args.batch_size,
+                "max_index_rows": args.max_index_rows, "parquet": args.parquet,
+            }
+            data_file = dataset_path(args.data_dir, kind, rows, args.duplicate_rate, args.pii_rate, args.seed)
+            generate_seconds = None
+            if not os.path.exists(data_file):
+                start = time.perf_counter()
+                write_dataset(f"{data_file}.tmp", kind, rows, args.duplicate_rate, args.pii_rate, args.seed)
+                os.replace(f"{data_file}.tmp", data_file)
+                generate_seconds = time.perf_counter() - start
+
+            # A fresh process per case, so peak RSS and loaded models do not carry over between cases
+            with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+                stages, entities, seconds = pool.submit(run_case, case, data_file, options).result()
+
+            record = {
+                "run_id": run_id,
+                "timestamp": time.time(),
+                "environment": env,
+                "case": case,
+                "dataset_bytes": os.path.getsize(data_file),
+                "generate_seconds": generate_seconds,
+                "seconds": seconds,
+                "rows_per_sec": rows / seconds if seconds else None,
+                "peak_rss_mb": max((s["peak_rss_mb"] for s in stages.values()), default=0.0),
+                "entities": entities,
+                "stages": stages,
+            }
+            with open(args.out, "a") as f:
+                f.write(json.dumps(record) + "\n")
+            print_record(record)
+            if baseline is not None:
+                compare(record, baseline)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
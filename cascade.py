@@ -0,0 +1,153 @@
+"""Cascade detection check: python cascade.py data.csv --sample 500 reports escalation and recall against full NER"""
+import argparse
+import re
+import sys
+import time
+
+from detection import DEFAULT_BATCH_SIZE, detect_descriptive_spans, detect_ner_spans, merge_row_spans
+from metrics import stage
+from patterns import find_patterns
+from spans import SpanTable
+
+DEFAULT_SCREEN_MODEL = "sm"
+# Screening labels that send a row to the full model; names, places and organisations are where small models miss most
+DEFAULT_ESCALATE_LABELS = ("PERSON", "ORG", "GPE", "LOC", "FAC", "NORP")
+DEFAULT_MIN_ENTITIES = 1
+# Rows with more capitalised words than this outside every screened span count as low confidence
+DEFAULT_MAX_UNCOVERED = 0
+DEFAULT_SAMPLE_ROWS = 500
+
+# Capitalised words that do not start the text or a sentence, i.e. likely names the screen did not tag
+NAME_LIKE = re.compile(r"(?<=[^.!?:\s]\s)[A-Z][a-z]+")
+
+
+class CascadeDetector:
+    """Screens every text with the pattern stage and an optional small model, and runs the full model
+    only on rows the screen flags or is unsure about.
+
+    A row is escalated when the screen finds at least min_entities spans labelled escalate_labels, or
+    when more than max_uncovered capitalised words fall outside every screened span. Other rows keep
+    the screen's spans. stats counts rows seen and rows escalated.
+    """
+
+    def __init__(self, nlp, screen_nlp=None, min_entities=DEFAULT_MIN_ENTITIES, max_uncovered=DEFAULT_MAX_UNCOVERED,
+                 escalate_labels=DEFAULT_ESCALATE_LABELS, memo=None):
+        if min_entities < 1:
+            raise ValueError("min_entities must be at least 1")
+        self.nlp = nlp
+        self.screen_nlp = screen_nlp
+        self.min_entities = min_entities
+        self.max_uncovered = max_uncovered
+        self.escalate_labels = frozenset(escalate_labels)
+        self.memo = memo
+        self.stats = {"rows": 0, "escalated": 0}
+
+    @property
+    def escalated_fraction(self):
+        return self.stats["escalated"] / self.stats["rows"] if self.stats["rows"] else 0.0
+
+    def _ner(self, nlp, texts, batch_size, n_process):
+        run_ner = self.memo.detect_spans if self.memo is not None else detect_ner_spans
+        return run_ner(nlp, texts, batch_size=batch_size, n_process=n_process)
+
+    def needs_full_model(self, text, pattern_spans, screen_spans):
+        """Returns True if a row's screening result should be replaced by the full model's."""
+        flagged = sum(1 for _, _, label in screen_spans if label in self.escalate_labels)
+        if flagged >= self.min_entities:
+            return True
+        covered = pattern_spans + screen_spans
+        uncovered = sum(1 for match in NAME_LIKE.finditer(text)
+                        if not any(s <= match.start() < e for s, e, _ in covered))
+        return uncovered > self.max_uncovered
+
+    def detect_spans(self, texts, batch_size=DEFAULT_BATCH_SIZE, n_process=1, on_batch=None):
+        """Runs the cascade over texts and returns the spans found as a SpanTable, like detect_descriptive_spans."""
+        texts = list(texts)
+        with stage("cascade_screen", len(texts)):
+            found = [find_patterns(text) for text in texts]
+            if self.screen_nlp is not None:
+                ner = self._ner(self.screen_nlp, texts, batch_size, n_process)
+            else:
+                ner = [[] for _ in texts]
+            escalate = [i for i, text in enumerate(texts) if self.needs_full_model(text, found[i], ner[i])]
+
+        with stage("cascade_full", len(escalate)):
+            if escalate:
+                full = self._ner(self.nlp, [texts[i] for i in escalate], batch_size, n_process)
+                for i, ents in zip(escalate, full):
+                    ner[i] = ents
+
+        self.stats["rows"] += len(texts)
+        self.stats["escalated"] += len(escalate)
+        if on_batch:
+            on_batch(len(texts), len(texts))
+        return SpanTable.from_row_spans([merge_row_spans(pattern_spans, ents) for pattern_spans, ents in zip(found, ner)])
+
+
+def span_recall(texts, candidate, baseline):
+    """Returns the share of baseline entities the candidate also found, by (row, text) and by (row, text, label)."""
+    def keys(table, typed):
+        labels = table.label_array() if typed else [None] * len(table)
+        return set(zip(table.rows.tolist(), table.values(texts), labels))
+
+    recall = {}
+    for name, typed in (("recall", False), ("typed_recall", True)):
+        expected = keys(baseline, typed)
+        recall[name] = len(expected & keys(candidate, typed)) / len(expected) if expected else 1.0
+    return recall
+
+
+def evaluate_cascade(texts, detector, batch_size=DEFAULT_BATCH_SIZE):
+    """Runs the cascade and the full model alone over texts and returns escalation, recall and timings."""
+    texts = list(texts)
+    sample_detector = CascadeDetector(detector.nlp, detector.screen_nlp, detector.min_entities,
+                                      detector.max_uncovered, detector.escalate_labels)
+    start = time.perf_counter()
+    candidate = sample_detector.detect_spans(texts, batch_size=batch_size)
+    cascade_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    baseline = detect_descriptive_spans(texts, detector.nlp, batch_size=batch_size)
+    baseline_seconds = time.perf_counter() - start
+    return {
+        "rows": len(texts),
+        "escalated_fraction": sample_detector.escalated_fraction,
+        "baseline_entities": len(baseline),
+        "cascade_entities": len(candidate),
+        **span_recall(texts, candidate, baseline),
+        "cascade_seconds": cascade_seconds,
+        "baseline_seconds": baseline_seconds,
+    }
+
+
+def main(argv=None):
+    import pandas as pd
+
+    from nlp_models import DEFAULT_MODEL, load_model
+
+    parser = argparse.ArgumentParser(description="Compare cascade detection with the full NER model on a sample.")
+    parser.add_argument("path", help="CSV file with a text column")
+    parser.add_argument("--sample", type=int, default=DEFAULT_SAMPLE_ROWS, help="Rows to evaluate")
+    parser.add_argument("--model", default=DEFAULT_MODEL, help="Full model (trf, lg, sm or a name)")
+    parser.add_argument("--screen-model", default=DEFAULT_SCREEN_MODEL,
+                        help="Small screening model, or 'none' for the pattern prefilter only")
+    parser.add_argument("--min-entities", type=int, default=DEFAULT_MIN_ENTITIES)
+    parser.add_argument("--max-uncovered", type=int, default=DEFAULT_MAX_UNCOVERED)
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    texts = pd.read_csv(args.path, usecols=["text"])["text"].dropna().astype(str)
+    texts = texts.sample(min(args.sample, len(texts)), random_state=args.seed).tolist()
+    screen_nlp = None if args.screen_model == "none" else load_model(args.screen_model)
+    detector = CascadeDetector(load_model(args.model), screen_nlp, args.min_entities, args.max_uncovered)
+    result = evaluate_cascade(texts, detector, args.batch_size)
+
+    print(f"{result['rows']:,} rows: {result['escalated_fraction']:.1%} escalated to {args.model}")
+    print(f"  recall vs {args.model} alone: {result['recall']:.1%} ({result['typed_recall']:.1%} with matching labels), "
+          f"{result['cascade_entities']:,} vs {result['baseline_entities']:,} entities")
+    print(f"  time: cascade {result['cascade_seconds']:.2f}s, {args.model} alone {result['baseline_seconds']:.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,139 @@
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from metrics import METRICS
+
+MAX_STAGE_ENTRIES = 64
+# Filtered entity views are full frames, so the cache is bounded by their size as well as their number
+MAX_STAGE_BYTES = 256 * 1024 * 1024
+WORDCLOUD_MAX_WORDS = 200
+
+
+class StageCache:
+    """Bounded LRU of dashboard stage outputs keyed on (stage, inputs), shared by all sessions.
+
+    Stage inputs must identify the data they were computed from, e.g. by the result cache key.
+    Least recently used entries are dropped once there are more than max_entries or their
+    estimated size passes max_bytes.
+    """
+
+    def __init__(self, max_entries=MAX_STAGE_ENTRIES, max_bytes=MAX_STAGE_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._sizes = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def get(self, stage, key, compute):
+        """Returns the cached output of stage for key, calling compute() only when the inputs are new."""
+        entry_key = (stage, key)
+        with self._lock:
+            stats = self._stats.setdefault(stage, {"hits": 0, "misses": 0, "seconds": 0.0})
+            if entry_key in self._entries:
+                self._entries.move_to_end(entry_key)
+                stats["hits"] += 1
+                return self._entries[entry_key]
+
+        start = time.perf_counter()
+        with METRICS.stage(f"dashboard_{stage}"):
+            value = compute()
+        elapsed = time.perf_counter() - start
+
+        size = estimated_bytes(value)
+        with self._lock:
+            self._bytes += size - self._sizes.get(entry_key, 0)
+            self._entries[entry_key] = value
+            self._sizes[entry_key] = size
+            self._entries.move_to_end(entry_key)
+            # The entry just added stays even if it is over max_bytes on its own
+            while len(self._entries) > 1 and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                evicted, _ = self._entries.popitem(last=False)
+                self._bytes -= self._sizes.pop(evicted)
+            stats["misses"] += 1
+            stats["seconds"] += elapsed
+        return value
+
+    def stats(self):
+        """Returns hits, misses and compute seconds per stage."""
+        with self._lock:
+            return {stage: dict(stats) for stage, stats in self._stats.items()}
+
+
+def estimated_bytes(value):
+    """Returns the memory held by the frames, arrays and bytes in value, also inside tuples and lists."""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, (tuple, list)):
+        return sum(estimated_bytes(item) for item in value)
+    return 0
+
+
+def type_counts(frame):
+    """Counts entities per Type, most common first."""
+    if frame.empty:
+        return pd.Series(dtype=np.int64)
+    return frame["Type"].value_counts()
+
+
+def summary_type_counts(risk_summary, group):
+    """Returns a RiskSummary's entity counts per Type for group ("PII" or "HII"), like type_counts."""
+    counts = risk_summary.type_counts.get(group, {})
+    return pd.Series(counts, dtype=np.int64).sort_values(ascending=False, kind="stable")
+
+
+def summary_stats(pii_counts, hii_counts):
+    """Returns total entities and the most common type with its count, from per-type counts."""
+    counts = pii_counts.add(hii_counts, fill_value=0).astype(np.int64).sort_values(ascending=False, kind="stable")
+    if counts.empty:
+        return {"total_entities": 0, "most_common_type": None, "most_common_count": 0}
+    return {"total_entities": int(counts.sum()), "most_common_type": counts.index[0],
+            "most_common_count": int(counts.iloc[0])}
+
+
+def distribution_figure(counts, title="Distribution of Detected PII Types", label="PII Type"):
+    import plotly.express as px
+
+    return px.bar(
+        counts,
+        x=counts.index,
+        y=counts.values,
+        text=counts.values,
+        color=counts.index,
+        labels={'x': label, 'y': 'Count'},
+        title=title,
+        color_discrete_sequence=px.colors.qualitative.Set1
+    )
+
+
+def entity_frequencies(frames, max_words=WORDCLOUD_MAX_WORDS):
+    """Counts displayed entity values across frames and keeps the max_words most frequent."""
+    values = [frame["Entity"].dropna().astype(str) for frame in frames if "Entity" in frame.columns]
+    if not values:
+        return {}
+    counts = pd.concat(values, ignore_index=True).value_counts()
+    counts = counts[counts.index.str.strip() != ""]
+    return counts.head(max_words).to_dict()
+
+
+def wordcloud_image(frequencies):
+    """Renders the word cloud from precomputed frequencies instead of re-tokenizing joined text."""
+    from wordcloud import WordCloud
+
+    wc = WordCloud(width=800, height=400, background_color="white", max_words=WORDCLOUD_MAX_WORDS)
+    return wc.generate_from_frequencies(frequencies).to_array()
+
+
+# Process-wide, like the entity stores: sessions viewing the same results reuse each other's stages
+DASHBOARD_CACHE = StageCache()
@@ -0,0 +1,267 @@
+import numpy as np
+import pandas as pd
+
+from patterns import find_patterns
+from spans import SpanTable
+
+DEFAULT_BATCH_SIZE = 64
+# spaCy's ner component exposes no per-entity confidence, so NER spans score like exact pattern hits
+SPAN_SCORE = 1.0
+
+RISK_SCORES = {
+    "EMAIL": 2,
+    "PHONE": 2,
+    "CREDIT_CARD": 5,
+    "ADDRESS": 3,
+    "ID": 4,
+    "NAME": 1,
+    "BLOOD_TYPE": 1,
+    "WEIGHT": 1,
+    "HEIGHT": 1,
+    "ALLERGIES": 2,
+    "MEDICAL_CONDITIONS": 4,
+    "MEDICATIONS": 3,
+    "DOCTOR": 2,
+    "HOSPITAL": 2,
+    "INSURANCE": 3
+}
+
+# Columns read by the tabular engine for each HII type, in output order
+HII_COLUMNS = {
+    "BLOOD_TYPE": "blood_type",
+    "WEIGHT": "weight_kg",
+    "HEIGHT": "height_cm",
+    "ALLERGIES": "allergies",
+    "MEDICAL_CONDITIONS": "medical_conditions",
+    "MEDICATIONS": "medications",
+    "DOCTOR": "doctor_name",
+    "HOSPITAL": "hospital_name",
+    "INSURANCE": "insurance_provider",
+}
+PII_TYPES = ["ID", "NAME", "EMAIL", "PHONE", "ADDRESS", "CREDIT_CARD"]
+# Source columns each PII type is built from, used to redact the uploaded rows themselves
+PII_COLUMNS = {
+    "ID": ["id"],
+    "NAME": ["fname", "lname"],
+    "EMAIL": ["email"],
+    "PHONE": ["phone"],
+    "ADDRESS": ["address", "city", "state", "zip"],
+    "CREDIT_CARD": ["cc_number"],
+}
+
+
+def infer_engine_from_schema(df):
+    """Picks the engine from the column names, or from the column contents when no name is known."""
+    text_cols = {'text'}
+    tabular_cols = {'fname', 'lname', 'email', 'phone', 'address', 'cc_number'}
+
+    cols = set(df.columns.str.lower())
+
+    if text_cols & cols:
+        return "Descriptive Data"
+    elif tabular_cols & cols:
+        return "Tabular Data"
+    elif len(df):
+        from profiling import profile_frame
+        return profile_frame(df)["engine"]
+    else:
+        return None
+
+
+def classify_entity_type(spacy_label):
+    mapping = {
+        'PERSON': 'Person',
+        'ORG': 'Company',
+        'EMAIL': 'Contact',
+        'PHONE': 'Contact',
+        'GPE': 'Location',
+        'LOC': 'Location',
+        'DATE': 'Time',
+        'TIME': 'Time',
+        'MONEY': 'Financial',
+        'FAC': 'Other',
+        'NORP': 'Other',
+        'PRODUCT': 'Other'
+    }
+    return mapping.get(spacy_label, 'Unknown')
+
+
+def detect_ner(nlp, text):
+    doc = nlp(text)
+    return [(ent.text, ent.label_) for ent in doc.ents]
+
+
+def infer_detection_title(entity_types):
+    entity_types = set(entity_types)
+
+    categories = {
+        "PII": {'EMAIL', 'PHONE', 'CREDIT_CARD', 'ADDRESS', 'ID', 'NAME'},
+        "HII": {'BLOOD_TYPE', 'WEIGHT', 'HEIGHT', 'ALLERGIES', 'MEDICAL_CONDITIONS', 'MEDICATIONS', 'DOCTOR',
+                'HOSPITAL', 'INSURANCE'},
+        "Contact Info": {'EMAIL', 'PHONE'},
+        "Demographics": {'GPE', 'LOC', 'ZIP', 'COUNTRY', 'STATE', 'CITY'},
+        "Identity": {'PERSON'},
+        "Organizations": {'ORG', 'FAC', 'PRODUCT'},
+        "Finance": {'MONEY'},
+    }
+    matched_labels = []
+    for label, ents in categories.items():
+        if any(ent in entity_types for ent in ents):
+            matched_labels.append(label)
+
+    if not matched_labels:
+        return "Uncategorized Entities"
+
+    return " & ".join(sorted(set(matched_labels)))
+
+
+def detect_rule_based(row):
+    pii_data, hii_data = [], []
+    try:
+        pii_data.append((str(row.get('id', '')), 'ID'))
+        pii_data.append((f"{row.get('fname', '')} {row.get('lname', '')}", 'NAME'))
+        pii_data.append((row.get('email', ''), 'EMAIL'))
+        pii_data.append((row.get('phone', ''), 'PHONE'))
+        pii_data.append((
+                        f"{row.get('address', '')}, {row.get('city', '')}, {row.get('state', '')} {row.get('zip', '')}",
+                        'ADDRESS'))
+        pii_data.append((row.get('cc_number', ''), 'CREDIT_CARD'))
+        hii_data.append((row.get('blood_type', ''), 'BLOOD_TYPE'))
+        hii_data.append((row.get('weight_kg', ''), 'WEIGHT'))
+        hii_data.append((row.get('height_cm', ''), 'HEIGHT'))
+        hii_data.append((row.get('allergies', ''), 'ALLERGIES'))
+        hii_data.append((row.get('medical_conditions', ''), 'MEDICAL_CONDITIONS'))
+        hii_data.append((row.get('medications', ''), 'MEDICATIONS'))
+        hii_data.append((row.get('doctor_name', ''), 'DOCTOR'))
+        hii_data.append((row.get('hospital_name', ''), 'HOSPITAL'))
+        hii_data.append((row.get('insurance_provider', ''), 'INSURANCE'))
+    except:
+        pass
+    return pii_data, hii_data
+
+
+def compute_risk_scores(detected_pii, detected_hii):
+    risk_scores = []
+    for i in range(len(detected_pii)):
+        score = 0
+        for ent, etype in detected_pii[i] + detected_hii[i]:
+            score += RISK_SCORES.get(etype.upper(), 1)
+        risk_scores.append(score)
+    return risk_scores
+
+
+def score_entity_lists(entity_lists):
+    """Sums the RISK_SCORES weight of every entity detected in each row."""
+    return [sum(RISK_SCORES.get(etype.upper(), 1) for _, etype in ents) for ents in entity_lists]
+
+
+def flatten_entity_lists(entity_lists):
+    """Flattens per-row (entity, type) lists into an Entity/Type table, dropping empty entities."""
+    return pd.DataFrame([item for ents in entity_lists for item in ents if item[0]], columns=["Entity", "Type"])
+
+
+def entity_risk_scores(types):
+    """Maps a Series of entity types to their RISK_SCORES weight, defaulting to 1."""
+    return types.astype(str).str.upper().map(RISK_SCORES).fillna(1).astype(int)
+
+
+def _raw_column(df, col):
+    if col in df.columns:
+        return df[col].to_numpy(dtype=object)
+    return np.full(len(df), '', dtype=object)
+
+
+def _str_column(df, col):
+    # astype(str) formats values like an f-string does; newer pandas keep NaN, which f-strings print as 'nan'
+    if col in df.columns:
+        return df[col].astype(str).fillna('nan').reset_index(drop=True)
+    return pd.Series('', index=pd.RangeIndex(len(df)), dtype=object)
+
+
+def _flatten_entities(columns, types):
+    # Stack side by side and ravel so entities come out row by row, like the row-based engine
+    values = np.column_stack([np.asarray(col, dtype=object) for col in columns]).ravel()
+    labels = np.tile(np.array(types, dtype=object), len(columns[0]))
+    keep = values.astype(bool)
+    return pd.DataFrame({"Entity": values[keep], "Type": labels[keep]}, dtype=object)
+
+
+def detect_tabular_columns(df):
+    """Runs rule-based detection column-wise and returns the PII/HII entity tables and row risk scores."""
+    n = len(df)
+    if n == 0:
+        empty = pd.DataFrame(columns=["Entity", "Type"])
+        return empty, empty.copy(), np.zeros(0, dtype=np.int64)
+
+    pii_columns = [
+        _str_column(df, 'id'),
+        _str_column(df, 'fname') + ' ' + _str_column(df, 'lname'),
+        _raw_column(df, 'email'),
+        _raw_column(df, 'phone'),
+        _str_column(df, 'address') + ', ' + _str_column(df, 'city') + ', '
+        + _str_column(df, 'state') + ' ' + _str_column(df, 'zip'),
+        _raw_column(df, 'cc_number'),
+    ]
+    hii_columns = [_raw_column(df, col) for col in HII_COLUMNS.values()]
+
+    pii_entities = _flatten_entities(pii_columns, PII_TYPES)
+    hii_entities = _flatten_entities(hii_columns, list(HII_COLUMNS))
+
+    # compute_risk_scores weighs every emitted slot, filled or not, so each row carries the full weight
+    row_weight = sum(RISK_SCORES.get(t, 1) for t in PII_TYPES + list(HII_COLUMNS))
+    risk_scores = np.full(n, row_weight, dtype=np.int64)
+    return pii_entities, hii_entities, risk_scores
+
+
+def detect_ner_spans(nlp, texts, batch_size=DEFAULT_BATCH_SIZE, n_process=1, on_batch=None):
+    """Streams texts through nlp.pipe and returns one (start, end, label) span list per text, in input order."""
+    texts = list(texts)
+    total = len(texts)
+    results = []
+    for doc in nlp.pipe(texts, batch_size=batch_size, n_process=n_process):
+        results.append([(ent.start_char, ent.end_char, ent.label_) for ent in doc.ents])
+        if on_batch and (len(results) % batch_size == 0 or len(results) == total):
+            on_batch(len(results), total)
+    return results
+
+
+def detect_ner_batch(nlp, texts, batch_size=DEFAULT_BATCH_SIZE, n_process=1, on_batch=None):
+    """Streams texts through nlp.pipe and returns one entity list per text, in input order."""
+    texts = list(texts)
+    spans = detect_ner_spans(nlp, texts, batch_size=batch_size, n_process=n_process, on_batch=on_batch)
+    return [[(text[start:end], label) for start, end, label in ents] for text, ents in zip(texts, spans)]
+
+
+def detect_descriptive_spans(texts, nlp=None, batch_size=DEFAULT_BATCH_SIZE, n_process=1, on_batch=None,
+                             memo=None):
+    """Runs the pattern stage, then NER when nlp is given, and returns the spans found as a SpanTable.
+
+    Passing a NERMemo skips inference for texts it has already seen.
+    """
+    texts = list(texts)
+    found = [find_patterns(text) for text in texts]
+    if nlp is None:
+        if on_batch:
+            on_batch(len(texts), len(texts))
+        return SpanTable.from_row_spans([[(s, e, label, SPAN_SCORE) for s, e, label in spans] for spans in found])
+
+    run_ner = memo.detect_spans if memo is not None else detect_ner_spans
+    ner = run_ner(nlp, texts, batch_size=batch_size, n_process=n_process, on_batch=on_batch)
+    return SpanTable.from_row_spans([merge_row_spans(pattern_spans, ents) for pattern_spans, ents in zip(found, ner)])
+
+
+def merge_row_spans(pattern_spans, ner_spans):
+    """Combines one row's pattern and NER spans into scored spans, dropping NER spans that overlap a pattern hit."""
+    # NER tends to tag pattern hits as CARDINAL/ORG as well, keep the pattern label for those
+    row = [(s, e, label, SPAN_SCORE) for s, e, label in pattern_spans]
+    row += [(s, e, label, SPAN_SCORE) for s, e, label in ner_spans
+            if not any(s < pe and ps < e for ps, pe, _ in pattern_spans)]
+    return row
+
+
+def detect_descriptive(texts, nlp=None, batch_size=DEFAULT_BATCH_SIZE, n_process=1, on_batch=None, memo=None):
+    """Runs the pattern stage, then NER when nlp is given, and returns one entity list per text."""
+    texts = list(texts)
+    spans = detect_descriptive_spans(texts, nlp, batch_size=batch_size, n_process=n_process, on_batch=on_batch,
+                                     memo=memo)
+    return spans.entity_lists(texts)
@@ -0,0 +1,153 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from detection import RISK_SCORES
+from keyword_index import TrigramIndex
+from redaction import redact_where
+
+MAX_STORES = 8
+
+try:
+    import pyarrow  # noqa: F401
+    ENTITY_DTYPE = "string[pyarrow]"
+except ImportError:
+    ENTITY_DTYPE = object
+
+
+def _to_strings(values):
+    # Tabular entities can be floats/ints or NaN, store them all as text
+    return ["" if v is None or (isinstance(v, float) and np.isnan(v)) else str(v) for v in values]
+
+
+class EntityTable:
+    """Columnar entity table: Entity strings, categorical Type codes and precomputed int8 risk."""
+
+    def __init__(self, entities, type_codes, type_names):
+        self.entities = entities
+        self.type_codes = type_codes
+        self.type_names = type_names
+        weights = np.array([RISK_SCORES.get(str(t).upper(), 1) for t in type_names], dtype=np.int8)
+        self.risk = weights[type_codes]
+        # Empty values are never redacted, mirroring the row-by-row mask_entity it replaces
+        self.nonempty = (pd.Series(entities).str.len() > 0).to_numpy(dtype=bool)
+        self._index = None
+        self._index_lock = threading.Lock()
+
+    @classmethod
+    def from_frame(cls, frame):
+        """Builds a table from an Entity/Type DataFrame."""
+        if frame is None or frame.empty:
+            return cls.empty()
+        codes, names = pd.factorize(frame["Type"].astype(str))
+        entities = pd.array(_to_strings(frame["Entity"]), dtype=ENTITY_DTYPE)
+        return cls(entities, codes.astype(np.int16), np.asarray(names, dtype=object))
+
+    @classmethod
+    def empty(cls):
+        return cls(pd.array([], dtype=ENTITY_DTYPE), np.zeros(0, dtype=np.int16), np.array([], dtype=object))
+
+    def __len__(self):
+        return len(self.type_codes)
+
+    def all_rows(self):
+        return np.ones(len(self), dtype=bool)
+
+    def types(self, mask=None):
+        """Returns the entity types present (under mask), in first-seen order."""
+        codes = self.type_codes if mask is None else self.type_codes[mask]
+        present = np.zeros(len(self.type_names), dtype=bool)
+        present[codes] = True
+        return [t for t, p in zip(self.type_names, present) if p]
+
+    def type_mask(self, selected_types):
+        """Returns a boolean row mask for entities whose Type is in selected_types."""
+        return np.isin(self.type_names, list(selected_types))[self.type_codes]
+
+    def redacted_mask(self, redact_types):
+        """Returns a boolean row mask for non-empty entities of the redacted types."""
+        if not redact_types:
+            return np.zeros(len(self), dtype=bool)
+        return self.type_mask(redact_types) & self.nonempty
+
+    def keyword_index(self):
+        """Returns the trigram index over Entity, building it on first use."""
+        if self._index is None:
+            with self._index_lock:
+                if self._index is None:
+                    self._index = TrigramIndex(self.entities)
+        return self._index
+
+    def contains(self, keyword, redact_types=(), mode="redact", salt=None):
+        """Returns a boolean row mask for entities whose displayed value contains keyword, ignoring case."""
+        matches = self.keyword_index().mask(keyword)
+        redacted = self.redacted_mask(redact_types)
+        if redacted.any():
+            # Redacted rows are searched by their masked form so the filter cannot reveal them
+            masked = redact_where(self.entities[redacted], np.ones(redacted.sum(), dtype=bool), mode,
+                                  salt)
+            matches[redacted] = masked.str.lower().str.contains(keyword.lower(), regex=False).to_numpy(dtype=bool)
+        return matches
+
+    def matches_values(self, values, redact_types=()):
+        """Returns a boolean row mask for unredacted entities equal to any of values."""
+        return self.keyword_index().values_mask(values) & ~self.redacted_mask(redact_types)
+
+    def frame(self, mask=None, redact_types=(), mode="redact", salt=None):
+        """Materialises the rows under mask as an Entity/Type/Risk_Score DataFrame for display."""
+        if mask is None:
+            mask = self.all_rows()
+        redacted = self.redacted_mask(redact_types)[mask]
+        return pd.DataFrame({
+            "Entity": redact_where(self.entities[mask], redacted, mode, salt).array,
+            "Type": self.type_names[self.type_codes[mask]],
+            "Risk_Score": self.risk[mask],
+        })
+
+    def memory_bytes(self):
+        entity_bytes = getattr(self.entities, "nbytes", 0)
+        return entity_bytes + self.type_codes.nbytes + self.risk.nbytes + self.nonempty.nbytes + self.type_names.nbytes
+
+
+class EntityStore:
+    """PII and HII entity tables from one detection run."""
+
+    def __init__(self, pii, hii):
+        self.pii = pii
+        self.hii = hii
+
+    @classmethod
+    def from_frames(cls, pii_frame, hii_frame):
+        return cls(EntityTable.from_frame(pii_frame), EntityTable.from_frame(hii_frame))
+
+    def __len__(self):
+        return len(self.pii) + len(self.hii)
+
+    def bytes_per_entity(self):
+        total = len(self)
+        return (self.pii.memory_bytes() + self.hii.memory_bytes()) / total if total else 0.0
+
+
+# Stores are immutable once built, so sessions viewing the same results share one instance
+_stores = OrderedDict()
+_stores_lock = threading.Lock()
+
+
+def publish_store(key, store):
+    """Registers a store under key, evicting the least recently used beyond MAX_STORES."""
+    with _stores_lock:
+        _stores[key] = store
+        _stores.move_to_end(key)
+        while len(_stores) > MAX_STORES:
+            _stores.popitem(last=False)
+
+
+def get_store(key):
+    """Returns the shared store for key, or None if it was never published or has been evicted."""
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is not None:
+            _stores.move_to_end(key)
+        return store
@@ -0,0 +1,81 @@
+import gzip
+import io
+import os
+import shutil
+import tempfile
+
+from metrics import stage
+
+EXPORT_OPTIONS = ["CSV", "Parquet", "Redacted source CSV"]
+EXPORT_CHUNK_ROWS = 50_000
+# Archives up to this size stay in memory; larger ones roll over to an anonymous temp file
+SPOOL_MAX_BYTES = 64 * 1024 * 1024
+# Files on disk are offered for download gzipped, and only up to this compressed size
+DOWNLOAD_MAX_MB = 512
+
+
+def _frame_chunks(frame, chunk_rows=EXPORT_CHUNK_ROWS):
+    for start in range(0, len(frame), chunk_rows):
+        yield frame.iloc[start:start + chunk_rows]
+
+
+def write_csv_entry(zipf, arcname, chunks):
+    """Streams DataFrame chunks into one CSV entry of an open zip archive."""
+    with zipf.open(arcname, "w") as raw:
+        out = io.TextIOWrapper(raw, encoding="utf-8", newline="")
+        first = True
+        for chunk in chunks:
+            chunk.to_csv(out, header=first, index=False)
+            first = False
+        out.flush()
+        out.detach()
+
+
+def write_parquet_entry(zipf, arcname, frame):
+    """Writes frame as one Parquet entry of an open zip archive."""
+    import pyarrow.parquet as pq
+
+    from streaming import parquet_table
+
+    with zipf.open(arcname, "w") as raw:
+        pq.write_table(parquet_table(frame), raw)
+
+
+def build_encrypted_zip(password, frames, csv=True, parquet=False, redacted_source=None):
+    """Builds an AES-encrypted zip of the given frames into a spooled buffer and returns it rewound.
+
+    frames maps entry names to DataFrames; redacted_source is an optional (arcname, path) of a redacted
+    source CSV, copied into the archive as it is.
+    """
+    import pyzipper
+
+    buffer = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+    with stage("zip_export", sum(len(frame) for frame in frames.values())):
+        with pyzipper.AESZipFile(buffer, "w", compression=pyzipper.ZIP_DEFLATED,
+                                 encryption=pyzipper.WZ_AES) as zipf:
+            zipf.setpassword(password.encode())
+            for name, frame in frames.items():
+                if frame.empty:
+                    continue
+                if csv:
+                    write_csv_entry(zipf, f"{name}.csv", _frame_chunks(frame))
+                if parquet:
+                    write_parquet_entry(zipf, f"{name}.parquet", frame)
+            if redacted_source is not None:
+                arcname, path = redacted_source
+                zipf.write(path, arcname)
+    buffer.seek(0)
+    return buffer
+
+
+def compressed_download(path, max_mb=DOWNLOAD_MAX_MB):
+    """Gzips a file on disk once, next to it, and returns the .gz path, or None when it is over max_mb."""
+    gz_path = f"{path}.gz"
+    if not os.path.exists(gz_path) or os.path.getmtime(gz_path) < os.path.getmtime(path):
+        tmp_path = f"{gz_path}.{os.getpid()}.tmp"
+        with stage("compress_download"), open(path, "rb") as src, gzip.open(tmp_path, "wb", compresslevel=6) as dst:
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+        os.replace(tmp_path, gz_path)
+    if os.path.getsize(gz_path) > max_mb * 1024 * 1024:
+        return None
+    return gz_path
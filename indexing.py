@@ -0,0 +1,223 @@
+import os
+import threading
+import time
+
+import meilisearch
+import pandas as pd
+import requests
+from dotenv import load_dotenv
+from meilisearch._httprequests import HttpRequests
+from meilisearch.models.task import TaskInfo
+
+from metrics import stage
+
+# Renamed from MeiliSearchApiError in later client releases
+MeilisearchApiError = getattr(meilisearch.errors, "MeilisearchApiError", None) or meilisearch.errors.MeiliSearchApiError
+
+load_dotenv()
+
+DEFAULT_INDEX_BATCH_SIZE = 5000
+DEFAULT_MAX_RETRIES = 3
+TASK_POLL_MS = 200
+TASK_TIMEOUT_MS = 5 * 60 * 1000
+DEFAULT_SEARCH_LIMIT = 1000
+
+
+def clean_string(value):
+    if value is None or (isinstance(value, float) and pd.isna(value)):
+        return ""
+    return str(value).strip()
+
+
+def build_documents(entities):
+    """Turns (entity, type) pairs into Meilisearch documents, skipping empty values."""
+    return [
+        {"id": i, "Entity": clean_string(entity), "Type": clean_string(entity_type)}
+        for i, (entity, entity_type) in enumerate(entities)
+        if entity and entity_type
+    ]
+
+
+def _task_field(task, name):
+    # wait_for_task returns a dict in the pinned client and a Task model in later releases
+    return task.get(name) if isinstance(task, dict) else getattr(task, name, None)
+
+
+def _with_retries(fn, max_retries, backoff=0.5):
+    for attempt in range(max_retries + 1):
+        try:
+            return fn()
+        except Exception:
+            if attempt == max_retries:
+                raise
+            time.sleep(backoff * 2 ** attempt)
+
+
+def index_documents(client, index_name, documents, batch_size=DEFAULT_INDEX_BATCH_SIZE,
+                    max_retries=DEFAULT_MAX_RETRIES, on_progress=None):
+    """Creates index_name, configures it once and adds documents in batches, waiting on each task.
+
+    Batches whose task fails are resubmitted up to max_retries times. Returns a stats dict.
+    """
+    start = time.perf_counter()
+    _with_retries(lambda: client.wait_for_task(
+        client.create_index(index_name, {"primaryKey": "id"}).task_uid, timeout_in_ms=TASK_TIMEOUT_MS), max_retries)
+    index = client.index(index_name)
+    _with_retries(lambda: index.update_filterable_attributes(["Type"]), max_retries)
+    _with_retries(lambda: index.update_searchable_attributes(["Entity", "Type"]), max_retries)
+
+    batches = [documents[i:i + batch_size] for i in range(0, len(documents), batch_size)]
+    # Enqueue everything first so Meilisearch works through the queue while we poll
+    pending = {}
+    for n, batch in enumerate(batches):
+        task = _with_retries(lambda: index.add_documents(batch, primary_key="id"), max_retries)
+        pending[task.task_uid] = (n, 0)
+
+    indexed = 0
+    while pending:
+        task_uid, (n, attempts) = next(iter(pending.items()))
+        del pending[task_uid]
+        task = _with_retries(lambda: client.wait_for_task(task_uid, timeout_in_ms=TASK_TIMEOUT_MS,
+                                                          interval_in_ms=TASK_POLL_MS), max_retries)
+        if _task_field(task, "status") != "succeeded":
+            if attempts >= max_retries:
+                raise RuntimeError(f"Indexing batch {n} failed: {_task_field(task, 'error')}")
+            retry = _with_retries(lambda: index.add_documents(batches[n], primary_key="id"), max_retries)
+            pending[retry.task_uid] = (n, attempts + 1)
+            continue
+        indexed += len(batches[n])
+        if on_progress:
+            on_progress(indexed, len(documents))
+
+    elapsed = time.perf_counter() - start
+    return {
+        "index": index_name,
+        "documents": indexed,
+        "batches": len(batches),
+        "seconds": elapsed,
+        "docs_per_sec": indexed / elapsed if elapsed else 0.0,
+    }
+
+
+def search_entities(client, index_name, query, limit=DEFAULT_SEARCH_LIMIT):
+    """Runs a typo-tolerant Meilisearch query and returns the distinct Entity values it hit."""
+    result = client.index(index_name).search(query, {"limit": limit, "attributesToRetrieve": ["Entity"]})
+    return {hit["Entity"] for hit in result["hits"]}
+
+
+class IndexingJob:
+    """Runs index_documents on a background thread so the dashboard is not blocked."""
+
+    def __init__(self, client, index_name, documents, batch_size=DEFAULT_INDEX_BATCH_SIZE,
+                 max_retries=DEFAULT_MAX_RETRIES):
+        self.index_name = index_name
+        self.total = len(documents)
+        self.indexed = 0
+        self.stats = None
+        self.error = None
+        self._thread = threading.Thread(
+            target=self._run, args=(client, documents, batch_size, max_retries), daemon=True
+        )
+        self._thread.start()
+
+    def _run(self, client, documents, batch_size, max_retries):
+        try:
+            with stage("meilisearch_index", len(documents)):
+                self.stats = index_documents(client, self.index_name, documents, batch_size, max_retries,
+                                             on_progress=self._on_progress)
+        except Exception as e:
+            self.error = e
+
+    def _on_progress(self, indexed, total):
+        self.indexed = indexed
+
+    @property
+    def done(self):
+        return not self._thread.is_alive()
+
+
+class _SessionHttpRequests(HttpRequests):
+    """HttpRequests that sends through the owning client's keep-alive session and counts calls."""
+
+    def __init__(self, config, owner):
+        super().__init__(config)
+        self._owner = owner
+
+    def send_request(self, http_method, *args, **kwargs):
+        self._owner._count_call()
+        # http_method is requests.get/post/...; use the session method of the same name instead
+        return super().send_request(getattr(self._owner.session, http_method.__name__), *args, **kwargs)
+
+
+class PooledClient(meilisearch.Client):
+    """meilisearch.Client whose client, index and task requests share one requests.Session.
+
+    http_calls counts every request this process sent; thread_http_calls only those sent from
+    the calling thread, e.g. one Streamlit session's script run.
+    """
+
+    def __init__(self, url, api_key=None, timeout=None):
+        super().__init__(url, api_key, timeout=timeout)
+        self.session = requests.Session()
+        self.http_calls = 0
+        self._thread_calls = threading.local()
+        self._verified = {}
+        self._lock = threading.Lock()
+        self._calls_lock = threading.Lock()
+        self._route(self)
+
+    def _count_call(self):
+        with self._calls_lock:
+            self.http_calls += 1
+        self._thread_calls.count = getattr(self._thread_calls, "count", 0) + 1
+
+    @property
+    def thread_http_calls(self):
+        return getattr(self._thread_calls, "count", 0)
+
+    def _route(self, obj):
+        obj.http = _SessionHttpRequests(self.config, self)
+        obj.task_handler.http = _SessionHttpRequests(self.config, self)
+        return obj
+
+    def index(self, uid):
+        return self._route(super().index(uid))
+
+    def get_index(self, uid):
+        return self.index(uid).fetch_info()
+
+    def create_index(self, uid, options=None):
+        # Index.create builds its own HttpRequests, post through the shared session instead
+        return TaskInfo(**self.http.post(self.config.paths.index, {**(options or {}), "uid": uid}))
+
+    def ensure_index(self, uid, primary_key="id"):
+        """Returns a handle to uid, checking (and creating) it on the server only on first use."""
+        index = self._verified.get(uid)
+        if index is not None:
+            return index
+        with self._lock:
+            if uid not in self._verified:
+                try:
+                    self.get_index(uid)
+                except MeilisearchApiError:
+                    self.wait_for_task(self.create_index(uid, {"primaryKey": primary_key}).task_uid)
+                self._verified[uid] = self.index(uid)
+        return self._verified[uid]
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(url=None, api_key=None):
+    """Returns the process-wide PooledClient for url, defaulting to CLIENT/SSD_KEY from .env."""
+    url = url or os.getenv("CLIENT")
+    api_key = api_key or os.getenv("SSD_KEY")
+    key = (url, api_key)
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                client = _clients[key] = PooledClient(url, api_key)
+    return client
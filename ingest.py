@@ -0,0 +1,94 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+
+from metrics import stage
+
+try:
+    import pyarrow  # noqa: F401
+    CSV_ENGINE = "pyarrow"
+except ImportError:
+    CSV_ENGINE = "c"
+
+INGEST_CHUNK_BYTES = 8 * 1024 * 1024
+MAX_FRAMES = 4
+
+
+def _chunks(uploaded_file, chunk_bytes):
+    # getbuffer() exposes the uploaded bytes without copying them; plain file objects are read piecewise
+    if hasattr(uploaded_file, "getbuffer"):
+        view = uploaded_file.getbuffer()
+        for offset in range(0, len(view), chunk_bytes):
+            yield view[offset:offset + chunk_bytes]
+        return
+    uploaded_file.seek(0)
+    while chunk := uploaded_file.read(chunk_bytes):
+        yield chunk
+
+
+def ingest_upload(uploaded_file, upload_dir, store, chunk_bytes=INGEST_CHUNK_BYTES):
+    """Hashes an upload and writes it to upload_dir in fixed-size chunks, unless that content is already there.
+
+    Returns a stats dict with the stored filename, path, content hash, size and ingest MB/s.
+    """
+    start = time.perf_counter()
+    with stage("ingest"):
+        hasher = hashlib.sha256()
+        size = 0
+        for chunk in _chunks(uploaded_file, chunk_bytes):
+            hasher.update(chunk)
+            size += len(chunk)
+        content_hash = hasher.hexdigest()
+
+        existing = store.find_by_hash(content_hash)
+        if existing and os.path.exists(os.path.join(upload_dir, existing["filename"])):
+            filename, reused = existing["filename"], True
+        else:
+            filename, reused = f"{int(time.time())}_{uploaded_file.name}", False
+            file_path = os.path.join(upload_dir, filename)
+            tmp_path = f"{file_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                for chunk in _chunks(uploaded_file, chunk_bytes):
+                    f.write(chunk)
+            os.replace(tmp_path, file_path)
+        # Re-uploading refreshes the TTL of the stored copy
+        store.record_upload(filename, content_hash, size)
+
+    elapsed = time.perf_counter() - start
+    return {
+        "filename": filename,
+        "file_path": os.path.join(upload_dir, filename),
+        "content_hash": content_hash,
+        "bytes": size,
+        "reused": reused,
+        "seconds": elapsed,
+        "mb_per_sec": size / (1024 * 1024) / elapsed if elapsed else 0.0,
+    }
+
+
+# Parsed frames shared across reruns and sessions, keyed by content so renamed re-uploads hit too
+_frames = OrderedDict()
+_frames_lock = threading.Lock()
+
+
+def load_frame(file_path, content_hash, nrows=None):
+    """Parses a CSV once per (content, nrows) and returns a shallow copy callers may add columns to."""
+    key = (content_hash, nrows)
+    with _frames_lock:
+        frame = _frames.get(key)
+        if frame is not None:
+            _frames.move_to_end(key)
+    if frame is None:
+        with stage("read_csv") as sample:
+            # The pyarrow engine parses multi-threaded but cannot stop after nrows
+            frame = pd.read_csv(file_path, nrows=nrows) if nrows else pd.read_csv(file_path, engine=CSV_ENGINE)
+            sample["rows"] = len(frame)
+        with _frames_lock:
+            _frames[key] = frame
+            while len(_frames) > MAX_FRAMES:
+                _frames.popitem(last=False)
+    return frame.copy(deep=False)
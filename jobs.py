@@ -0,0 +1,431 @@
+import glob
+import json
+import multiprocessing
+import os
+import pickle
+import shutil
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+import pandas as pd
+
+from detection import DEFAULT_BATCH_SIZE, entity_risk_scores
+from metrics import METRICS, stage, timed_chunks
+from result_cache import load_spans, store_results, store_spans
+from risk_summary import RiskSummary, get_risk_history
+from streaming import OUTPUT_FORMATS, ResultWriter, detect_chunk, text_column
+
+JOBS_DIR = "tmp/jobs"
+DEFAULT_JOB_WORKERS = 2
+# Small enough that progress moves and a cancel or crash loses little work, even with the transformer model
+DEFAULT_JOB_CHUNKSIZE = 10_000
+ACTIVE_STATES = ("queued", "running")
+# Redacted source copies were written here before they became redaction jobs
+LEGACY_RESULTS_DIR = "tmp/results"
+
+
+def job_dir(job_id, jobs_dir=JOBS_DIR):
+    return os.path.join(jobs_dir, job_id)
+
+
+def read_job(job_id, jobs_dir=JOBS_DIR):
+    """Returns the persisted state of a job, or None if it does not exist."""
+    try:
+        with open(os.path.join(job_dir(job_id, jobs_dir), "job.json")) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_state(path, state):
+    tmp_path = os.path.join(path, f"job.json.{os.getpid()}.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, os.path.join(path, "job.json"))
+
+
+def _read_state(path):
+    with open(os.path.join(path, "job.json")) as f:
+        return json.load(f)
+
+
+def _count_rows(file_path, block_size=1024 * 1024):
+    # Newline count minus the header; quoted multi-line cells make this an estimate, which is all ETA needs
+    lines = 0
+    with open(file_path, "rb") as f:
+        while block := f.read(block_size):
+            lines += block.count(b"\n")
+    return max(lines - 1, 0)
+
+
+def _chunk_path(path, n):
+    return os.path.join(path, "chunks", f"{n:06d}.pkl")
+
+
+def _chunk_results(path):
+    # Each checkpoint is (pii, hii, row risk scores, span records)
+    for chunk_file in sorted(glob.glob(os.path.join(path, "chunks", "*.pkl"))):
+        with open(chunk_file, "rb") as f:
+            yield pickle.load(f)
+
+
+def _span_recorder():
+    # Collects detect_chunk's spans as records keyed by file row, the form redaction reads back
+    records = []
+
+    def on_spans(column, row_ids, spans):
+        records.append(spans.records(row_ids, column))
+
+    return records, on_spans
+
+
+def _concat_spans(parts):
+    parts = [part for part in parts if len(part)]
+    if not parts:
+        return pd.DataFrame({"row": np.zeros(0, dtype=np.int64), "column": [], "start": np.zeros(0, dtype=np.int32),
+                             "end": np.zeros(0, dtype=np.int32), "label": []})
+    return pd.concat(parts, ignore_index=True)
+
+
+def _finish(path, state):
+    # Combines the per-chunk results into the result cache or into result files, then drops the chunks.
+    # Span records go to the result cache either way, so redaction can reuse them
+    summary, source = RiskSummary(), state.get("source") or os.path.basename(state["file_path"])
+    spans = []
+    if state["output"] == "cache":
+        empty = pd.DataFrame(columns=["Entity", "Type"])
+        parts = list(_chunk_results(path)) or [(empty, empty, np.zeros(0, dtype=np.int64), _concat_spans([]))]
+        for pii, hii, scores, _ in parts:
+            summary.add(pii, hii, scores, source)
+        pii = pd.concat([p for p, _, _, _ in parts], ignore_index=True)
+        hii = pd.concat([h for _, h, _, _ in parts], ignore_index=True)
+        scores = np.concatenate([np.asarray(s) for _, _, s, _ in parts])
+        spans = [records for _, _, _, records in parts]
+        store_results(state["results_key"], pii, hii, scores)
+        state["entities"] = {"pii": len(pii), "hii": len(hii)}
+    else:
+        fmt = state["output"]
+        out_dir = os.path.join(path, "results")
+        os.makedirs(out_dir, exist_ok=True)
+        paths = {name: os.path.join(out_dir, name + OUTPUT_FORMATS[fmt]) for name in ("pii", "hii", "risk_scores")}
+        writers = {name: ResultWriter(p, fmt) for name, p in paths.items()}
+        counts = {"pii": 0, "hii": 0}
+        try:
+            for pii, hii, scores, records in _chunk_results(path):
+                summary.add(pii, hii, scores, source)
+                spans.append(records)
+                for name, entities in (("pii", pii), ("hii", hii)):
+                    writers[name].write(entities.assign(Risk_Score=entity_risk_scores(entities["Type"])))
+                    counts[name] += len(entities)
+                writers["risk_scores"].write(scores.rename_axis("row").reset_index())
+        finally:
+            for writer in writers.values():
+                writer.close()
+        state["result_paths"] = paths
+        state["entities"] = counts
+    store_spans(state["results_key"], _concat_spans(spans))
+    state["risk_summary"] = summary.to_dict()
+    get_risk_history().record(summary, state["results_key"], source, state["engine"])
+
+    for chunk_file in glob.glob(os.path.join(path, "chunks", "*.pkl")):
+        os.remove(chunk_file)
+
+
+def run_job(path):
+    """Worker entry point: scans the job's file chunk by chunk, skipping chunks a previous run finished."""
+    state = _read_state(path)
+    # Workers are reused across jobs, each job reports only its own stages
+    METRICS.reset()
+    state.update(status="running", pid=os.getpid(), error=None, run_started_at=time.time())
+    state.setdefault("started_at", time.time())
+    _write_state(path, state)
+    nlp = memo = cascade = None
+    try:
+        if not state.get("total_rows"):
+            state["total_rows"] = _count_rows(state["file_path"])
+
+        # Tabular files can have profiled free-text columns routed to NER as well
+        if state.get("model"):
+            from nlp_models import load_model
+            from ner_memo import NER_MEMO
+            nlp, memo = load_model(state["model"]), NER_MEMO
+            if state.get("cascade") and state["engine"] == "Descriptive Data":
+                from cascade import CascadeDetector
+                config = dict(state["cascade"])
+                screen_model = config.pop("screen_model", None)
+                cascade = CascadeDetector(nlp, load_model(screen_model) if screen_model else None, memo=memo, **config)
+
+        run_start, run_rows = time.perf_counter(), 0
+        state["rows_done"] = 0
+        os.makedirs(os.path.join(path, "chunks"), exist_ok=True)
+        chunks = timed_chunks("read_csv", pd.read_csv(state["file_path"], chunksize=state["chunksize"]))
+        for n, chunk in enumerate(chunks):
+            if os.path.exists(os.path.join(path, "cancel")):
+                state.update(status="cancelled", metrics=METRICS.snapshot(samples=True))
+                if memo is not None:
+                    state["ner_memo"] = memo.stats()
+                _write_state(path, state)
+                return state
+
+            chunk_file = _chunk_path(path, n)
+            if not os.path.exists(chunk_file):
+                schema = state.get("schema")
+                if state["engine"] == "Descriptive Data" and text_column(schema) not in chunk.columns:
+                    raise ValueError(f"Missing '{text_column(schema)}' column for descriptive NER detection.")
+                records, on_spans = _span_recorder()
+                result = detect_chunk(chunk, state["engine"], nlp, state["batch_size"], state["n_process"], memo,
+                                      cascade, schema, on_spans) + (_concat_spans(records),)
+                with stage("checkpoint", len(chunk)):
+                    tmp_file = f"{chunk_file}.tmp"
+                    with open(tmp_file, "wb") as f:
+                        pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+                    os.replace(tmp_file, chunk_file)
+                run_rows += len(chunk)
+
+            state["rows_done"] += len(chunk)
+            state["chunks_done"] = n + 1
+            if cascade is not None:
+                # Only counts chunks this run scanned, checkpointed chunks were screened by an earlier run
+                state["cascade_stats"] = dict(cascade.stats, escalated_fraction=cascade.escalated_fraction)
+            elapsed = time.perf_counter() - run_start
+            rate = run_rows / elapsed if run_rows and elapsed else 0.0
+            remaining = max(state["total_rows"] - state["rows_done"], 0)
+            state.update(rows_per_sec=rate, eta_seconds=remaining / rate if rate else None, updated_at=time.time())
+            _write_state(path, state)
+
+        with stage("finish", state["rows_done"]):
+            _finish(path, state)
+        state.update(status="done", eta_seconds=0, finished_at=time.time())
+    except Exception as e:
+        state.update(status="failed", error=str(e))
+    state["metrics"] = METRICS.snapshot(samples=True)
+    # The memo lives in this worker, the UI process's own memo never sees detection texts
+    if memo is not None:
+        state["ner_memo"] = memo.stats()
+    _write_state(path, state)
+    return state
+
+
+class _Cancelled(Exception):
+    pass
+
+
+def run_redaction(path):
+    """Worker entry point: writes the job's source file with the entities of its redact types masked.
+
+    The spans detection stored for results_key are reused; the model only runs when there are none.
+    """
+    from redaction import redact_csv_streaming
+
+    state = _read_state(path)
+    METRICS.reset()
+    state.update(status="running", pid=os.getpid(), error=None, run_started_at=time.time(), rows_done=0)
+    state.setdefault("started_at", time.time())
+    _write_state(path, state)
+    out_path = os.path.join(path, "redacted.csv")
+    try:
+        if not state.get("total_rows"):
+            state["total_rows"] = _count_rows(state["file_path"])
+        spans = load_spans(state["results_key"])
+        nlp = memo = None
+        if spans is None and state.get("model"):
+            from nlp_models import load_model
+            from ner_memo import NER_MEMO
+            nlp, memo = load_model(state["model"]), NER_MEMO
+
+        def on_chunk(stats):
+            if os.path.exists(os.path.join(path, "cancel")):
+                raise _Cancelled()
+            state.update(rows_done=stats["rows"], updated_at=time.time())
+            _write_state(path, state)
+
+        tmp_path = f"{out_path}.tmp"
+        # salt=None: the worker reads the same deployment salt as the UI
+        redact_csv_streaming(state["file_path"], tmp_path, state["engine"], state["redact_types"],
+                             mode=state["mode"], nlp=nlp, chunksize=state["chunksize"],
+                             batch_size=state["batch_size"], n_process=state["n_process"], memo=memo,
+                             on_chunk=on_chunk, schema=state.get("schema"), spans=spans)
+        os.replace(tmp_path, out_path)
+        state.update(status="done", output_path=out_path, reused_spans=spans is not None, finished_at=time.time())
+    except _Cancelled:
+        state["status"] = "cancelled"
+    except Exception as e:
+        state.update(status="failed", error=str(e))
+    state["metrics"] = METRICS.snapshot(samples=True)
+    _write_state(path, state)
+    return state
+
+
+def sweep_jobs(ttl_seconds, jobs_dir=JOBS_DIR, results_dir=LEGACY_RESULTS_DIR):
+    """Deletes the directories of jobs whose state was last written over ttl_seconds ago, and stale
+    redacted_* copies in results_dir; returns how many were removed.
+
+    Done, failed, cancelled and interrupted jobs go with their results. A queued or running state that
+    old was left behind by a dead process, as a live worker rewrites it every chunk.
+    """
+    cutoff = time.time() - ttl_seconds
+    removed = 0
+    for path in glob.glob(os.path.join(jobs_dir, "*", "")):
+        try:
+            written = os.path.getmtime(os.path.join(path, "job.json"))
+        except OSError:
+            written = os.path.getmtime(path)
+        if written < cutoff:
+            shutil.rmtree(path, ignore_errors=True)
+            removed += 1
+    for path in glob.glob(os.path.join(results_dir, "redacted_*")):
+        if os.path.getmtime(path) < cutoff:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            removed += 1
+    return removed
+
+
+class JobQueue:
+    """Process-wide queue of detection and redaction jobs run by a pool of worker processes.
+
+    Job state lives on disk under jobs_dir, so progress survives reruns, closed tabs and restarts.
+    """
+
+    def __init__(self, max_workers=DEFAULT_JOB_WORKERS, jobs_dir=JOBS_DIR):
+        self.max_workers = max_workers
+        self.jobs_dir = jobs_dir
+        self._executor = None
+        self._futures = {}
+        self._merged = set()
+        self._lock = threading.Lock()
+
+    def _pool(self):
+        if self._executor is None:
+            # spawn: forking the Streamlit server process would copy its threads and loaded models
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                 mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+
+    def _running(self, job_id):
+        future = self._futures.get(job_id)
+        return future is not None and not future.done()
+
+    def submit(self, job_id, file_path, engine, results_key, model=None, output="cache",
+               chunksize=DEFAULT_JOB_CHUNKSIZE, batch_size=DEFAULT_BATCH_SIZE, n_process=1, cascade=None,
+               schema=None, source=None):
+        """Queues a detection job, or reattaches to job_id if it is already queued, running or done.
+
+        output is "cache" to store results in the result cache under results_key, or a streaming
+        output format ("csv", "parquet", "jsonl") to write result files into the job directory.
+        cascade is an optional dict of CascadeDetector settings plus "screen_model"; model is then
+        only run on the rows the screen escalates. schema is an optional profiling.profile_frame
+        result that routes the columns the engine does not read by name. source is the name the file
+        was uploaded under, recorded in the risk history instead of the stored file's name.
+        """
+        with self._lock:
+            state = read_job(job_id, self.jobs_dir)
+            if self._running(job_id) or (state is not None and state["status"] == "done" and output != "cache"):
+                return job_id
+            # Callers check the result cache first, so a finished cache job here means its entry was evicted
+            if state is not None and state["status"] == "done":
+                state = None
+            if state is not None:
+                # The same content may have been uploaded again under a new name
+                state.update(file_path=file_path, source=source)
+            else:
+                path = job_dir(job_id, self.jobs_dir)
+                os.makedirs(path, exist_ok=True)
+                state = {
+                    "id": job_id, "file_path": file_path, "engine": engine, "results_key": results_key,
+                    "model": model, "output": output, "chunksize": int(chunksize), "batch_size": int(batch_size),
+                    "n_process": int(n_process), "cascade": cascade, "schema": schema, "rows_done": 0,
+                    "chunks_done": 0, "total_rows": None, "source": source,
+                    "submitted_at": time.time(),
+                }
+            return self._enqueue(state)
+
+    def submit_redaction(self, job_id, file_path, engine, results_key, redact_types, mode="redact", model=None,
+                         chunksize=DEFAULT_JOB_CHUNKSIZE, batch_size=DEFAULT_BATCH_SIZE, n_process=1, schema=None):
+        """Queues a job writing a redacted copy of file_path, or reattaches to job_id if it is queued,
+        running or done; the copy is written once and reused by every download and export.
+
+        job_id should identify results_key, redact_types, mode and the hash salt. model is only
+        loaded when no spans are stored for results_key.
+        """
+        with self._lock:
+            state = read_job(job_id, self.jobs_dir)
+            if self._running(job_id) or (state is not None and state["status"] == "done"
+                                         and os.path.exists(state.get("output_path", ""))):
+                return job_id
+            path = job_dir(job_id, self.jobs_dir)
+            os.makedirs(path, exist_ok=True)
+            state = {
+                "id": job_id, "kind": "redaction", "file_path": file_path, "engine": engine,
+                "results_key": results_key, "redact_types": list(redact_types), "mode": mode, "model": model,
+                "chunksize": int(chunksize), "batch_size": int(batch_size), "n_process": int(n_process),
+                "schema": schema, "rows_done": 0, "total_rows": None, "submitted_at": time.time(),
+            }
+            return self._enqueue(state)
+
+    def _enqueue(self, state):
+        path = job_dir(state["id"], self.jobs_dir)
+        if os.path.exists(os.path.join(path, "cancel")):
+            os.remove(os.path.join(path, "cancel"))
+        state.update(status="queued", error=None)
+        state.pop("metrics", None)
+        state.pop("ner_memo", None)
+        _write_state(path, state)
+        entry = run_redaction if state.get("kind") == "redaction" else run_job
+        try:
+            future = self._pool().submit(entry, path)
+        except BrokenProcessPool:
+            # A worker died abruptly (OOM kill, crash in the model) and took the pool with it; start a new one
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            future = self._pool().submit(entry, path)
+        self._futures[state["id"]] = future
+        return state["id"]
+
+    def resume(self, job_id):
+        """Requeues a cancelled, failed or interrupted job; chunks it already finished are skipped."""
+        with self._lock:
+            state = read_job(job_id, self.jobs_dir)
+            if state is None or state["status"] == "done" or self._running(job_id):
+                return job_id
+            return self._enqueue(state)
+
+    def cancel(self, job_id):
+        """Stops a job at its next chunk boundary, or before it starts if it is still queued."""
+        with self._lock:
+            path = job_dir(job_id, self.jobs_dir)
+            open(os.path.join(path, "cancel"), "w").close()
+            future = self._futures.get(job_id)
+            if future is not None and future.cancel():
+                state = read_job(job_id, self.jobs_dir)
+                state["status"] = "cancelled"
+                _write_state(path, state)
+
+    def status(self, job_id):
+        """Returns the job's persisted state; active jobs this process is not running are "interrupted"."""
+        state = read_job(job_id, self.jobs_dir)
+        if state is None:
+            return None
+        with self._lock:
+            future = self._futures.get(job_id)
+            # Fold each finished run's worker stages into this process's metrics, once
+            run = (job_id, state.get("run_started_at"))
+            if state.get("metrics") and state["status"] not in ACTIVE_STATES and run not in self._merged:
+                self._merged.add(run)
+                METRICS.merge(state["metrics"])
+        if state["status"] in ACTIVE_STATES:
+            if future is None:
+                state["status"] = "interrupted"
+            elif future.done() and not future.cancelled() and future.exception() is not None:
+                # The worker died without recording why, e.g. killed for running out of memory
+                state.update(status="failed", error=str(future.exception()))
+        return state
+
+
+# Shared by every session, like the models and NER memo
+JOB_QUEUE = JobQueue(int(os.getenv("DETECTION_WORKERS", DEFAULT_JOB_WORKERS)))
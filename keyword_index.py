@@ -0,0 +1,115 @@
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+# Candidate sets at or below this size are verified directly rather than intersected with more postings
+VERIFY_DIRECTLY_BELOW = 20_000
+
+
+def _utf8_buffer(strings):
+    # Returns the UTF-8 bytes of all strings back to back and each string's byte length
+    if pa is not None:
+        arr = pa.array(strings.to_numpy(dtype=object), type=pa.large_string())
+        offsets = np.frombuffer(arr.buffers()[1], dtype=np.int64)[arr.offset:arr.offset + len(arr) + 1]
+        data = np.frombuffer(arr.buffers()[2], dtype=np.uint8) if len(arr) else np.zeros(0, dtype=np.uint8)
+        return data[offsets[0]:offsets[-1]], np.diff(offsets)
+    encoded = [value.encode() for value in strings]
+    return (np.frombuffer(b"".join(encoded), dtype=np.uint8),
+            np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded)))
+
+
+def _sorted_unique(keys):
+    # np.unique is far slower than sort + neighbour compare on tens of millions of int64 keys
+    keys = np.sort(keys)
+    keep = np.ones(len(keys), dtype=bool)
+    np.not_equal(keys[1:], keys[:-1], out=keep[1:])
+    return keys[keep]
+
+
+def _trigram_codes(data):
+    # Packs every 3-byte window of a uint8 buffer into one int per position
+    data = data.astype(np.int64)
+    return (data[:-2] << 16) | (data[1:-1] << 8) | data[2:]
+
+
+class TrigramIndex:
+    """Case-insensitive literal substring index over a column of strings, built once per detection run.
+
+    Distinct values are indexed by the byte trigrams of their lowercased UTF-8 form; a query
+    intersects the postings of its own trigrams and verifies the few remaining candidates.
+    """
+
+    def __init__(self, values):
+        codes, uniques = pd.factorize(pd.Series(values))
+        self.codes = codes.astype(np.int32)
+        self.uniques = np.asarray(uniques, dtype=object)
+        self._lowered = pd.Series(uniques).astype(str).str.lower()
+
+        data, lengths = _utf8_buffer(self._lowered)
+        owners = np.repeat(np.arange(len(lengths), dtype=np.int64), lengths)
+        if len(data) >= 3:
+            # Windows that straddle two values are not trigrams of either
+            within = owners[:-2] == owners[2:]
+            keys = _sorted_unique((_trigram_codes(data)[within] << 32) | owners[:-2][within])
+        else:
+            keys = np.zeros(0, dtype=np.int64)
+
+        # One sorted, de-duplicated (trigram, value id) list; each trigram's ids form a contiguous run
+        grams = keys >> 32
+        starts = np.flatnonzero(np.diff(grams, prepend=-1))
+        self.grams = grams[starts]
+        self.offsets = np.append(starts, len(keys))
+        self.postings = (keys & 0xFFFFFFFF).astype(np.int32)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def _posting(self, gram):
+        i = np.searchsorted(self.grams, gram)
+        if i == len(self.grams) or self.grams[i] != gram:
+            return self.postings[:0]
+        return self.postings[self.offsets[i]:self.offsets[i + 1]]
+
+    def match_ids(self, query, prefix=False):
+        """Returns the ids of distinct values containing query (or starting with it, if prefix)."""
+        lowered = query.lower()
+        encoded = np.frombuffer(lowered.encode(), dtype=np.uint8)
+        if len(encoded) < 3:
+            candidates = None
+        else:
+            postings = sorted((self._posting(gram) for gram in np.unique(_trigram_codes(encoded))), key=len)
+            if len(encoded) == 3 and not prefix:
+                # A single trigram needs no verification
+                return postings[0]
+            candidates = postings[0]
+            for posting in postings[1:]:
+                if len(candidates) <= VERIFY_DIRECTLY_BELOW or len(candidates) > len(self.uniques) // 4:
+                    break
+                candidates = np.intersect1d(candidates, posting, assume_unique=True)
+            if len(candidates) > len(self.uniques) // 4:
+                # Even the rarest trigrams are common: scanning the values in place beats gathering them
+                candidates = None
+
+        values = self._lowered if candidates is None else self._lowered.iloc[candidates]
+        found = values.str.startswith(lowered) if prefix else values.str.contains(lowered, regex=False)
+        found = found.to_numpy(dtype=bool)
+        return np.flatnonzero(found).astype(np.int32) if candidates is None else candidates[found]
+
+    def _id_mask(self, ids):
+        # codes of missing values are -1, which lands on the trailing False slot
+        hit = np.zeros(len(self.uniques) + 1, dtype=bool)
+        hit[ids] = True
+        return hit[self.codes]
+
+    def mask(self, query, prefix=False):
+        """Returns a boolean row mask of the values matching query."""
+        return self._id_mask(self.match_ids(query, prefix))
+
+    def values_mask(self, values):
+        """Returns a boolean row mask of the rows holding any of values exactly."""
+        ids = pd.Index(self.uniques).get_indexer(list(values))
+        return self._id_mask(ids[ids >= 0])
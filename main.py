@@ -1,22 +1,12 @@
-import yaml
-import bcrypt
-import pandas as pd
-import spacy
 import streamlit as st
-import json
 import os
-import plotly.express as px
-import pyzipper
-from wordcloud import WordCloud
-import meilisearch
 import time
-from datetime import datetime, timedelta
-from dotenv import load_dotenv
 from auth import load_auth_config, get_authenticator
 
 st.set_page_config(page_title="Entity Detection", layout="wide")
 UPLOAD_DIR = "tmp/uploads"
-METADATA_FILE = "uploaded_files.json"
+PREVIEW_ROWS = 1000
+JOB_POLL_SECONDS = 1.0
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
 config = load_auth_config()
@@ -41,9 +31,11 @@ if register_tab:
         elif not new_username or not new_password or not new_name:
             st.error(" Please fill in all required fields.")
         else:
+            import bcrypt
+            import yaml
+
             hashed_pw = bcrypt.hashpw(new_password.encode(), bcrypt.gensalt()).decode()
-            with open("config.yaml", "r") as file:
-                config_data = yaml.safe_load(file)
+            config_data = load_auth_config()
             if new_username in config_data["credentials"]["usernames"]:
                 st.error(" Username already exists.")
             else:
@@ -67,35 +59,60 @@ elif authentication_status is False:
     st.error("Username or password is incorrect.")
 
 if authentication_status:
+    # Feature modules (pandas, spaCy, Meilisearch, ...) load on the first signed-in run, so the login
+    # and register screens never import them; later reruns find them in sys.modules
+    import hashlib
+    import json
+    from datetime import datetime
+    import numpy as np
+    from nlp_models import MODEL_NAMES, DEFAULT_MODEL, load_model, model_stats, package_version
+    from detection import DEFAULT_BATCH_SIZE
+    from streaming import DEFAULT_CHUNKSIZE, should_stream, text_column
+    from profiling import profile_frame, routed_columns, schema_version
+    from result_cache import cache_key, load_results
+    from jobs import DEFAULT_JOB_CHUNKSIZE, JOB_QUEUE
+    from upload_store import get_upload_store
+    from ingest import ingest_upload, load_frame
+    from cascade import (DEFAULT_MAX_UNCOVERED, DEFAULT_MIN_ENTITIES, DEFAULT_SAMPLE_ROWS, DEFAULT_SCREEN_MODEL,
+                         CascadeDetector, evaluate_cascade)
+    from indexing import DEFAULT_INDEX_BATCH_SIZE, IndexingJob, build_documents, get_client, search_entities
+    from entity_store import EntityStore, get_store, publish_store
+    from redaction import REDACTION_MODES, redaction_salt
+    from export import DOWNLOAD_MAX_MB, EXPORT_OPTIONS, build_encrypted_zip, compressed_download
+    from dashboard import (DASHBOARD_CACHE, distribution_figure, entity_frequencies, summary_stats,
+                           summary_type_counts, type_counts, wordcloud_image)
+    from risk_summary import RiskSummary, get_risk_history
+    from metrics import METRICS, METRICS_PROM_FILE, stage
+
+    def file_download(label, path, file_name):
+        # A file on disk is read only once the user asks for it, gzipped and size-capped, and forgotten
+        # once downloaded, so reruns and job polls never load it
+        if st.session_state.get('prepared_download') != path:
+            if not st.button(f"Prepare {label}", key=f"prepare_{path}"):
+                return
+            st.session_state['prepared_download'] = path
+        gz_path = compressed_download(path)
+        if gz_path is None:
+            st.warning(f"{file_name} is over {DOWNLOAD_MAX_MB} MB compressed, fetch it from {path} on the server.")
+            return
+        with open(gz_path, "rb") as download:
+            st.download_button(f"Download {label}", download, file_name=f"{file_name}.gz", mime="application/gzip",
+                               key=f"download_{path}", on_click=lambda: st.session_state.pop('prepared_download', None))
 
     st.sidebar.subheader(f"Hello, {name}!")
     authenticator.logout("Logout", "sidebar")
 
 
-    def clean_old_files():
-        if os.path.exists(METADATA_FILE):
-            with open(METADATA_FILE, "r") as f:
-                uploads = json.load(f)
-        else:
-            uploads = {}
-
-        to_delete = []
-        for fname, meta in uploads.items():
-            uploaded_time = datetime.fromtimestamp(meta["timestamp"])
-            if datetime.now() - uploaded_time > timedelta(hours=4):
-                file_path = os.path.join(UPLOAD_DIR, fname)
-                if os.path.exists(file_path):
-                    os.remove(file_path)
-                to_delete.append(fname)
-
-        for fname in to_delete:
-            uploads.pop(fname)
-
-        with open(METADATA_FILE, "w") as f:
-            json.dump(uploads, f)
+    # Expired uploads are removed by a background sweeper, not on every page load
+    upload_store = get_upload_store(UPLOAD_DIR)
 
-
-    clean_old_files()
+    def update_upload(filename, **fields):
+        # Writes the store only when a value changes, not on every rerun and job poll
+        recorded = st.session_state.setdefault('upload_fields', {}).setdefault(filename, {})
+        changed = {field: value for field, value in fields.items() if recorded.get(field) != value}
+        if changed:
+            upload_store.update(filename, **changed)
+            recorded.update(changed)
 
     st.title(" Welcome to the Dashboard")
     st.markdown(f"Hello **{name}**, please proceed by uploading your dataset below.")
@@ -104,43 +121,35 @@ if authentication_status:
 
         uploaded_file = st.file_uploader("Upload a CSV file", type=["csv"])
         if uploaded_file:
-            ts = int(time.time())
-            filename = f"{ts}_{uploaded_file.name}"
-            file_path = os.path.join(UPLOAD_DIR, filename)
-
-            with open(file_path, "wb") as f:
-                f.write(uploaded_file.read())
-
-            # Track uploaded file
-            if os.path.exists(METADATA_FILE):
-                with open(METADATA_FILE, "r") as f:
-                    uploads = json.load(f)
+            # Ingest once per uploaded file, not on every rerun while the widget holds it
+            upload_id = getattr(uploaded_file, "file_id", None) or (uploaded_file.name, uploaded_file.size)
+            ingested = st.session_state.get('ingested')
+            if ingested is None or ingested["upload_id"] != upload_id or not os.path.exists(ingested["file_path"]):
+                ingested = dict(ingest_upload(uploaded_file, UPLOAD_DIR, upload_store), upload_id=upload_id)
+                st.session_state['ingested'] = ingested
+                st.session_state.get('upload_fields', {}).pop(ingested["filename"], None)
+            filename, file_path, content_hash = ingested["filename"], ingested["file_path"], ingested["content_hash"]
+
+            stream_mode = st.checkbox("Stream detection in chunks (large files)", value=should_stream(file_path))
+            if stream_mode:
+                stream_chunksize = st.number_input("Rows per chunk", min_value=1000, value=DEFAULT_CHUNKSIZE,
+                                                   step=1000)
+                # Only a preview is held in memory, detection reads the file chunk by chunk
+                df = load_frame(file_path, content_hash, nrows=PREVIEW_ROWS)
             else:
-                uploads = {}
-
-            uploads[filename] = {"timestamp": ts}
-            with open(METADATA_FILE, "w") as f:
-                json.dump(uploads, f)
-
-            df = pd.read_csv(file_path)
+                df = load_frame(file_path, content_hash)
+                update_upload(filename, row_count=len(df))
             st.success(f" Uploaded file: {uploaded_file.name}")
+            st.caption(f"{ingested['bytes'] / (1024 * 1024):,.1f} MB "
+                       + ("already stored, " if ingested["reused"] else "")
+                       + f"ingested at {ingested['mb_per_sec']:,.0f} MB/s")
 
-
-            def infer_engine_from_schema(df):
-                text_cols = {'text'}
-                tabular_cols = {'fname', 'lname', 'email', 'phone', 'address', 'cc_number'}
-
-                cols = set(df.columns.str.lower())
-
-                if text_cols & cols:
-                    return "Descriptive Data"
-                elif tabular_cols & cols:
-                    return "Tabular Data"
-                else:
-                    return None
-
-
-            suggested_engine = infer_engine_from_schema(df)
+            # Column routing from a bounded sample, profiled once per file content
+            if st.session_state.get('schema_hash') != content_hash:
+                st.session_state['schema'] = profile_frame(df)
+                st.session_state['schema_hash'] = content_hash
+            schema = st.session_state['schema']
+            suggested_engine = schema["engine"]
 
             if suggested_engine:
                 st.info(f" Suggested Detection Engine: **{suggested_engine}** based on file structure.")
@@ -149,335 +158,290 @@ if authentication_status:
             else:
                 st.warning(" Could not determine engine automatically. Please select manually.")
                 detection_engine = st.radio("Select Detection Engine", ["Tabular Data", "Descriptive Data"])
+            routes = routed_columns(schema, detection_engine)
+            with st.expander("Column Profile"):
+                st.caption(f"Each column is routed by the content of its first {schema['rows_sampled']:,} rows"
+                           + (f"; `{schema['text_column']}` is the text column" if schema["text_column"] else ""))
+                st.dataframe(list(schema["columns"].values()), use_container_width=True)
 
         else:
             st.warning("Upload a CSV file to begin detection.")
             st.stop()
-        # spacy model trf
-        nlp = spacy.load("en_core_web_trf")
+        # Detection loads the model in the job workers; this process loads it only to redact or check the cascade
+        ner_model = cascade_config = screen_model = None
+        ner_batch_size, ner_n_process = DEFAULT_BATCH_SIZE, 1
+        descriptive_mode = None
+        if detection_engine == "Descriptive Data" or any(p["route"] == "ner" for p in routes.values()):
+            mode_choices = ["Patterns + NER", "Cascade (small model first)", "Patterns only"]
+            if detection_engine != "Descriptive Data":
+                # Free-text columns of a tabular file run through the model directly
+                mode_choices.remove("Cascade (small model first)")
+            descriptive_mode = st.sidebar.radio("Descriptive Detection Mode", mode_choices,
+                                                help="Patterns only skips the NER model and finds emails, phones, "
+                                                     "card numbers, SSNs and ZIPs with regular expressions. "
+                                                     "Cascade screens every row with the patterns and a small "
+                                                     "model and runs the NER model only on flagged rows.")
+        if descriptive_mode in ("Patterns + NER", "Cascade (small model first)"):
+            model_choices = list(MODEL_NAMES)
+            ner_model = st.sidebar.selectbox("NER Model", model_choices, index=model_choices.index(DEFAULT_MODEL))
+            if descriptive_mode == "Cascade (small model first)":
+                screen_choices = model_choices + ["none"]
+                screen_model = st.sidebar.selectbox("Screening Model", screen_choices,
+                                                    index=screen_choices.index(DEFAULT_SCREEN_MODEL),
+                                                    help="none screens with the regex patterns alone")
+                min_entities = st.sidebar.number_input(
+                    "Escalate at Screened Names/Places", min_value=1, value=DEFAULT_MIN_ENTITIES,
+                    help="Rows where the screen finds this many person, organisation or place entities go to "
+                         "the NER model")
+                max_uncovered = st.sidebar.number_input(
+                    "Untagged Capitalised Words Allowed", min_value=0, value=DEFAULT_MAX_UNCOVERED,
+                    help="Rows with more capitalised words than this outside every screened entity count as "
+                         "uncertain and go to the NER model")
+                cascade_config = {"screen_model": None if screen_model == "none" else screen_model,
+                                  "min_entities": int(min_entities), "max_uncovered": int(max_uncovered)}
+            ner_batch_size = st.sidebar.number_input("NER Batch Size", min_value=1, value=DEFAULT_BATCH_SIZE)
+            # each extra process holds its own copy of the model
+            ner_n_process = st.sidebar.number_input("NER Processes", min_value=1, max_value=os.cpu_count() or 1,
+                                                    value=1)
+            with st.sidebar.expander("Model Load Stats"):
+                for stats in model_stats():
+                    st.write(f"**{stats['model']}**: {stats['load_seconds']:.2f}s, "
+                             f"{stats['rss_delta_mb']:.0f} MB (RSS {stats['rss_mb']:.0f} MB)")
+        if cascade_config is not None and text_column(schema) in df.columns:
+            with st.sidebar.expander("Cascade Recall Check"):
+                sample_rows = st.number_input("Sample Rows", min_value=10, value=DEFAULT_SAMPLE_ROWS)
+                if st.button("Evaluate Cascade"):
+                    sample = df[text_column(schema)].dropna().astype(str)
+                    sample = sample.sample(min(int(sample_rows), len(sample)), random_state=0).tolist()
+                    with st.spinner(f"Running the cascade and {ner_model} alone on {len(sample):,} rows..."):
+                        screen_nlp = (load_model(cascade_config["screen_model"])
+                                      if cascade_config["screen_model"] else None)
+                        evaluation = evaluate_cascade(sample, CascadeDetector(
+                            load_model(ner_model), screen_nlp, cascade_config["min_entities"],
+                            cascade_config["max_uncovered"]), batch_size=int(ner_batch_size))
+                    st.write(f"Escalated: **{evaluation['escalated_fraction']:.1%}** of rows")
+                    st.write(f"Recall vs {ner_model}: **{evaluation['recall']:.1%}** "
+                             f"({evaluation['typed_recall']:.1%} with matching labels)")
+                    st.write(f"Time: {evaluation['cascade_seconds']:.2f}s vs {evaluation['baseline_seconds']:.2f}s")
         # Meilisearch
-        load_dotenv()
-        client = meilisearch.Client(os.getenv("CLIENT"), os.getenv("SSD_KEY"))
-        try:
-            client.get_index("pii_hii_data")
-        except meilisearch.errors.MeilisearchApiError:
-            client.create_index("pii_hii_data", {"primaryKey": "id"})
-        index = client.index("pii_hii_data")
-
-        processed_data_path = 'processed_pii_hii_data.json'
-        pii_df, hii_df = pd.DataFrame(), pd.DataFrame()
+        # Shared client: one keep-alive session per process, default index verified only once
+        client = get_client()
+        meili_calls_at_start = client.thread_http_calls
+        index = client.ensure_index("pii_hii_data")
 
         st.title("Entity Detection Dashboard")
         st.markdown(f"### Welcome, {name}")
-        pii_df = pd.DataFrame(st.session_state.get('pii', []))
-        hii_df = pd.DataFrame(st.session_state.get('hii', []))
-
-        all_types = []
-
-        if not pii_df.empty and 'Type' in pii_df.columns:
-            all_types += pii_df['Type'].dropna().astype(str).unique().tolist()
-
-        if not hii_df.empty and 'Type' in hii_df.columns:
-            all_types += hii_df['Type'].dropna().astype(str).unique().tolist()
-
-        all_types = sorted(set(all_types))
-        detection_types = []
-        if not pii_df.empty and 'Type' in pii_df.columns:
-            detection_types += pii_df['Type'].dropna().astype(str).unique().tolist()
-        if not hii_df.empty and 'Type' in hii_df.columns:
-            detection_types += hii_df['Type'].dropna().astype(str).unique().tolist()
-        detection_types = sorted(set(detection_types))
-
         # ZIP encryption password
         zip_password = st.sidebar.text_input("ZIP Encryption Password", type="password")
-        RISK_SCORES = {
-            "EMAIL": 2,
-            "PHONE": 2,
-            "CREDIT_CARD": 5,
-            "ADDRESS": 3,
-            "ID": 4,
-            "NAME": 1,
-            "BLOOD_TYPE": 1,
-            "WEIGHT": 1,
-            "HEIGHT": 1,
-            "ALLERGIES": 2,
-            "MEDICAL_CONDITIONS": 4,
-            "MEDICATIONS": 3,
-            "DOCTOR": 2,
-            "HOSPITAL": 2,
-            "INSURANCE": 3
-        }
 
         # Dual Detection Sections
         st.subheader("Dataset Preview")
         st.write(df.head(20))
 
-
-        def classify_entity_type(spacy_label):
-            mapping = {
-                'PERSON': 'Person',
-                'ORG': 'Company',
-                'EMAIL': 'Contact',
-                'PHONE': 'Contact',
-                'GPE': 'Location',
-                'LOC': 'Location',
-                'DATE': 'Time',
-                'TIME': 'Time',
-                'MONEY': 'Financial',
-                'FAC': 'Other',
-                'NORP': 'Other',
-                'PRODUCT': 'Other'
-            }
-            return mapping.get(spacy_label, 'Unknown')
-
-
-        def detect_rule_based(row):
-            pii_data, hii_data = [], []
-            try:
-                pii_data.append((str(row.get('id', '')), 'ID'))
-                pii_data.append((f"{row.get('fname', '')} {row.get('lname', '')}", 'NAME'))
-                pii_data.append((row.get('email', ''), 'EMAIL'))
-                pii_data.append((row.get('phone', ''), 'PHONE'))
-                pii_data.append((
-                                f"{row.get('address', '')}, {row.get('city', '')}, {row.get('state', '')} {row.get('zip', '')}",
-                                'ADDRESS'))
-                pii_data.append((row.get('cc_number', ''), 'CREDIT_CARD'))
-                hii_data.append((row.get('blood_type', ''), 'BLOOD_TYPE'))
-                hii_data.append((row.get('weight_kg', ''), 'WEIGHT'))
-                hii_data.append((row.get('height_cm', ''), 'HEIGHT'))
-                hii_data.append((row.get('allergies', ''), 'ALLERGIES'))
-                hii_data.append((row.get('medical_conditions', ''), 'MEDICAL_CONDITIONS'))
-                hii_data.append((row.get('medications', ''), 'MEDICATIONS'))
-                hii_data.append((row.get('doctor_name', ''), 'DOCTOR'))
-                hii_data.append((row.get('hospital_name', ''), 'HOSPITAL'))
-                hii_data.append((row.get('insurance_provider', ''), 'INSURANCE'))
-            except:
-                pass
-            return pii_data, hii_data
-
-
-        def detect_ner(text):
-            doc = nlp(text)
-            return [(ent.text, ent.label_) for ent in doc.ents]
-
-
-        def infer_detection_title(entity_types):
-            entity_types = set(entity_types)
-
-            categories = {
-                "PII": {'EMAIL', 'PHONE', 'CREDIT_CARD', 'ADDRESS', 'ID', 'NAME'},
-                "HII": {'BLOOD_TYPE', 'WEIGHT', 'HEIGHT', 'ALLERGIES', 'MEDICAL_CONDITIONS', 'MEDICATIONS', 'DOCTOR',
-                        'HOSPITAL', 'INSURANCE'},
-                "Contact Info": {'EMAIL', 'PHONE'},
-                "Demographics": {'GPE', 'LOC', 'ZIP', 'COUNTRY', 'STATE', 'CITY'},
-                "Identity": {'PERSON'},
-                "Organizations": {'ORG', 'FAC', 'PRODUCT'},
-                "Finance": {'MONEY'},
-            }
-            matched_labels = []
-            for label, ents in categories.items():
-                if any(ent in entity_types for ent in ents):
-                    matched_labels.append(label)
-
-            if not matched_labels:
-                return "Uncategorized Entities"
-
-            return " & ".join(sorted(set(matched_labels)))
+    # Same file content + engine + model (and cascade settings) always yields the same results
+    # Read from the installed packages' metadata, so the key costs no model load
+    detector_version = package_version(ner_model) if ner_model is not None else "rules+patterns"
+    if cascade_config is not None:
+        screen_version = package_version(screen_model) if cascade_config["screen_model"] else "patterns"
+        detector_version += (f"|cascade:{screen_version}:"
+                             f"{cascade_config['min_entities']}:{cascade_config['max_uncovered']}")
+    detector_version += f"|columns:{schema_version(schema)}"
+    results_key = cache_key(content_hash, detection_engine, detector_version)
 
     if st.button("Run Detection"):
-        with st.spinner("Processing..."):
-            pii_flat, hii_flat = [], []
-            progress = st.progress(0)
-            total_rows = len(df)
-
-
-            def compute_risk_scores(detected_pii, detected_hii):
-                risk_scores = []
-                for i in range(len(detected_pii)):
-                    score = 0
-                    for ent, etype in detected_pii[i] + detected_hii[i]:
-                        score += RISK_SCORES.get(etype.upper(), 1)
-                    risk_scores.append(score)
-                return risk_scores
-
-
-            if detection_engine == "Tabular Data":
-                required_cols = ['fname', 'lname', 'email', 'phone']
-                if not any(col in df.columns for col in required_cols):
-                    st.error("Required columns for tabular detection are missing.")
-                    st.stop()
-
-                detected_pii, detected_hii = [], []
-                for i, row in enumerate(df.to_dict(orient="records")):
-                    pii, hii = detect_rule_based(row)
-                    detected_pii.append(pii)
-                    detected_hii.append(hii)
-                    progress.progress((i + 1) / total_rows)
-
-                pii_flat = [item for sublist in detected_pii for item in sublist if item[0]]
-                hii_flat = [item for sublist in detected_hii for item in sublist if item[0]]
-                df["Risk_Score"] = compute_risk_scores(detected_pii, detected_hii)
-
-            elif detection_engine == "Descriptive Data":
-                if 'text' not in df.columns:
-                    st.error("Missing 'text' column for descriptive NER detection.")
-                    st.stop()
-
-                df = df[df['text'].notna()].copy()  # Filter rows directly on df to maintain row index match
-                df['text'] = df['text'].astype(str)
-                detected_pii = []
-                for i, text in enumerate(df['text']):
-                    ents = detect_ner(text)
-                    detected_pii.append(ents)
-                    progress.progress((i + 1) / len(df))
-
-                pii_flat = [item for sublist in detected_pii for item in sublist if item[0]]
-                df["Risk_Score"] = [
-                    sum(RISK_SCORES.get(ent_type.upper(), 1) for _, ent_type in ents)
-                    for ents in detected_pii
-                ]
-                # Display Risk Assessment Metrics for Descriptive Data
-                if "Risk_Score" in df.columns and not df["Risk_Score"].empty:
-                    st.subheader("Risk Assessment")
-                    avg_risk = df["Risk_Score"].mean()
-                    max_risk = df["Risk_Score"].max()
-                    min_risk = df["Risk_Score"].min()
-
-                    col4, col5, col6 = st.columns(3)
-                    with col4:
-                        st.metric("Avg Risk", f"{avg_risk:.2f}")
-                    with col5:
-                        st.metric("Max Risk", f"{max_risk}")
-                    with col6:
-                        st.metric("Min Risk", f"{min_risk}")
-            pii_df = pd.DataFrame(pii_flat, columns=["Entity", "Type"])
-            pii_df["Risk_Score"] = pii_df["Type"].apply(lambda t: RISK_SCORES.get(t.upper(), 1))
-            if "Risk_Score" in df.columns:
-                st.subheader("Row-Wise Risk Scores")
-                cols = ["Risk_Score"] + [col for col in df.columns if col != "Risk_Score"]
-                st.dataframe(df[cols], use_container_width=True)
-
-            hii_df = pd.DataFrame(hii_flat, columns=["Entity", "Type"])
-            hii_df["Risk_Score"] = hii_df["Type"].apply(lambda t: RISK_SCORES.get(t.upper(), 1))
-
-            st.session_state.pii = pii_df.to_dict(orient="records")
-            st.session_state.hii = hii_df.to_dict(orient="records")
-
-            st.success("Detection completed.")
-            st.session_state['detection_ran'] = True
-
-            documents_to_index = [
-                {"id": i, "Entity": entity, "Type": entity_type}
-                for i, (entity, entity_type) in enumerate(pii_flat + hii_flat)
-            ]
+        if detection_engine == "Tabular Data" and not any(
+                p["known"] for p in schema["columns"].values()) and not routes:
+            st.error("No column with personal or health data was found for tabular detection.")
+            st.stop()
+        if detection_engine == "Descriptive Data" and text_column(schema) not in df.columns:
+            st.error(f"Missing '{text_column(schema)}' column for descriptive NER detection.")
+            st.stop()
 
+        # Detection runs in a worker process; this script only submits the job and polls it
+        job_output = "csv" if stream_mode else "cache"
+        if job_output == "cache" and load_results(results_key) is not None:
+            st.info(" Loaded results from the detection cache (same file scanned earlier).")
+            st.session_state['detection_job'] = None
+            st.session_state['loaded_results_key'] = None
+            st.session_state['pending_results_key'] = results_key
+            update_upload(filename, scan_status="done")
+        else:
+            st.session_state['detection_job'] = JOB_QUEUE.submit(
+                f"{results_key[:24]}_{job_output}", file_path, detection_engine, results_key,
+                model=ner_model, output=job_output,
+                chunksize=int(stream_chunksize) if stream_mode else DEFAULT_JOB_CHUNKSIZE,
+                batch_size=int(ner_batch_size), n_process=int(ner_n_process), cascade=cascade_config,
+                schema=schema, source=uploaded_file.name
+            )
 
-            def clean_string(value):
-                if value is None or (isinstance(value, float) and pd.isna(value)):
-                    return ""
-                return str(value).strip()
+    poll_job = False
+    detection_job = st.session_state.get('detection_job')
+    job = JOB_QUEUE.status(detection_job) if detection_job else None
+    if job is not None and job.get("ner_memo"):
+        # Detection runs NER in a job worker, so its memo is the one that saw this file's texts
+        with st.sidebar.expander("NER Text Cache"):
+            memo_stats = job["ner_memo"]
+            st.write(f"Hit rate: **{memo_stats['hit_rate']:.1%}** of {memo_stats['rows']:,} texts")
+            st.write(f"Inferred: {memo_stats['inferred']:,}, cached: {memo_stats['entries']:,} texts")
+            st.write(f"NER time saved (est.): {memo_stats['saved_seconds_est']:.1f}s")
+            st.caption(f"Worker process {job['pid']}")
+    if job is not None:
+        total_rows = job.get("total_rows") or 0
+        # The job may belong to a file uploaded earlier in this session
+        if job["file_path"] == file_path:
+            update_upload(filename, scan_status=job["status"],
+                          **({"row_count": job["rows_done"]} if job["status"] == "done" else {}))
+        if job.get("cascade_stats"):
+            st.caption(f"Cascade: {job['cascade_stats']['escalated_fraction']:.1%} of "
+                       f"{job['cascade_stats']['rows']:,} screened rows escalated to {job['model']}")
+        if job["status"] in ("queued", "running"):
+            st.progress(min(job["rows_done"] / total_rows, 1.0) if total_rows else 0.0)
+            eta = job.get("eta_seconds")
+            st.info(f" Detection {job['status']}: {job['rows_done']:,}/{total_rows:,} rows"
+                    + (f", about {eta:.0f}s left" if eta else ""))
+            if st.button("Cancel Detection"):
+                JOB_QUEUE.cancel(detection_job)
+                st.rerun()
+            poll_job = True
+        elif job["status"] in ("cancelled", "failed", "interrupted"):
+            if job.get("error"):
+                st.error(f"Detection failed: {job['error']}")
+            else:
+                st.warning(f"Detection {job['status']} after {job['rows_done']:,} of {total_rows:,} rows.")
+            if st.button("Resume Detection"):
+                JOB_QUEUE.resume(detection_job)
+                st.rerun()
+        elif job["output"] != "cache":
+            st.success(f"Streaming detection completed: {job['rows_done']:,} rows, "
+                       f"{job['entities']['pii']:,} PII and {job['entities']['hii']:,} HII entities.")
+            if job.get("risk_summary"):
+                job_risk = RiskSummary.from_dict(job["risk_summary"]).stats()
+                if job_risk["rows"]:
+                    st.caption(f"Row risk: avg {job_risk['avg_risk']:.2f}, p90 {job_risk['p90_risk']}, "
+                               f"max {job_risk['max_risk']}")
+            for result_name, result_path in job["result_paths"].items():
+                file_download(f"{result_name}.csv", result_path, f"{result_name}.csv")
+        else:
+            st.session_state['pending_results_key'] = job["results_key"]
+
+    pending_results_key = st.session_state.get('pending_results_key')
+    if pending_results_key and st.session_state.get('loaded_results_key') != pending_results_key:
+        with stage("load_results"):
+            cached = load_results(pending_results_key)
+        if cached is None:
+            st.error("Detection results are no longer cached, run detection again.")
+        else:
+            pii_entities, hii_entities, risk_scores = cached
+            # Sessions that scan the same data share one store instead of keeping their own copies
+            entity_store = get_store(pending_results_key)
+            if entity_store is None:
+                with stage("entity_store", len(pii_entities) + len(hii_entities)):
+                    entity_store = EntityStore.from_frames(pii_entities, hii_entities)
+                    # Build the keyword indexes now rather than on the first keystroke
+                    entity_store.pii.keyword_index()
+                    entity_store.hii.keyword_index()
+                publish_store(pending_results_key, entity_store)
+            st.session_state['entity_store'] = entity_store
+            st.session_state['results_key'] = pending_results_key
+            st.session_state['loaded_results_key'] = pending_results_key
+            st.session_state['risk_scores'] = np.asarray(risk_scores)
+            # Jobs store their summary when they finish; results cached before that get one built once here
+            risk_history = get_risk_history()
+            risk_summary = risk_history.latest(pending_results_key)
+            if risk_summary is None:
+                with stage("risk_summary", len(risk_scores)):
+                    risk_summary = RiskSummary().add(pii_entities, hii_entities, risk_scores)
+                risk_history.record(risk_summary, pending_results_key, uploaded_file.name, detection_engine)
+            st.session_state['risk_summary'] = risk_summary
 
+            st.success("Detection completed.")
+            st.session_state['detection_ran'] = True
 
-            documents_to_index = [
-                {"id": i, "Entity": clean_string(entity), "Type": clean_string(entity_type)}
-                for i, (entity, entity_type) in enumerate(pii_flat + hii_flat)
-                if entity and entity_type
-            ]
+            pii_flat = list(zip(pii_entities["Entity"], pii_entities["Type"]))
+            hii_flat = list(zip(hii_entities["Entity"], hii_entities["Type"]))
+            documents_to_index = build_documents(pii_flat + hii_flat)
             if documents_to_index:
-                from datetime import datetime
-
                 timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
                 index_name = f"pii_hii_data_{timestamp}"
-
-                try:
-                    client.create_index(index_name, {"primaryKey": "id"})
-                    run_index = client.index(index_name)
-
-                    run_index.add_documents(documents_to_index)
-                    st.success(f" Detection results indexed in Meilisearch index: `{index_name}`")
-                except Exception as e:
-                    st.error(f" Failed to create/index data: {e}")
+                st.session_state['indexing_job'] = IndexingJob(
+                    client, index_name, documents_to_index,
+                    batch_size=int(os.getenv("MEILI_BATCH_SIZE", DEFAULT_INDEX_BATCH_SIZE))
+                )
             else:
                 st.warning(" No entities to index. Check detection logic.")
-    pii_df = pd.DataFrame(st.session_state.get("pii", []))
-    hii_df = pd.DataFrame(st.session_state.get("hii", []))
-
-    RISK_SCORES = {
-        "EMAIL": 2,
-        "PHONE": 2,
-        "CREDIT_CARD": 5,
-        "ADDRESS": 3,
-        "ID": 4,
-        "NAME": 1,
-        "BLOOD_TYPE": 1,
-        "WEIGHT": 1,
-        "HEIGHT": 1,
-        "ALLERGIES": 2,
-        "MEDICAL_CONDITIONS": 4,
-        "MEDICATIONS": 3,
-        "DOCTOR": 2,
-        "HOSPITAL": 2,
-        "INSURANCE": 3
-    }
-
-    if not pii_df.empty and "Risk_Score" not in pii_df.columns:
-        pii_df["Risk_Score"] = pii_df["Type"].apply(lambda t: RISK_SCORES.get(t.upper(), 1))
-
-    if not hii_df.empty and "Risk_Score" not in hii_df.columns:
-        hii_df["Risk_Score"] = hii_df["Type"].apply(lambda t: RISK_SCORES.get(t.upper(), 1))
-
-    detected_types = sorted(set(
-        (pii_df['Type'].unique().tolist() if 'Type' in pii_df else []) +
-        (hii_df['Type'].unique().tolist() if 'Type' in hii_df else [])
-    ))
+
+    # Row risk scores stay attached to the dataset on every rerun, not just the one that ran detection
+    risk_scores = st.session_state.get('risk_scores')
+    if risk_scores is not None and st.session_state.get('results_key') == results_key and not stream_mode:
+        if detection_engine == "Descriptive Data":
+            df = df[df[text_column(schema)].notna()].copy()  # Filter rows directly on df to maintain row index match
+        if len(risk_scores) == len(df):
+            df["Risk_Score"] = risk_scores
+
+    # Meilisearch indexing runs in the background, report on it at every rerun until it settles
+    indexing_job = st.session_state.get('indexing_job')
+    if indexing_job is not None:
+        if indexing_job.error is not None:
+            st.error(f" Failed to create/index data: {indexing_job.error}")
+        elif indexing_job.done:
+            st.success(f" Detection results indexed in Meilisearch index: `{indexing_job.index_name}` "
+                       f"({indexing_job.stats['documents']:,} docs, {indexing_job.stats['docs_per_sec']:,.0f} docs/s)")
+        else:
+            st.info(f" Indexing into `{indexing_job.index_name}`: "
+                    f"{indexing_job.indexed:,}/{indexing_job.total:,} documents...")
+
+    entity_store = st.session_state.get('entity_store') or EntityStore.from_frames(None, None)
+    tables = {"PII": entity_store.pii, "HII": entity_store.hii}
+
     st.sidebar.title(" Detection Controls")
-    data_sources = []
-    if not pii_df.empty:
-        data_sources.append("PII")
-    if not hii_df.empty:
-        data_sources.append("HII")
+    data_sources = [group_name for group_name, table in tables.items() if len(table)]
 
     if data_sources:
+        st.sidebar.caption(f"Entity store: {len(entity_store):,} entities, "
+                           f"{entity_store.bytes_per_entity():.0f} bytes/entity")
         detection_choice = st.sidebar.radio("Select Entity Table to View", ["Both"] + data_sources)
 
         selected_types = []
         if detection_choice in ["Both", "PII"]:
-            pii_types = pii_df['Type'].dropna().astype(str).unique().tolist() if not pii_df.empty else []
+            pii_types = entity_store.pii.types()
             if pii_types:
                 selected_pii = st.sidebar.multiselect("Select PII Types", pii_types, default=pii_types)
                 selected_types += selected_pii
 
         if detection_choice in ["Both", "HII"]:
-            hii_types = hii_df['Type'].dropna().astype(str).unique().tolist() if not hii_df.empty else []
+            hii_types = entity_store.hii.types()
             if hii_types:
                 selected_hii = st.sidebar.multiselect("Select HII Types", hii_types, default=hii_types)
                 selected_types += selected_hii
+
+        # The multiselects start with every type selected, which filters nothing
+        all_types = {etype for group_name in data_sources for etype in tables[group_name].types()}
+        if (detection_choice == "Both" or len(data_sources) == 1) and set(selected_types) == all_types:
+            selected_types = []
     else:
         st.sidebar.info("No detected data available to filter.")
         selected_types = []
-    if selected_types:
-        if detection_choice in ["Both", "PII"] and not pii_df.empty:
-            pii_df = pii_df[pii_df['Type'].isin(selected_types)]
-        else:
-            pii_df = pd.DataFrame()
 
-        if detection_choice in ["Both", "HII"] and not hii_df.empty:
-            hii_df = hii_df[hii_df['Type'].isin(selected_types)]
-        else:
-            hii_df = pd.DataFrame()
+    # Row masks over the shared store; nothing is copied until the filtered view is rendered
+    masks = {group_name: table.all_rows() for group_name, table in tables.items()}
+    if selected_types:
+        for group_name, table in tables.items():
+            if detection_choice in ["Both", group_name]:
+                masks[group_name] = table.type_mask(selected_types)
+            else:
+                masks[group_name] = np.zeros(len(table), dtype=bool)
 
     # Redaction by group
-    grouped_dataframes = {"PII": pii_df, "HII": hii_df}
     redact_map = {}
 
-    for idx, (group_name, group_df) in enumerate(grouped_dataframes.items()):
-        if not group_df.empty and 'Type' in group_df.columns:
+    for idx, (group_name, table) in enumerate(tables.items()):
+        if masks[group_name].any():
             st.sidebar.markdown(f"###  Redaction Settings for {group_name}")
             unique_prefix = f"{group_name}_{idx}"
             enable_redact = st.sidebar.checkbox(f"Enable Redaction for {group_name}", key=f"mask_{unique_prefix}")
 
             if enable_redact:
-                type_list = group_df['Type'].dropna().unique().tolist()
+                type_list = table.types(masks[group_name])
                 selected_redact_types = st.sidebar.multiselect(
                     f"Redact these {group_name} types",
                     type_list,
@@ -488,40 +452,64 @@ if authentication_status:
             else:
                 redact_map[group_name] = []
 
+    redaction_mode = "redact"
+    # Secret per deployment, so hashed values cannot be reversed by hashing every possible SSN or phone
+    hash_salt = redaction_salt()
+    if any(redact_map.values()):
+        redaction_mode = st.sidebar.selectbox("Redaction Mode", REDACTION_MODES,
+                                              help="redact: [REDACTED], hash: salted SHA-256 prefix, "
+                                                   "partial: keep the last characters")
+
+    keyword = st.sidebar.text_input("Filter Keyword", key="filter_k",
+                                    help="Case-insensitive substring match, served from an in-process index.")
+    fuzzy_search = False
+    if keyword and indexing_job is not None and indexing_job.done and indexing_job.error is None:
+        fuzzy_search = st.sidebar.checkbox("Also fuzzy match via Meilisearch", key="filter_fuzzy")
+
+    # Stages below only recompute when their own inputs change; results_key identifies the detected data
+    results_key = st.session_state.get('results_key')
+    redact_state = (tuple((group_name, tuple(types)) for group_name, types in redact_map.items()), redaction_mode)
+    filter_state = (results_key, tuple(selected_types), detection_choice if selected_types else None, keyword,
+                    fuzzy_search)
+    view_key = filter_state + (redact_state,)
+    # Counts only depend on redaction when the keyword is matched against masked values
+    counts_key = filter_state + ((redact_state,) if keyword else ())
+
+    def filtered_view():
+        view_masks = dict(masks)
+        fuzzy_hits = None
+        if fuzzy_search:
+            try:
+                fuzzy_hits = search_entities(client, indexing_job.index_name, keyword)
+            except Exception as e:
+                st.sidebar.warning(f"Meilisearch fuzzy search unavailable, showing exact matches only: {e}")
+        if keyword:
+            for group_name, table in tables.items():
+                keyword_mask = table.contains(keyword, redact_map.get(group_name, []), redaction_mode, hash_salt)
+                if fuzzy_hits:
+                    keyword_mask |= table.matches_values(fuzzy_hits, redact_map.get(group_name, []))
+                view_masks[group_name] = view_masks[group_name] & keyword_mask
+        return (entity_store.pii.frame(view_masks["PII"], redact_map.get("PII", []), redaction_mode, hash_salt),
+                entity_store.hii.frame(view_masks["HII"], redact_map.get("HII", []), redaction_mode, hash_salt))
+
+    pii_df, hii_df = DASHBOARD_CACHE.get("view", view_key, filtered_view)
+    # Unfiltered counts come straight from the summary detection produced
+    risk_summary = st.session_state.get('risk_summary') if results_key else None
+    if risk_summary is not None and not selected_types and not keyword:
+        pii_counts, hii_counts = DASHBOARD_CACHE.get(
+            "counts", counts_key,
+            lambda: (summary_type_counts(risk_summary, "PII"), summary_type_counts(risk_summary, "HII")))
+    else:
+        pii_counts, hii_counts = DASHBOARD_CACHE.get("counts", counts_key,
+                                                     lambda: (type_counts(pii_df), type_counts(hii_df)))
+    summary = DASHBOARD_CACHE.get("summary", counts_key, lambda: summary_stats(pii_counts, hii_counts))
 
-    # Redaction logic
-    def mask_entity(value, entity_type, active_types):
-        if not value:
-            return value
-        if entity_type in active_types:
-            return '[REDACTED]'
-        return value
-
-
-    for group_name, df in grouped_dataframes.items():
-        if not df.empty:
-            redact_types = redact_map.get(group_name, [])
-            grouped_dataframes[group_name]['Entity'] = df.apply(
-                lambda row: mask_entity(row['Entity'], row['Type'], redact_types),
-                axis=1
-            )
-
-    pii_df = grouped_dataframes.get("PII", pd.DataFrame())
-    hii_df = grouped_dataframes.get("HII", pd.DataFrame())
-
-    keyword = st.sidebar.text_input("Filter Keyword", key="filter_k")
-    if keyword:
-        pii_df = pii_df[pii_df['Entity'].str.contains(keyword, na=False)]
-        hii_df = hii_df[hii_df['Entity'].str.contains(keyword, na=False)]
-
-    summary_df = pd.concat([pii_df, hii_df], ignore_index=True)
-
-    if not summary_df.empty:
+    if summary["total_entities"]:
         st.subheader(" Detection Summary Overview")
-        total_rows = len(df)
-        total_entities = len(summary_df)
-        most_common_entity_type = summary_df['Type'].value_counts().idxmax()
-        most_common_count = summary_df['Type'].value_counts().max()
+        total_rows = risk_summary.rows if risk_summary is not None else len(df)
+        total_entities = summary["total_entities"]
+        most_common_entity_type = summary["most_common_type"]
+        most_common_count = summary["most_common_count"]
 
         col1, col2, col3 = st.columns(3)
         with col1:
@@ -538,36 +526,37 @@ if authentication_status:
                 unsafe_allow_html=True)
     else:
         st.info(" No entities found to summarize.")
-    if "Risk_Score" in df.columns:
+    if risk_summary is not None and risk_summary.rows:
         st.subheader("Risk Assessment")
-        avg_risk = df["Risk_Score"].mean()
-        max_risk = df["Risk_Score"].max()
-        min_risk = df["Risk_Score"].min()
+        risk = risk_summary.stats()
 
         col4, col5, col6 = st.columns(3)
         with col4:
-            st.metric("Avg Risk", f"{avg_risk:.2f}")
+            st.metric("Avg Risk", f"{risk['avg_risk']:.2f}")
         with col5:
-            st.metric("Max Risk", f"{max_risk}")
+            st.metric("Max Risk", f"{risk['max_risk']}")
         with col6:
-            st.metric("Min Risk", f"{min_risk}")
+            st.metric("Min Risk", f"{risk['min_risk']}")
+        col7, col8, col9 = st.columns(3)
+        with col7:
+            st.metric("Median Risk", f"{risk['p50_risk']}")
+        with col8:
+            st.metric("p90 Risk", f"{risk['p90_risk']}")
+        with col9:
+            st.metric("p99 Risk", f"{risk['p99_risk']}")
+        st.bar_chart(risk_summary.histogram_bins(), x="risk", y="rows")
+        st.caption("Highest-risk rows")
+        st.dataframe([{"row": row, "risk": score} for score, _, row in risk_summary.top_rows],
+                     use_container_width=True)
+        with st.expander("Risk Trend"):
+            st.dataframe(get_risk_history().history(source=uploaded_file.name), use_container_width=True)
 
-    if not pii_df.empty and "Type" in pii_df.columns:
+    if not pii_df.empty:
         st.subheader(" PII Entity Distribution")
-        pii_counts = pii_df["Type"].value_counts()
         if len(pii_counts) == 0:
             st.warning("No PII entities were detected in this dataset.")
         else:
-            fig = px.bar(
-                pii_counts,
-                x=pii_counts.index,
-                y=pii_counts.values,
-                text=pii_counts.values,
-                color=pii_counts.index,
-                labels={'x': 'PII Type', 'y': 'Count'},
-                title="Distribution of Detected PII Types",
-                color_discrete_sequence=px.colors.qualitative.Set1
-            )
+            fig = DASHBOARD_CACHE.get("distribution", counts_key, lambda: distribution_figure(pii_counts))
             st.plotly_chart(fig)
     if 'detection_ran' in st.session_state and st.session_state['detection_ran']:
         if not pii_df.empty:
@@ -588,45 +577,103 @@ if authentication_status:
 
 
     #  WordCloud
-    def safe_wordcloud(pii_df, hii_df):
-        pii_entities = pii_df['Entity'].dropna().astype(str).tolist() if 'Entity' in pii_df.columns else []
-        hii_entities = hii_df['Entity'].dropna().astype(str).tolist() if 'Entity' in hii_df.columns else []
-
-        combined = pii_entities + hii_entities
-
-        if combined:
-            text = ' '.join(combined)
-            wc = WordCloud(width=800, height=400, background_color="white").generate(text)
-            st.subheader("Entity Word Cloud")
-            st.image(wc.to_array(), use_container_width=True)
-        else:
-            st.info(" No entities detected to generate a word cloud.")
-
-
-    safe_wordcloud(pii_df, hii_df)
+    frequencies = DASHBOARD_CACHE.get("frequencies", view_key, lambda: entity_frequencies([pii_df, hii_df]))
+    if frequencies:
+        st.subheader("Entity Word Cloud")
+        st.image(DASHBOARD_CACHE.get("wordcloud", view_key, lambda: wordcloud_image(frequencies)),
+                 use_container_width=True)
+    else:
+        st.info(" No entities detected to generate a word cloud.")
+
+    # Redacted copy of the uploaded rows themselves, written once per results, types, mode and salt by a job
+    # worker from the spans detection stored, and reused by the download and the ZIP export
+    source_redact_types = redact_map.get("PII", []) + redact_map.get("HII", [])
+    redaction_job_id = redaction_job = None
+    if source_redact_types and results_key:
+        redaction_job_id = "redact_" + hashlib.sha256(json.dumps(
+            [results_key, sorted(source_redact_types), redaction_mode, hash_salt]).encode()).hexdigest()[:24]
+
+        def submit_redaction():
+            return JOB_QUEUE.submit_redaction(
+                redaction_job_id, file_path, detection_engine, results_key, source_redact_types, redaction_mode,
+                model=ner_model, batch_size=int(ner_batch_size), n_process=int(ner_n_process), schema=schema)
+
+        if st.button("Create Redacted Source CSV"):
+            submit_redaction()
+        redaction_job = JOB_QUEUE.status(redaction_job_id)
+        if redaction_job is not None:
+            if redaction_job["status"] in ("queued", "running"):
+                total_rows = redaction_job.get("total_rows") or 0
+                st.progress(min(redaction_job["rows_done"] / total_rows, 1.0) if total_rows else 0.0)
+                st.info(f" Redacting source: {redaction_job['rows_done']:,}/{total_rows:,} rows")
+                poll_job = True
+            elif redaction_job["status"] == "done":
+                st.success(f"Redacted {redaction_job['rows_done']:,} source rows "
+                           f"({', '.join(redaction_job['redact_types'])}).")
+                file_download("Redacted Source CSV", redaction_job["output_path"], f"redacted_{uploaded_file.name}")
+            elif redaction_job.get("error"):
+                st.error(f"Redaction failed: {redaction_job['error']}")
     # advanced search button
     if st.button("Advanced Search"):
         import webbrowser
 
         webbrowser.open(os.getenv("MEILISEARCH"))
 
-    # Secure ZIP download
+    # Secure ZIP download, rebuilt only when the exported data, contents or password change
     if zip_password:
-        files = {}
-        if not pii_df.empty:
-            files['pii.csv'] = pii_df.to_csv(index=False)
-        if not hii_df.empty:
-            files['hii.csv'] = hii_df.to_csv(index=False)
-
-        with pyzipper.AESZipFile("secure_data.zip", 'w', compression=pyzipper.ZIP_DEFLATED,
-                                 encryption=pyzipper.WZ_AES) as zipf:
-            zipf.setpassword(zip_password.encode())
-            for fname, content in files.items():
-                zipf.writestr(fname, content)
-
-        with open("secure_data.zip", "rb") as zip_file:
-            st.download_button("Download Encrypted ZIP", zip_file, file_name="secure_data.zip", mime="application/zip")
+        export_options = EXPORT_OPTIONS if source_redact_types else EXPORT_OPTIONS[:2]
+        export_contents = st.multiselect("Encrypted ZIP contents", export_options, default=["CSV"])
+        redacted_source, zip_ready = None, True
+        if "Redacted source CSV" in export_contents and redaction_job_id is not None:
+            if redaction_job is None or redaction_job["status"] not in ("queued", "running", "done"):
+                submit_redaction()
+                redaction_job = JOB_QUEUE.status(redaction_job_id)
+            if redaction_job["status"] == "done":
+                redacted_source = (f"redacted_{uploaded_file.name}", redaction_job["output_path"])
+            else:
+                st.info("The ZIP is built once the redacted source CSV is ready.")
+                zip_ready, poll_job = False, True
+        # The filtered entity tables only matter when they are exported
+        exported_view = view_key if {"CSV", "Parquet"} & set(export_contents) else None
+        export_key = (exported_view, hashlib.sha256(zip_password.encode()).hexdigest(), tuple(export_contents),
+                      redacted_source)
+        secure_export = st.session_state.get('secure_export')
+        if zip_ready and (secure_export is None or secure_export["key"] != export_key):
+            if secure_export is not None:
+                secure_export["buffer"].close()
+            with st.spinner("Building encrypted ZIP..."):
+                buffer = build_encrypted_zip(zip_password, {"pii": pii_df, "hii": hii_df},
+                                             csv="CSV" in export_contents, parquet="Parquet" in export_contents,
+                                             redacted_source=redacted_source)
+            secure_export = {"key": export_key, "buffer": buffer}
+            st.session_state['secure_export'] = secure_export
+
+        if zip_ready:
+            secure_export["buffer"].seek(0)
+            st.download_button("Download Encrypted ZIP", secure_export["buffer"], file_name="secure_data.zip",
+                               mime="application/zip")
     else:
         st.warning("Set a password to enable secure ZIP download.")
 
-    st.markdown("---")
\ No newline at end of file
+    st.sidebar.caption(f"Meilisearch HTTP calls this rerun: {client.thread_http_calls - meili_calls_at_start}")
+    with st.sidebar.expander("Dashboard Stage Cache"):
+        for stage_name, stage_stats in DASHBOARD_CACHE.stats().items():
+            st.write(f"**{stage_name}**: {stage_stats['hits']} hits, {stage_stats['misses']} misses, "
+                     f"{stage_stats['seconds']:.2f}s computing")
+    if st.sidebar.checkbox("Show pipeline metrics"):
+        st.subheader("Pipeline Metrics")
+        metrics_snapshot = METRICS.snapshot()
+        st.dataframe([{"stage": stage_name, **stage_stats} for stage_name, stage_stats in metrics_snapshot.items()],
+                     use_container_width=True)
+        st.download_button("Download metrics (JSON)", json.dumps(metrics_snapshot, indent=2),
+                           file_name="pipeline_metrics.json", mime="application/json")
+        st.download_button("Download metrics (Prometheus)", METRICS.prometheus_text(),
+                           file_name="pipeline_metrics.prom", mime="text/plain")
+    if METRICS_PROM_FILE:
+        METRICS.write_prometheus(METRICS_PROM_FILE)
+    st.markdown("---")
+
+    # Keep polling while a detection job is in flight; everything above has rendered by now
+    if poll_job:
+        time.sleep(JOB_POLL_SECONDS)
+        st.rerun()
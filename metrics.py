@@ -0,0 +1,211 @@
+import json
+import os
+import resource
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+
+# Optional sinks: one JSON line per stage run, and a Prometheus text file (node_exporter textfile collector format)
+METRICS_LOG = os.getenv("METRICS_LOG")
+METRICS_PROM_FILE = os.getenv("METRICS_PROM_FILE")
+# Recent latencies kept per stage for percentiles
+MAX_SAMPLES = 1024
+PERCENTILES = (50, 90, 99)
+
+
+def resident_memory_mb():
+    """Returns the current resident set size of this process in MB."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        return peak_memory_mb()
+
+
+def peak_memory_mb():
+    """Returns the peak resident set size of this process in MB, since start or the last reset_peak_memory()."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS and kilobytes on Linux
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def reset_peak_memory():
+    # Linux only; elsewhere the peak stays process-wide
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+# Stages open in this process; only the outermost resets the peak, so a nested or concurrent
+# stage does not wipe the peak of a stage that is still running
+_open_stages = 0
+_open_stages_lock = threading.Lock()
+
+
+def _enter_stage():
+    global _open_stages
+    with _open_stages_lock:
+        if not _open_stages:
+            reset_peak_memory()
+        _open_stages += 1
+
+
+def _exit_stage():
+    global _open_stages
+    with _open_stages_lock:
+        _open_stages -= 1
+
+
+def _new_entry(max_samples):
+    return {"calls": 0, "rows": 0, "wall_seconds": 0.0, "cpu_seconds": 0.0, "peak_rss_mb": 0.0,
+            "last_wall_seconds": 0.0, "samples": deque(maxlen=max_samples)}
+
+
+class StageMetrics:
+    """Thread-safe per-stage totals of wall time, CPU time, rows and peak memory.
+
+    CPU time and peak memory are process-wide, so stages running concurrently in other
+    sessions or threads are included in each other's figures. The peak is reset only when no
+    other stage is open, so a stage that starts inside another reports the peak since the outer
+    stage started.
+    """
+
+    def __init__(self, max_samples=MAX_SAMPLES, log_path=None):
+        self.max_samples = max_samples
+        self.log_path = log_path
+        self._stages = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name, rows=0):
+        """Measures the enclosed block as one run of stage name.
+
+        Yields a dict whose "rows" callers may set once they know how many rows were processed.
+        """
+        sample = {"rows": rows}
+        _enter_stage()
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield sample
+        finally:
+            peak = peak_memory_mb()
+            _exit_stage()
+            self.record(name, time.perf_counter() - wall, time.process_time() - cpu, sample["rows"], peak)
+
+    def record(self, name, wall_seconds, cpu_seconds=0.0, rows=0, peak_rss_mb=0.0):
+        """Adds one run of stage name."""
+        with self._lock:
+            entry = self._stages.get(name)
+            if entry is None:
+                entry = self._stages[name] = _new_entry(self.max_samples)
+            entry["calls"] += 1
+            entry["rows"] += rows
+            entry["wall_seconds"] += wall_seconds
+            entry["cpu_seconds"] += cpu_seconds
+            entry["peak_rss_mb"] = max(entry["peak_rss_mb"], peak_rss_mb)
+            entry["last_wall_seconds"] = wall_seconds
+            entry["samples"].append(wall_seconds)
+        if self.log_path:
+            line = json.dumps({"ts": time.time(), "pid": os.getpid(), "stage": name, "wall_seconds": wall_seconds,
+                               "cpu_seconds": cpu_seconds, "rows": rows, "peak_rss_mb": peak_rss_mb})
+            with open(self.log_path, "a") as f:
+                f.write(line + "\n")
+
+    def merge(self, snapshot):
+        """Adds the totals (and samples, if present) of a snapshot taken in another process, e.g. a job worker."""
+        with self._lock:
+            for name, stats in snapshot.items():
+                entry = self._stages.get(name)
+                if entry is None:
+                    entry = self._stages[name] = _new_entry(self.max_samples)
+                for field in ("calls", "rows", "wall_seconds", "cpu_seconds"):
+                    entry[field] += stats[field]
+                entry["peak_rss_mb"] = max(entry["peak_rss_mb"], stats["peak_rss_mb"])
+                entry["last_wall_seconds"] = stats["last_wall_seconds"]
+                entry["samples"].extend(stats.get("samples", ()))
+
+    def snapshot(self, samples=False):
+        """Returns {stage: stats dict} with totals, rows/sec and latency percentiles in milliseconds."""
+        with self._lock:
+            entries = {name: dict(entry, samples=list(entry["samples"])) for name, entry in self._stages.items()}
+        result = {}
+        for name, entry in entries.items():
+            latencies = np.asarray(entry["samples"]) * 1000
+            stats = {field: entry[field] for field in
+                     ("calls", "rows", "wall_seconds", "cpu_seconds", "peak_rss_mb", "last_wall_seconds")}
+            seconds = entry["wall_seconds"]
+            stats["rows_per_sec"] = entry["rows"] / seconds if entry["rows"] and seconds else None
+            stats["max_ms"] = float(latencies.max()) if len(latencies) else None
+            for p, value in zip(PERCENTILES, np.percentile(latencies, PERCENTILES) if len(latencies)
+                                else [None] * len(PERCENTILES)):
+                stats[f"p{p}_ms"] = None if value is None else float(value)
+            if samples:
+                stats["samples"] = entry["samples"]
+            result[name] = stats
+        return result
+
+    def reset(self):
+        with self._lock:
+            self._stages.clear()
+
+    def prometheus_text(self, prefix="pii_stage"):
+        """Renders the totals in the Prometheus text exposition format."""
+        metrics = [
+            ("calls_total", "counter", "Stage runs.", "calls"),
+            ("rows_total", "counter", "Rows processed by the stage.", "rows"),
+            ("wall_seconds_total", "counter", "Wall-clock seconds spent in the stage.", "wall_seconds"),
+            ("cpu_seconds_total", "counter", "Process CPU seconds spent in the stage.", "cpu_seconds"),
+            ("peak_rss_bytes", "gauge", "Peak resident memory seen during the stage.", "peak_rss_mb"),
+            ("last_wall_seconds", "gauge", "Wall-clock seconds of the latest run.", "last_wall_seconds"),
+        ]
+        snapshot = self.snapshot()
+        lines = []
+        for suffix, kind, help_text, field in metrics:
+            lines += [f"# HELP {prefix}_{suffix} {help_text}", f"# TYPE {prefix}_{suffix} {kind}"]
+            for name, stats in snapshot.items():
+                value = stats[field] * 1024 * 1024 if field == "peak_rss_mb" else stats[field]
+                label = name.replace("\\", "\\\\").replace('"', '\\"')
+                lines.append(f'{prefix}_{suffix}{{stage="{label}"}} {float(value)!r}')
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        """Atomically rewrites path with prometheus_text(), for a textfile collector to scrape."""
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(self.prometheus_text())
+        os.replace(tmp_path, path)
+
+
+# Shared by every session of the app process; job workers keep their own and hand back snapshots
+METRICS = StageMetrics(log_path=METRICS_LOG)
+
+
+def stage(name, rows=0):
+    """Measures a block as one run of stage name in the process-wide METRICS."""
+    return METRICS.stage(name, rows)
+
+
+def timed_chunks(name, chunks):
+    """Yields from chunks, measuring the production of each one (e.g. parsing a CSV chunk) as stage name."""
+    iterator = iter(chunks)
+    while True:
+        with stage(name) as sample:
+            chunk = next(iterator, None)
+            sample["rows"] = 0 if chunk is None else len(chunk)
+        if chunk is None:
+            return
+        yield chunk
@@ -0,0 +1,130 @@
+import re
+import threading
+import time
+from bisect import bisect_right
+from collections import OrderedDict
+
+from detection import DEFAULT_BATCH_SIZE, detect_ner_spans
+
+DEFAULT_MAX_ENTRIES = 200_000
+
+
+def normalize_text(text):
+    """Collapses whitespace so trivially different copies of a text share one cache entry."""
+    return " ".join(text.split())
+
+
+_TOKEN = re.compile(r"\S+")
+
+
+def _token_offsets(text):
+    # Start of every whitespace-separated token in text and in its normalized form, plus token lengths
+    raw, norm, lengths = [], [], []
+    pos = 0
+    for match in _TOKEN.finditer(text):
+        raw.append(match.start())
+        norm.append(pos)
+        lengths.append(match.end() - match.start())
+        pos += lengths[-1] + 1
+    return raw, norm, lengths
+
+
+def _map_offset(offset, from_starts, to_starts, lengths):
+    i = max(bisect_right(from_starts, offset) - 1, 0)
+    return to_starts[i] + min(offset - from_starts[i], lengths[i])
+
+
+def _map_spans(spans, text, normalized, to_normalized):
+    """Moves (start, end, label) spans between text and its normalized form."""
+    if not spans or text == normalized:
+        return spans
+    raw, norm, lengths = _token_offsets(text)
+    src, dst = (raw, norm) if to_normalized else (norm, raw)
+    return [(_map_offset(s, src, dst, lengths), _map_offset(e, src, dst, lengths), label) for s, e, label in spans]
+
+
+class NERMemo:
+    """Bounded LRU of text -> NER entities, shared across detection runs in this process."""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.rows = 0
+        self.cache_hits = 0
+        self.batch_duplicates = 0
+        self.inferred = 0
+        self.inference_seconds = 0.0
+
+    def detect_spans(self, nlp, texts, batch_size=DEFAULT_BATCH_SIZE, n_process=1, on_batch=None):
+        """Runs NER only on texts not seen before and returns (start, end, label) spans per text, in input order.
+
+        Spans are stored against the normalized text and mapped back onto each caller's own text.
+        """
+        texts = list(texts)
+        keys = [(id(nlp), normalize_text(text)) for text in texts]
+        results = [None] * len(keys)
+        pending = {}
+        hits = duplicates = 0
+
+        with self._lock:
+            for i, key in enumerate(keys):
+                spans = self._entries.get(key)
+                if spans is not None:
+                    self._entries.move_to_end(key)
+                    results[i] = spans
+                    hits += 1
+                elif key in pending:
+                    duplicates += 1
+                else:
+                    pending[key] = texts[i]
+
+        start = time.perf_counter()
+        detected = detect_ner_spans(nlp, list(pending.values()), batch_size=batch_size, n_process=n_process,
+                                    on_batch=on_batch)
+        elapsed = time.perf_counter() - start
+        fresh = {key: _map_spans(spans, text, key[1], to_normalized=True)
+                 for (key, text), spans in zip(pending.items(), detected)}
+
+        with self._lock:
+            for key, spans in fresh.items():
+                self._entries[key] = spans
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self.rows += len(keys)
+            self.cache_hits += hits
+            self.batch_duplicates += duplicates
+            self.inferred += len(fresh)
+            self.inference_seconds += elapsed
+
+        if on_batch and not pending:
+            on_batch(len(keys), len(keys))
+        return [_map_spans(spans if spans is not None else fresh[key], text, key[1], to_normalized=False)
+                for spans, key, text in zip(results, keys, texts)]
+
+    def detect(self, nlp, texts, batch_size=DEFAULT_BATCH_SIZE, n_process=1, on_batch=None):
+        """Like detect_spans, but returns (entity, label) pairs per text."""
+        texts = list(texts)
+        spans = self.detect_spans(nlp, texts, batch_size=batch_size, n_process=n_process, on_batch=on_batch)
+        return [[(text[start:end], label) for start, end, label in ents] for text, ents in zip(texts, spans)]
+
+    def stats(self):
+        """Returns hit-rate counters and an estimate of the NER time saved."""
+        with self._lock:
+            served = self.cache_hits + self.batch_duplicates
+            per_text = self.inference_seconds / self.inferred if self.inferred else 0.0
+            return {
+                "rows": self.rows,
+                "inferred": self.inferred,
+                "cache_hits": self.cache_hits,
+                "batch_duplicates": self.batch_duplicates,
+                "hit_rate": served / self.rows if self.rows else 0.0,
+                "entries": len(self._entries),
+                "inference_seconds": self.inference_seconds,
+                "saved_seconds_est": served * per_text,
+            }
+
+
+# Process-wide memo shared by all sessions, like the models in nlp_models
+NER_MEMO = NERMemo()
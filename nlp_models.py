@@ -0,0 +1,75 @@
+import importlib.util
+import json
+import os
+import threading
+import time
+
+from metrics import resident_memory_mb, stage
+
+MODEL_NAMES = {
+    "trf": "en_core_web_trf",
+    "lg": "en_core_web_lg",
+    "sm": "en_core_web_sm",
+}
+DEFAULT_MODEL = "trf"
+# detect_ner only reads doc.ents, everything else in the pipeline is wasted work
+DEFAULT_DISABLE = ("parser", "lemmatizer", "tagger", "attribute_ruler")
+
+_models = {}
+_load_stats = {}
+_lock = threading.Lock()
+
+
+def load_model(size=DEFAULT_MODEL, disable=DEFAULT_DISABLE):
+    """Loads a spaCy pipeline once per process and returns the shared instance."""
+    model_name = MODEL_NAMES.get(size, size)
+    key = (model_name, tuple(sorted(disable)))
+    nlp = _models.get(key)
+    if nlp is not None:
+        return nlp
+
+    with _lock:
+        nlp = _models.get(key)
+        if nlp is None:
+            rss_before = resident_memory_mb()
+            start = time.perf_counter()
+            with stage("model_load"):
+                # spaCy takes seconds to import, so pages that never load a model never pay for it
+                import spacy
+                nlp = spacy.load(model_name, exclude=list(disable))
+            load_seconds = time.perf_counter() - start
+            rss_after = resident_memory_mb()
+            _load_stats[key] = {
+                "model": model_name,
+                "components": list(nlp.pipe_names),
+                "load_seconds": load_seconds,
+                "rss_mb": rss_after,
+                "rss_delta_mb": rss_after - rss_before,
+            }
+            _models[key] = nlp
+    return nlp
+
+
+def model_version(nlp):
+    """Returns an identifier that changes whenever the loaded pipeline changes."""
+    meta = nlp.meta
+    return f"{meta['lang']}_{meta['name']}-{meta['version']}:{','.join(nlp.pipe_names)}"
+
+
+def package_version(size=DEFAULT_MODEL, disable=DEFAULT_DISABLE):
+    """Returns model_version(load_model(size, disable)) from the installed package's meta.json, without loading it."""
+    model_name = MODEL_NAMES.get(size, size)
+    spec = importlib.util.find_spec(model_name)
+    if spec is None or not spec.submodule_search_locations:
+        raise OSError(f"spaCy model {model_name} is not installed")
+    package_dir = list(spec.submodule_search_locations)[0]
+    with open(os.path.join(package_dir, "meta.json"), encoding="utf-8") as f:
+        meta = json.load(f)
+    skipped = set(disable) | set(meta.get("disabled", []))
+    pipes = [name for name in meta.get("pipeline", []) if name not in skipped]
+    return f"{meta['lang']}_{meta['name']}-{meta['version']}:{','.join(pipes)}"
+
+
+def model_stats():
+    """Returns load time and memory figures for every pipeline loaded so far."""
+    return list(_load_stats.values())
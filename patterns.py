@@ -0,0 +1,70 @@
+import re
+
+# Pattern group name -> RISK_SCORES type the match is reported (and scored) as
+PATTERN_TYPES = {
+    "EMAIL": "EMAIL",
+    "SSN": "ID",
+    "CREDIT_CARD": "CREDIT_CARD",
+    "PHONE": "PHONE",
+    "ZIP": "ADDRESS",
+}
+
+EMAIL_PATTERN = re.compile(r"(?<![\w.+-])[\w.+-]+@[\w-]+(?:\.[\w-]+)*\.[A-Za-z]{2,}\b")
+
+# Cheap scan for digit runs; only these spans are handed to the full NUMBER_PATTERN,
+# which keeps the expensive alternation off the (mostly alphabetic) rest of the text
+NUMBER_CANDIDATE = re.compile(r"[\d(+][\d ().x-]{3,}\d")
+
+# Alternatives are tried left to right, so the more specific numeric shapes come first
+NUMBER_PATTERN = re.compile(
+    r"(?P<SSN>(?<![\d-])\d{3}-\d{2}-\d{4}(?![\d-]))"
+    r"|(?P<CREDIT_CARD>(?<![\d-])\d(?:[ -]?\d){12,18}(?![\d-]))"
+    r"|(?P<PHONE>(?<![\w+])(?:\+?\d{1,3}[\s.-]?)?(?:\(\d{3}\)\s?|\d{3}[\s.-]?)\d{3}[\s.-]?\d{4}"
+    r"(?:\s?(?:x|ext\.?)\s?\d{1,5})?(?!\d)"
+    r"|(?<![\w+])\d{4}[\s.-]\d{3}[\s.-]\d{3}(?!\d))"
+    r"|(?P<ZIP>(?<=[A-Z]{2} )\d{5}(?:-\d{4})?(?![\d-]))"
+)
+
+
+def luhn_valid(number):
+    """Returns True if the digits in number pass the Luhn checksum."""
+    digits = [int(c) for c in number if c.isdigit()]
+    total = 0
+    for i, d in enumerate(reversed(digits)):
+        if i % 2:
+            d *= 2
+            if d > 9:
+                d -= 9
+        total += d
+    return len(digits) >= 13 and total % 10 == 0
+
+
+def find_patterns(text):
+    """Finds emails, phones, card numbers, SSNs and ZIPs in text and returns (start, end, type) spans."""
+    found = []
+    email_end = -1
+    if "@" in text:
+        for match in EMAIL_PATTERN.finditer(text):
+            found.append((match.start(), match.end(), "EMAIL"))
+            email_end = match.end()
+
+    for candidate in NUMBER_CANDIDATE.finditer(text):
+        if candidate.start() < email_end and any(s <= candidate.start() < e for s, e, _ in found):
+            continue
+        for match in NUMBER_PATTERN.finditer(text, candidate.start(), candidate.end()):
+            if match.lastgroup == "CREDIT_CARD" and not luhn_valid(match.group()):
+                continue
+            found.append((match.start(), match.end(), PATTERN_TYPES[match.lastgroup]))
+
+    found.sort(key=lambda item: item[0])
+    return found
+
+
+def detect_patterns(text):
+    """Finds emails, phones, card numbers, SSNs and ZIPs in text and returns (entity, type) pairs."""
+    return [(text[start:end], etype) for start, end, etype in find_patterns(text)]
+
+
+def detect_patterns_batch(texts):
+    """Runs detect_patterns over texts and returns one entity list per text, in input order."""
+    return [detect_patterns(text) for text in texts]
@@ -0,0 +1,179 @@
+import hashlib
+import json
+import re
+
+import numpy as np
+import pandas as pd
+
+from detection import (DEFAULT_BATCH_SIZE, HII_COLUMNS, PII_COLUMNS, detect_descriptive_spans, entity_risk_scores)
+from metrics import stage
+from patterns import find_patterns
+
+# Rows sampled per column, and characters read per value, so profiling costs the same for any file size
+PROFILE_ROWS = 1000
+PROFILE_MAX_CHARS = 1000
+# Average words per value from which a column is free text for NER
+TEXT_MIN_TOKENS = 5
+# Share of values that are exactly one pattern match for the whole column to take that type
+RULE_MIN_RATE = 0.8
+# Share of values containing a pattern match for the column to be scanned with the patterns
+REGEX_MIN_RATE = 0.05
+# Short capitalised values with this many distinct values are names, reported as NAME without running NER,
+# when the column is also called a name; capitalised hobbies, departments or products are not
+NAME_MIN_RATE = 0.8
+NAME_MIN_DISTINCT = 0.3
+NAME_COLUMN = re.compile(r"(?:^|[^a-z])(?:first|last|full|middle|maiden|given|family|sur|fore)?_?name$", re.I)
+
+# Columns the tabular engine already reads by name, with the entity type it reports for them
+KNOWN_COLUMN_TYPES = {col: etype for etype, cols in PII_COLUMNS.items() for col in cols}
+KNOWN_COLUMN_TYPES.update({col: etype for etype, col in HII_COLUMNS.items()})
+
+
+def profile_column(name, values):
+    """Profiles a sample of one column's values and picks the detector the column is routed to.
+
+    route is "rule" (every value is an entity of type), "regex" (scan values with the patterns),
+    "ner" (free text for the NER model) or "skip".
+    """
+    present = values.dropna()
+    texts = present.astype(str).str.slice(0, PROFILE_MAX_CHARS)
+    texts = texts[texts.str.strip() != ""]
+    n = len(texts)
+    profile = {"column": name, "sampled": n, "distinct_ratio": 0.0, "avg_tokens": 0.0, "numeric_rate": 0.0,
+               "capitalized_rate": 0.0, "pattern_rate": 0.0, "match_rate": 0.0, "route": "skip", "type": None,
+               "known": name in KNOWN_COLUMN_TYPES}
+    dominant = None
+    if n:
+        hits = [find_patterns(text) for text in texts]
+        # A value that is one pattern match from end to end, e.g. a bare email or phone number
+        whole = pd.Series([spans[0][2] if len(spans) == 1 and spans[0][0] == 0 and spans[0][1] == len(text)
+                           else None for text, spans in zip(texts.str.strip(), hits)], dtype=object)
+        counts = whole.value_counts()
+        if len(counts):
+            dominant = counts.index[0]
+        profile.update(
+            distinct_ratio=texts.nunique() / n,
+            avg_tokens=float((texts.str.count(r"\s+") + 1).mean()),
+            numeric_rate=float(pd.to_numeric(texts, errors="coerce").notna().mean()),
+            capitalized_rate=float(texts.str.match(r"\s*[A-Z]").mean()),
+            pattern_rate=sum(1 for spans in hits if spans) / n,
+            match_rate=float(counts.iloc[0]) / n if len(counts) else 0.0,
+        )
+
+    if profile["known"]:
+        profile.update(route="rule", type=KNOWN_COLUMN_TYPES[name])
+    elif not n:
+        pass
+    elif name == "text" or profile["avg_tokens"] >= TEXT_MIN_TOKENS:
+        profile["route"] = "ner"
+    elif profile["match_rate"] >= RULE_MIN_RATE:
+        profile.update(route="rule", type=dominant)
+    elif profile["pattern_rate"] >= REGEX_MIN_RATE:
+        profile["route"] = "regex"
+    elif (NAME_COLUMN.search(name) and profile["numeric_rate"] < NAME_MIN_RATE
+          and profile["capitalized_rate"] >= NAME_MIN_RATE and profile["distinct_ratio"] >= NAME_MIN_DISTINCT):
+        profile.update(route="rule", type="NAME")
+    return profile
+
+
+def profile_frame(df, rows=PROFILE_ROWS):
+    """Profiles the first rows of df and returns the schema: per-column profiles, engine and text column.
+
+    engine is "Descriptive Data" for files with a text column (one named text, or free text when no
+    column has a name the tabular engine knows), "Tabular Data" when any column has a detector, else None.
+    """
+    sample = df.head(rows)
+    with stage("profile", len(sample)):
+        columns = {str(name): profile_column(str(name), sample[name]) for name in sample.columns}
+
+    # Prose starts with a capital letter, serialised lists and token dumps do not
+    free_text = sorted((p for p in columns.values() if p["route"] == "ner" and p["avg_tokens"] >= TEXT_MIN_TOKENS),
+                       key=lambda p: (-p["capitalized_rate"], -p["avg_tokens"]))
+    lowered = {name.lower(): name for name in columns}
+    text_column = engine = None
+    if "text" in lowered:
+        text_column, engine = lowered["text"], "Descriptive Data"
+    elif any(p["known"] for p in columns.values()):
+        engine = "Tabular Data"
+        # fname and lname already cover names, a guess at other short columns would only add noise
+        if any(KNOWN_COLUMN_TYPES[name] == "NAME" for name in columns if name in KNOWN_COLUMN_TYPES):
+            for p in columns.values():
+                if not p["known"] and p["type"] == "NAME":
+                    p.update(route="skip", type=None)
+    elif free_text:
+        text_column, engine = free_text[0]["column"], "Descriptive Data"
+    elif any(p["route"] != "skip" for p in columns.values()):
+        engine = "Tabular Data"
+    return {"rows_sampled": len(sample), "engine": engine, "text_column": text_column, "columns": columns}
+
+
+def profile_file(file_path, rows=PROFILE_ROWS):
+    """Profiles a CSV from its first rows only, without reading the rest of the file."""
+    return profile_frame(pd.read_csv(file_path, nrows=rows), rows)
+
+
+def schema_version(schema):
+    """Returns a short digest of the column routing, for cache keys."""
+    routes = sorted((name, p["route"], p["type"]) for name, p in schema["columns"].items())
+    return hashlib.sha256(json.dumps([schema["text_column"], routes]).encode()).hexdigest()[:12]
+
+
+def routed_columns(schema, engine):
+    """Returns {column: profile} for the columns detect_routed_columns should scan under engine.
+
+    The tabular engine already reads the known columns; the descriptive engine runs NER on the
+    text column only, so its other free-text columns are scanned with the patterns instead.
+    """
+    routes = {}
+    for name, profile in schema["columns"].items():
+        if profile["route"] == "skip":
+            continue
+        if engine == "Tabular Data" and profile["known"]:
+            continue
+        if engine == "Descriptive Data":
+            if name == schema["text_column"]:
+                continue
+            if profile["route"] == "ner":
+                profile = dict(profile, route="regex")
+        routes[name] = profile
+    return routes
+
+
+def detect_routed_columns(chunk, routes, nlp=None, batch_size=DEFAULT_BATCH_SIZE, n_process=1, memo=None,
+                          on_spans=None):
+    """Runs each routed column's detector over a chunk and returns (Entity/Type table, per-row risk scores).
+
+    NER columns fall back to the patterns when no model is given. on_spans(column, row_ids, spans) gets
+    the SpanTable of every regex and NER column, row_ids being the chunk index of its scanned values.
+    """
+    rows, entities, types = [], [], []
+    for name, profile in routes.items():
+        if name not in chunk.columns:
+            continue
+        values = chunk[name]
+        positions = np.flatnonzero(values.notna().to_numpy())
+        if profile["route"] == "rule":
+            raw = values.iloc[positions].to_numpy(dtype=object)
+            keep = np.array([str(v).strip() != "" for v in raw], dtype=bool)
+            rows.append(positions[keep])
+            entities += raw[keep].tolist()
+            types += [profile["type"]] * int(keep.sum())
+            continue
+        texts = values.iloc[positions].astype(str).tolist()
+        if profile["route"] == "regex":
+            spans = detect_descriptive_spans(texts)
+        else:
+            with stage("ner" if nlp is not None else "patterns", len(texts)):
+                spans = detect_descriptive_spans(texts, nlp, batch_size=batch_size, n_process=n_process, memo=memo)
+        if on_spans:
+            on_spans(name, chunk.index[positions], spans)
+        detected = spans.entity_lists(texts)
+        found = [(pos, entity, etype) for pos, ents in zip(positions, detected) for entity, etype in ents if entity]
+        rows.append(np.array([pos for pos, _, _ in found], dtype=np.int64))
+        entities += [entity for _, entity, _ in found]
+        types += [etype for _, _, etype in found]
+
+    table = pd.DataFrame({"Entity": entities, "Type": types}, dtype=object)
+    rows = np.concatenate(rows) if rows else np.zeros(0, dtype=np.int64)
+    scores = np.bincount(rows, weights=entity_risk_scores(table["Type"]).to_numpy(), minlength=len(chunk))
+    return table, scores.astype(np.int64)
@@ -0,0 +1,250 @@
+import hashlib
+import os
+import secrets
+import threading
+
+import numpy as np
+import pandas as pd
+
+from detection import DEFAULT_BATCH_SIZE, HII_COLUMNS, PII_COLUMNS, detect_descriptive_spans
+from profiling import routed_columns
+from spans import SpanTable
+from streaming import DEFAULT_CHUNKSIZE, text_column
+
+REDACTION_MODES = ["redact", "hash", "partial"]
+REDACTED = '[REDACTED]'
+# Partial masking keeps this many trailing characters, and only on values long enough to hide the rest
+PARTIAL_VISIBLE = 4
+HASH_CHARS = 16
+# Secret hash salt of this deployment, unless REDACTION_SALT is set
+REDACTION_SALT_FILE = "tmp/redaction_salt"
+
+_salt = None
+_salt_lock = threading.Lock()
+
+
+def redaction_salt(path=REDACTION_SALT_FILE):
+    """Returns the deployment's secret salt for hash mode.
+
+    REDACTION_SALT wins; otherwise a random salt is created once in path (readable by the owner only)
+    and reused, so hashes of one value match across sessions and restarts but cannot be brute-forced
+    without the salt.
+    """
+    global _salt
+    if _salt is None:
+        with _salt_lock:
+            if _salt is None:
+                salt = os.getenv("REDACTION_SALT")
+                if not salt:
+                    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+                    try:
+                        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+                        with os.fdopen(fd, "w") as f:
+                            f.write(secrets.token_hex(32))
+                    except FileExistsError:
+                        pass
+                    with open(path) as f:
+                        salt = f.read().strip()
+                _salt = salt
+    return _salt
+
+
+def _hash_value(value, salt):
+    return hashlib.sha256(f"{salt}{value}".encode()).hexdigest()[:HASH_CHARS]
+
+
+def mask_values(values, mode="redact", salt=None):
+    """Masks every value in values and returns a Series of the masked strings.
+
+    redact replaces values with [REDACTED], hash with a truncated salted SHA-256 and
+    partial keeps the last PARTIAL_VISIBLE characters behind asterisks. salt defaults to redaction_salt().
+    """
+    values = pd.Series(values).reset_index(drop=True)
+    if not isinstance(values.dtype, pd.StringDtype):
+        values = values.astype(str)
+    if mode == "redact":
+        return pd.Series(REDACTED, index=values.index, dtype=values.dtype)
+    if mode == "hash":
+        if salt is None:
+            salt = redaction_salt()
+        # Hash each distinct value once and gather, repeated entities cost nothing extra
+        codes, uniques = pd.factorize(values)
+        hashed = np.array([_hash_value(v, salt) for v in uniques] or [""], dtype=object)
+        return pd.Series(hashed[codes], index=values.index, dtype=values.dtype)
+    if mode == "partial":
+        lengths = values.str.len().fillna(0).to_numpy(dtype=np.int64)
+        visible = np.where(lengths > 2 * PARTIAL_VISIBLE, PARTIAL_VISIBLE, 0)
+        # One asterisk run per distinct length, gathered rather than built per value
+        runs = np.array(["*" * k for k in range(lengths.max() + 1 if len(lengths) else 1)], dtype=object)
+        stars = pd.Series(runs[lengths - visible], index=values.index, dtype=values.dtype)
+        return stars + values.str[-PARTIAL_VISIBLE:].where(visible > 0, "")
+    raise ValueError(f"Unknown redaction mode: {mode}")
+
+
+def redact_where(values, redacted, mode="redact", salt=None):
+    """Returns values as a Series with the entries under the boolean mask redacted in their masked form."""
+    values = pd.Series(values).reset_index(drop=True)
+    if not redacted.any():
+        return values
+    masked = mask_values(values[redacted], mode, salt)
+    masked.index = np.flatnonzero(redacted)
+    if not isinstance(values.dtype, pd.StringDtype):
+        values = values.astype(object)
+    return values.mask(redacted, masked)
+
+
+def source_columns(redact_types, schema=None, engine="Tabular Data"):
+    """Returns the source columns whose whole values are entities of the given types.
+
+    Those are the columns the tabular engine reads by name and, with a schema, the columns
+    profiling routed to rule detection under engine.
+    """
+    columns = []
+    if engine == "Tabular Data":
+        for entity_type in redact_types:
+            for col in PII_COLUMNS.get(entity_type, []) + [HII_COLUMNS.get(entity_type)]:
+                if col and col not in columns:
+                    columns.append(col)
+    if schema is not None:
+        for col, profile in routed_columns(schema, engine).items():
+            if profile["route"] == "rule" and profile["type"] in redact_types and col not in columns:
+                columns.append(col)
+    return columns
+
+
+def span_columns(schema, engine):
+    """Returns {column: route} for the columns profiling routed to regex or NER detection under engine."""
+    if schema is None:
+        return {}
+    return {col: profile["route"] for col, profile in routed_columns(schema, engine).items()
+            if profile["route"] in ("regex", "ner")}
+
+
+def _redact_spans_in_column(chunk, col, redact_types, nlp=None, mode="redact", salt=None,
+                            batch_size=DEFAULT_BATCH_SIZE, n_process=1, memo=None, stored=None):
+    # Masks the entities of redact_types inside a column's values, in place, from the span records
+    # detection stored for the chunk, or by detecting them again when there are none
+    texts = chunk[col].dropna().astype(str)
+    if stored is not None:
+        found = stored[(stored["column"] == col).to_numpy(dtype=bool)]
+        spans = SpanTable.from_records(np.searchsorted(texts.index.to_numpy(), found["row"].to_numpy()),
+                                       found["start"], found["end"], found["label"].astype(object))
+    else:
+        spans = detect_descriptive_spans(texts, nlp, batch_size=batch_size, n_process=n_process, memo=memo)
+    chunk[col] = chunk[col].astype(object)
+    chunk.loc[texts.index, col] = rewrite_spans(texts, spans, redact_types, mode, salt)
+
+
+def _redact_routed(chunk, redact_types, schema, engine, nlp=None, mode="redact", salt=None,
+                   batch_size=DEFAULT_BATCH_SIZE, n_process=1, memo=None, stored=None):
+    # Masks whole-value columns, then entities inside the columns detection scanned for patterns or with NER
+    for col in source_columns(redact_types, schema, engine):
+        if col in chunk.columns:
+            present = chunk[col].notna().to_numpy()
+            chunk[col] = redact_where(chunk[col].astype(object), present, mode, salt).to_numpy()
+    for col, route in span_columns(schema, engine).items():
+        if col in chunk.columns:
+            _redact_spans_in_column(chunk, col, redact_types, nlp if route == "ner" else None, mode, salt,
+                                    batch_size, n_process, memo, stored)
+    return chunk
+
+
+def redact_tabular_chunk(chunk, redact_types, mode="redact", salt=None, schema=None, nlp=None,
+                         batch_size=DEFAULT_BATCH_SIZE, n_process=1, memo=None, stored=None):
+    """Masks the source columns of redact_types in a tabular chunk, column at a time.
+
+    With a profiling schema, columns routed to regex or NER detection have their entities masked in place,
+    at the spans of stored (the chunk's span records from detection) if given.
+    """
+    return _redact_routed(chunk.copy(), redact_types, schema, "Tabular Data", nlp, mode, salt, batch_size,
+                          n_process, memo, stored)
+
+
+def rewrite_spans(texts, spans, redact_labels, mode="redact", salt=None):
+    """Rewrites each text in a single pass, replacing the spans labelled with redact_labels by their masked form."""
+    texts = list(texts)
+    spans = spans.select(np.isin(spans.label_array(), list(redact_labels)))
+    if not len(spans):
+        return texts
+    masked = mask_values(spans.values(texts), mode, salt).tolist()
+    starts, ends = spans.starts.tolist(), spans.ends.tolist()
+    bounds = spans.row_bounds(len(texts)).tolist()
+
+    rewritten = []
+    for i, text in enumerate(texts):
+        lo, hi = bounds[i], bounds[i + 1]
+        if lo == hi:
+            rewritten.append(text)
+            continue
+        parts, pos = [], 0
+        for j in range(lo, hi):
+            # Spans are sorted by start; one overlapping an already masked span is covered by it
+            if starts[j] < pos:
+                continue
+            parts += [text[pos:starts[j]], masked[j]]
+            pos = ends[j]
+        parts.append(text[pos:])
+        rewritten.append("".join(parts))
+    return rewritten
+
+
+def redact_descriptive_chunk(chunk, redact_types, nlp=None, mode="redact", salt=None,
+                             batch_size=DEFAULT_BATCH_SIZE, n_process=1, memo=None, schema=None, stored=None):
+    """Masks the entities of redact_types in the text column of a chunk, detecting them unless stored
+    (the chunk's span records from detection) is given.
+
+    With a profiling schema, the profiled text column is used and the other routed columns are masked too.
+    """
+    chunk = chunk.copy()
+    _redact_spans_in_column(chunk, text_column(schema), redact_types, nlp, mode, salt, batch_size, n_process,
+                            memo, stored)
+    if schema is not None:
+        _redact_routed(chunk, redact_types, schema, "Descriptive Data", None, mode, salt, stored=stored)
+    return chunk
+
+
+def iter_redacted_chunks(file_path, engine, redact_types, mode="redact", salt=None, nlp=None,
+                         chunksize=DEFAULT_CHUNKSIZE, batch_size=DEFAULT_BATCH_SIZE, n_process=1, memo=None,
+                         schema=None, spans=None):
+    """Reads a source CSV chunk by chunk and yields each chunk with entities of redact_types masked.
+
+    schema is the profiling schema detection used, so the same columns are masked that produced entities.
+    spans are the span records detection stored (result_cache.load_spans); with them no text is detected
+    again, and nlp is only needed without them.
+    """
+    if mode not in REDACTION_MODES:
+        raise ValueError(f"Unknown redaction mode: {mode}")
+    rows = spans["row"].to_numpy() if spans is not None else None
+    for chunk in pd.read_csv(file_path, chunksize=chunksize):
+        stored = None
+        if spans is not None and len(chunk):
+            lo, hi = np.searchsorted(rows, [chunk.index[0], chunk.index[-1] + 1])
+            stored = spans.iloc[lo:hi]
+        if engine == "Tabular Data":
+            yield redact_tabular_chunk(chunk, redact_types, mode, salt, schema, nlp, batch_size, n_process, memo,
+                                       stored)
+        elif engine == "Descriptive Data":
+            if text_column(schema) not in chunk.columns:
+                raise ValueError(f"Missing '{text_column(schema)}' column for descriptive NER detection.")
+            yield redact_descriptive_chunk(chunk, redact_types, nlp, mode, salt, batch_size, n_process, memo,
+                                           schema, stored)
+        else:
+            raise ValueError(f"Unknown detection engine: {engine}")
+
+
+def redact_csv_streaming(file_path, out_path, engine, redact_types, mode="redact", salt=None, nlp=None,
+                         chunksize=DEFAULT_CHUNKSIZE, batch_size=DEFAULT_BATCH_SIZE, n_process=1,
+                         memo=None, on_chunk=None, schema=None, spans=None):
+    """Writes a copy of a source CSV to out_path with entities of redact_types masked, chunk by chunk."""
+    os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+    stats = {"rows": 0, "chunks": 0}
+
+    for chunk in iter_redacted_chunks(file_path, engine, redact_types, mode, salt, nlp, chunksize, batch_size,
+                                      n_process, memo, schema, spans):
+        chunk.to_csv(out_path, mode="w" if stats["chunks"] == 0 else "a", header=stats["chunks"] == 0, index=False)
+        stats["rows"] += len(chunk)
+        stats["chunks"] += 1
+        if on_chunk:
+            on_chunk(stats)
+
+    return stats
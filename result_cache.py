@@ -0,0 +1,96 @@
+import hashlib
+import os
+import pickle
+
+import numpy as np
+
+CACHE_DIR = "tmp/cache"
+MAX_CACHE_MB = 2048
+# Bump whenever detection output changes so stale entries stop matching
+CACHE_VERSION = 2
+
+
+def cache_key(content_hash, engine, model_version):
+    """Builds the cache key for one dataset scanned by one engine/model combination."""
+    raw = f"{CACHE_VERSION}|{content_hash}|{engine}|{model_version}"
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def _entry_path(key, cache_dir):
+    return os.path.join(cache_dir, f"{key}.pkl")
+
+
+def load_results(key, cache_dir=CACHE_DIR):
+    """Returns cached (pii, hii, risk_scores) for key, or None on a miss."""
+    path = _entry_path(key, cache_dir)
+    try:
+        with open(path, "rb") as f:
+            results = pickle.load(f)
+        # Reads count as use for LRU eviction
+        os.utime(path)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return None
+    return results
+
+
+def store_results(key, pii, hii, risk_scores, cache_dir=CACHE_DIR, max_mb=MAX_CACHE_MB):
+    """Stores detection results under key, then evicts least recently used entries over max_mb."""
+    os.makedirs(cache_dir, exist_ok=True)
+    path = _entry_path(key, cache_dir)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump((pii, hii, risk_scores), f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+    evict(cache_dir, max_mb)
+
+
+def _spans_path(key, cache_dir):
+    return os.path.join(cache_dir, f"{key}.spans.pkl")
+
+
+def store_spans(key, spans, cache_dir=CACHE_DIR, max_mb=MAX_CACHE_MB):
+    """Stores the row/column/start/end/label span records detection found for key, sorted by row then start.
+
+    They sit next to the results and are evicted like any entry; redaction detects again when they are gone.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    order = np.lexsort((spans["start"].to_numpy(), spans["row"].to_numpy()))
+    spans = spans.iloc[order].reset_index(drop=True).astype({"column": "category", "label": "category"})
+    path = _spans_path(key, cache_dir)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(spans, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+    evict(cache_dir, max_mb)
+
+
+def load_spans(key, cache_dir=CACHE_DIR):
+    """Returns the span records stored for key, or None."""
+    path = _spans_path(key, cache_dir)
+    try:
+        with open(path, "rb") as f:
+            spans = pickle.load(f)
+        os.utime(path)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return None
+    return spans
+
+
+def evict(cache_dir=CACHE_DIR, max_mb=MAX_CACHE_MB):
+    """Deletes the least recently used entries until the cache fits in max_mb."""
+    entries = []
+    for name in os.listdir(cache_dir):
+        if name.endswith(".pkl"):
+            stat = os.stat(os.path.join(cache_dir, name))
+            entries.append((stat.st_mtime, stat.st_size, name))
+
+    total = sum(size for _, size, _ in entries)
+    limit = max_mb * 1024 * 1024
+    for _, size, name in sorted(entries):
+        if total <= limit:
+            break
+        try:
+            os.remove(os.path.join(cache_dir, name))
+        except FileNotFoundError:
+            pass
+        total -= size
@@ -0,0 +1,200 @@
+import heapq
+import json
+import threading
+import time
+
+import numpy as np
+
+from upload_store import SQLiteStore
+
+RISK_HISTORY_DB = "tmp/risk_history.db"
+TOP_K = 10
+PERCENTILES = (50, 90, 99)
+HISTOGRAM_BINS = 20
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scans (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    scanned_at  REAL NOT NULL,
+    results_key TEXT,
+    source      TEXT,
+    engine      TEXT,
+    rows        INTEGER NOT NULL,
+    entities    INTEGER NOT NULL,
+    avg_risk    REAL,
+    p90_risk    REAL,
+    max_risk    INTEGER,
+    summary     TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_scans_results_key ON scans (results_key);
+CREATE INDEX IF NOT EXISTS idx_scans_scanned_at ON scans (scanned_at);
+"""
+
+
+class RiskSummary:
+    """Mergeable aggregate of detection results: rows, entities per type, row risk score histogram
+    and the top_k highest-risk rows.
+
+    Risk scores are small integers, so the histogram keeps one exact count per score and
+    percentiles come out the same whether chunks and files are added one by one or merged.
+    """
+
+    def __init__(self, top_k=TOP_K):
+        self.top_k = top_k
+        self.rows = 0
+        self.type_counts = {"PII": {}, "HII": {}}
+        self.histogram = {}
+        # (score, source, row) of the riskiest rows, highest first
+        self.top_rows = []
+
+    def add(self, pii, hii, scores, source=""):
+        """Adds one chunk: its PII/HII entity tables and its row risk scores (a Series indexed by row)."""
+        for group, frame in (("PII", pii), ("HII", hii)):
+            if len(frame):
+                counts = self.type_counts[group]
+                for etype, n in frame["Type"].astype(str).value_counts().items():
+                    counts[etype] = counts.get(etype, 0) + int(n)
+
+        values = np.asarray(scores, dtype=np.int64)
+        self.rows += len(values)
+        if not len(values):
+            return self
+        for score, n in zip(*np.unique(values, return_counts=True)):
+            self.histogram[int(score)] = self.histogram.get(int(score), 0) + int(n)
+        rows = np.asarray(getattr(scores, "index", np.arange(len(values))))
+        top = np.lexsort((rows, -values))[:self.top_k]
+        self._keep_top([(int(values[i]), source, int(rows[i])) for i in top])
+        return self
+
+    def merge(self, other):
+        """Adds another summary, e.g. of the next chunk or another file."""
+        self.rows += other.rows
+        for group, counts in other.type_counts.items():
+            mine = self.type_counts.setdefault(group, {})
+            for etype, n in counts.items():
+                mine[etype] = mine.get(etype, 0) + n
+        for score, n in other.histogram.items():
+            self.histogram[score] = self.histogram.get(score, 0) + n
+        self._keep_top(other.top_rows)
+        return self
+
+    def _keep_top(self, candidates):
+        # Ties go to the earliest source and row, so the result does not depend on merge order
+        self.top_rows = heapq.nsmallest(self.top_k, [tuple(r) for r in self.top_rows] + list(candidates),
+                                        key=lambda r: (-r[0], r[1], r[2]))
+
+    def percentile(self, p):
+        """Returns the lowest score at or above which p percent of rows lie, or None without rows."""
+        if not self.rows:
+            return None
+        target, seen = p / 100 * self.rows, 0
+        for score in sorted(self.histogram):
+            seen += self.histogram[score]
+            if seen >= target:
+                return score
+        return max(self.histogram)
+
+    def stats(self):
+        """Returns rows, entity totals, the most common type and avg/min/max/percentile risk."""
+        counts = {}
+        for group_counts in self.type_counts.values():
+            for etype, n in group_counts.items():
+                counts[etype] = counts.get(etype, 0) + n
+        most_common = max(counts.items(), key=lambda item: item[1]) if counts else (None, 0)
+        total = sum(score * n for score, n in self.histogram.items())
+        stats = {
+            "rows": self.rows,
+            "entities": sum(counts.values()),
+            "most_common_type": most_common[0],
+            "most_common_count": most_common[1],
+            "avg_risk": total / self.rows if self.rows else None,
+            "min_risk": min(self.histogram) if self.histogram else None,
+            "max_risk": max(self.histogram) if self.histogram else None,
+        }
+        for p in PERCENTILES:
+            stats[f"p{p}_risk"] = self.percentile(p)
+        return stats
+
+    def histogram_bins(self, bins=HISTOGRAM_BINS):
+        """Returns [{"risk": label, "rows": count}] with at most bins equal-width score ranges."""
+        if not self.histogram:
+            return []
+        low, high = min(self.histogram), max(self.histogram)
+        width = max(1, -(-(high - low + 1) // bins))
+        grouped = {}
+        for score, n in self.histogram.items():
+            start = low + (score - low) // width * width
+            grouped[start] = grouped.get(start, 0) + n
+        return [{"risk": str(start) if width == 1 else f"{start}-{start + width - 1}", "rows": grouped[start]}
+                for start in sorted(grouped)]
+
+    def to_dict(self):
+        return {"top_k": self.top_k, "rows": self.rows, "type_counts": self.type_counts,
+                "histogram": sorted(self.histogram.items()), "top_rows": [list(r) for r in self.top_rows]}
+
+    @classmethod
+    def from_dict(cls, data):
+        summary = cls(data.get("top_k", TOP_K))
+        summary.rows = data["rows"]
+        summary.type_counts = {group: dict(counts) for group, counts in data["type_counts"].items()}
+        summary.histogram = {int(score): n for score, n in data["histogram"]}
+        summary.top_rows = [tuple(r) for r in data["top_rows"]]
+        return summary
+
+
+class RiskHistory(SQLiteStore):
+    """One RiskSummary per finished scan, for comparing risk across scans."""
+
+    schema = SCHEMA
+
+    def __init__(self, path=RISK_HISTORY_DB):
+        super().__init__(path)
+
+    def record(self, summary, results_key=None, source=None, engine=None, scanned_at=None):
+        """Stores the summary of one scan."""
+        stats = summary.stats()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO scans (scanned_at, results_key, source, engine, rows, entities, avg_risk, p90_risk, "
+                "max_risk, summary) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (time.time() if scanned_at is None else scanned_at, results_key, source, engine, stats["rows"],
+                 stats["entities"], stats["avg_risk"], stats["p90_risk"], stats["max_risk"],
+                 json.dumps(summary.to_dict())),
+            )
+
+    def latest(self, results_key):
+        """Returns the most recent summary stored for results_key, or None."""
+        row = self._connect().execute(
+            "SELECT summary FROM scans WHERE results_key = ? ORDER BY scanned_at DESC LIMIT 1", (results_key,)
+        ).fetchone()
+        return RiskSummary.from_dict(json.loads(row["summary"])) if row else None
+
+    def history(self, source=None, limit=50):
+        """Returns the headline figures of the latest scans, newest first, optionally of one source only."""
+        query = ("SELECT id, scanned_at, source, engine, rows, entities, avg_risk, p90_risk, max_risk FROM scans"
+                 + (" WHERE source = ?" if source is not None else "") + " ORDER BY scanned_at DESC LIMIT ?")
+        params = (source, limit) if source is not None else (limit,)
+        return [dict(row) for row in self._connect().execute(query, params)]
+
+    def combined(self, scan_ids):
+        """Merges the summaries of the given scans into one."""
+        summary = RiskSummary()
+        for scan_id in scan_ids:
+            row = self._connect().execute("SELECT summary FROM scans WHERE id = ?", (scan_id,)).fetchone()
+            if row:
+                summary.merge(RiskSummary.from_dict(json.loads(row["summary"])))
+        return summary
+
+
+_history = None
+_lock = threading.Lock()
+
+
+def get_risk_history(path=RISK_HISTORY_DB):
+    """Returns the process-wide RiskHistory."""
+    global _history
+    if _history is None:
+        with _lock:
+            if _history is None:
+                _history = RiskHistory(path)
+    return _history
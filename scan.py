@@ -0,0 +1,151 @@
+"""Headless batch scanner: python scan.py <files or directories> --out-dir results"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from cascade import DEFAULT_MAX_UNCOVERED, DEFAULT_MIN_ENTITIES
+from detection import DEFAULT_BATCH_SIZE
+from profiling import profile_file, routed_columns
+from risk_summary import RiskSummary, get_risk_history
+from streaming import DEFAULT_CHUNKSIZE, OUTPUT_FORMATS, scan_csv_streaming
+
+ENGINES = {"auto": None, "tabular": "Tabular Data", "descriptive": "Descriptive Data"}
+
+
+def collect_csv_files(paths):
+    """Expands files and directories into a sorted list of CSV file paths."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                files += [os.path.join(root, n) for n in names if n.lower().endswith(".csv")]
+        else:
+            files.append(path)
+    return sorted(files)
+
+
+def scan_file(file_path, out_root, fmt="csv", engine=None, model="trf", chunksize=DEFAULT_CHUNKSIZE,
+              batch_size=DEFAULT_BATCH_SIZE, patterns_only=False, screen_model=None, history=True,
+              min_entities=DEFAULT_MIN_ENTITIES, max_uncovered=DEFAULT_MAX_UNCOVERED):
+    """Scans one CSV into out_root/<file name>/ and returns a stats dict for it.
+
+    With history, the file's RiskSummary is also stored in the risk history database. min_entities
+    and max_uncovered are the CascadeDetector thresholds used with screen_model.
+    """
+    start = time.perf_counter()
+    # Reads only the first rows, so this costs the same for any file size
+    schema = profile_file(file_path)
+    if engine is None:
+        engine = schema["engine"]
+        if engine is None:
+            raise ValueError("Could not determine detection engine from columns")
+
+    nlp = memo = cascade = None
+    uses_ner = engine == "Descriptive Data" or any(p["route"] == "ner" for p in routed_columns(schema, engine).values())
+    if uses_ner and not patterns_only:
+        from nlp_models import load_model
+        from ner_memo import NER_MEMO
+        nlp, memo = load_model(model), NER_MEMO
+        if screen_model and engine == "Descriptive Data":
+            from cascade import CascadeDetector
+            screen_nlp = None if screen_model == "none" else load_model(screen_model)
+            cascade = CascadeDetector(nlp, screen_nlp, min_entities, max_uncovered, memo=memo)
+
+    out_dir = os.path.join(out_root, os.path.splitext(os.path.basename(file_path))[0])
+    _, stats = scan_csv_streaming(file_path, engine, out_dir, nlp=nlp, chunksize=chunksize,
+                                  batch_size=batch_size, fmt=fmt, memo=memo, cascade=cascade,
+                                  schema=schema)
+    if cascade is not None:
+        stats["escalated_fraction"] = cascade.escalated_fraction
+    if history:
+        get_risk_history().record(stats["risk_summary"], source=os.path.abspath(file_path), engine=engine)
+    stats.update({
+        "file": file_path,
+        "engine": engine,
+        "bytes": os.path.getsize(file_path),
+        "seconds": time.perf_counter() - start,
+    })
+    return stats
+
+
+def print_summary(results, failures, elapsed):
+    rows = sum(r["rows"] for r in results)
+    entities = sum(r["pii"] + r["hii"] for r in results)
+    megabytes = sum(r["bytes"] for r in results) / (1024 * 1024)
+    print(f"\nScanned {len(results)} file(s), {len(failures)} failed, in {elapsed:.2f}s")
+    print(f"  rows:     {rows:,} ({rows / elapsed:,.0f} rows/s)")
+    print(f"  entities: {entities:,} ({entities / elapsed:,.0f} entities/s)")
+    print(f"  input:    {megabytes:,.1f} MB ({megabytes / elapsed:,.2f} MB/s)")
+    risk = RiskSummary()
+    for r in results:
+        risk.merge(r["risk_summary"])
+    stats = risk.stats()
+    if stats["rows"]:
+        print(f"  risk:     avg {stats['avg_risk']:.2f}, p50 {stats['p50_risk']}, p90 {stats['p90_risk']}, "
+              f"p99 {stats['p99_risk']}, max {stats['max_risk']}; most common {stats['most_common_type']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scan CSV files for PII/HII without the Streamlit UI.")
+    parser.add_argument("paths", nargs="+", help="CSV files or directories containing CSV files")
+    parser.add_argument("--out-dir", default="scan_results", help="Directory for per-file results")
+    parser.add_argument("--format", choices=list(OUTPUT_FORMATS), default="csv")
+    parser.add_argument("--engine", choices=list(ENGINES), default="auto")
+    parser.add_argument("--model", default="trf", help="spaCy model for descriptive files (trf, lg, sm or a name)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--patterns-only", action="store_true",
+                        help="Skip NER on descriptive files and run only the regex pattern stage")
+    parser.add_argument("--cascade", metavar="SCREEN_MODEL", nargs="?", const="sm",
+                        help="Screen descriptive rows with patterns and SCREEN_MODEL (default sm, or 'none' for "
+                             "patterns alone) and run --model only on flagged or uncertain rows")
+    parser.add_argument("--escalate-threshold", "--min-entities", dest="min_entities", type=int,
+                        default=DEFAULT_MIN_ENTITIES,
+                        help="With --cascade, escalate rows where the screen finds at least this many names, "
+                             "organisations or places")
+    parser.add_argument("--screen-threshold", "--max-uncovered", dest="max_uncovered", type=int,
+                        default=DEFAULT_MAX_UNCOVERED,
+                        help="With --cascade, escalate rows with more capitalised words than this outside "
+                             "every screened entity")
+    parser.add_argument("--no-history", action="store_true",
+                        help="Do not store the per-file risk summaries in the risk history database")
+    args = parser.parse_args(argv)
+    if args.min_entities < 1:
+        parser.error("--escalate-threshold must be at least 1")
+
+    files = collect_csv_files(args.paths)
+    if not files:
+        print("No CSV files found.", file=sys.stderr)
+        return 1
+
+    start = time.perf_counter()
+    results, failures = [], []
+    with ProcessPoolExecutor(max_workers=max(1, min(args.workers, len(files)))) as pool:
+        futures = {
+            pool.submit(scan_file, f, args.out_dir, args.format, ENGINES[args.engine], args.model,
+                        args.chunksize, args.batch_size, args.patterns_only, args.cascade,
+                        not args.no_history, args.min_entities, args.max_uncovered): f
+            for f in files
+        }
+        for future in as_completed(futures):
+            file_path = futures[future]
+            try:
+                stats = future.result()
+            except Exception as e:
+                failures.append(file_path)
+                print(f"FAILED {file_path}: {e}", file=sys.stderr)
+                continue
+            results.append(stats)
+            escalated = f", {stats['escalated_fraction']:.1%} escalated" if "escalated_fraction" in stats else ""
+            print(f"{file_path}: {stats['engine']}, {stats['rows']:,} rows, "
+                  f"{stats['pii']:,} PII / {stats['hii']:,} HII in {stats['seconds']:.2f}s{escalated}")
+
+    print_summary(results, failures, time.perf_counter() - start)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
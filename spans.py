@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+
+
+class SpanTable:
+    """Entity spans over a batch of texts as flat arrays: row, start, end, label code and score.
+
+    Spans are sorted by row, then start; rows are positions within the batch.
+    """
+
+    def __init__(self, rows, starts, ends, label_codes, labels, scores):
+        self.rows = rows
+        self.starts = starts
+        self.ends = ends
+        self.label_codes = label_codes
+        self.labels = labels
+        self.scores = scores
+
+    @classmethod
+    def from_row_spans(cls, row_spans):
+        """Builds a table from one list of (start, end, label, score) tuples per row."""
+        counts = np.fromiter((len(spans) for spans in row_spans), dtype=np.int64, count=len(row_spans))
+        flat = [span for spans in row_spans for span in sorted(spans, key=lambda s: s[0])]
+        if not flat:
+            return cls.empty()
+        starts, ends, labels, scores = zip(*flat)
+        label_codes, label_names = pd.factorize(pd.Series(labels, dtype=object))
+        return cls(
+            np.repeat(np.arange(len(row_spans), dtype=np.int32), counts),
+            np.array(starts, dtype=np.int32),
+            np.array(ends, dtype=np.int32),
+            label_codes.astype(np.int16),
+            np.asarray(label_names, dtype=object),
+            np.array(scores, dtype=np.float32),
+        )
+
+    @classmethod
+    def from_records(cls, rows, starts, ends, labels, score=1.0):
+        """Builds a table from stored span records, already sorted by row, then start."""
+        label_codes, label_names = pd.factorize(pd.Series(labels, dtype=object))
+        return cls(np.asarray(rows, dtype=np.int32), np.asarray(starts, dtype=np.int32),
+                   np.asarray(ends, dtype=np.int32), label_codes.astype(np.int16),
+                   np.asarray(label_names, dtype=object), np.full(len(label_codes), score, dtype=np.float32))
+
+    @classmethod
+    def empty(cls):
+        return cls(np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int32),
+                   np.zeros(0, dtype=np.int16), np.array([], dtype=object), np.zeros(0, dtype=np.float32))
+
+    def __len__(self):
+        return len(self.rows)
+
+    def label_array(self):
+        return self.labels[self.label_codes]
+
+    def select(self, mask):
+        """Returns the spans under a boolean mask, keeping the label table."""
+        return SpanTable(self.rows[mask], self.starts[mask], self.ends[mask], self.label_codes[mask],
+                         self.labels, self.scores[mask])
+
+    def row_bounds(self, n_rows):
+        """Returns n_rows + 1 offsets; the spans of row i are [bounds[i], bounds[i + 1])."""
+        return np.searchsorted(self.rows, np.arange(n_rows + 1))
+
+    def values(self, texts):
+        """Slices the entity text of every span out of texts."""
+        texts = list(texts)
+        return [texts[r][s:e] for r, s, e in zip(self.rows.tolist(), self.starts.tolist(), self.ends.tolist())]
+
+    def entity_lists(self, texts):
+        """Returns one (entity, label) list per text, the shape detect_descriptive has always returned."""
+        texts = list(texts)
+        results = [[] for _ in texts]
+        for row, value, label in zip(self.rows.tolist(), self.values(texts), self.label_array()):
+            results[row].append((value, label))
+        return results
+
+    def records(self, row_ids, column):
+        """Returns the spans as row/column/start/end/label records, rows mapped to row_ids (e.g. file rows)."""
+        return pd.DataFrame({"row": np.asarray(row_ids, dtype=np.int64)[self.rows], "column": column,
+                             "start": self.starts, "end": self.ends, "label": self.label_array()})
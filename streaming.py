@@ -0,0 +1,179 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from detection import (DEFAULT_BATCH_SIZE, HII_COLUMNS, detect_descriptive_spans, detect_tabular_columns,
+                       entity_risk_scores, flatten_entity_lists, score_entity_lists)
+from metrics import stage, timed_chunks
+from risk_summary import RiskSummary
+
+DEFAULT_CHUNKSIZE = 50_000
+# Uploads above this size skip the full in-memory load and are scanned chunk by chunk
+STREAMING_THRESHOLD_MB = 200
+
+
+def should_stream(file_path, threshold_mb=STREAMING_THRESHOLD_MB):
+    """Returns True when a file is too large to load into memory in one go."""
+    return os.path.getsize(file_path) > threshold_mb * 1024 * 1024
+
+
+def parquet_table(frame):
+    """Converts a result frame to a pyarrow Table for writing as Parquet."""
+    import pyarrow as pa
+
+    # Tabular entities mix strings and numbers, Parquet needs one type per column
+    if "Entity" in frame.columns:
+        frame = frame.astype({"Entity": str})
+    return pa.Table.from_pandas(frame, preserve_index=False)
+
+
+def text_column(schema=None):
+    """Returns the column the descriptive engine reads: the profiled text column, or "text"."""
+    return (schema or {}).get("text_column") or "text"
+
+
+def detect_chunk(chunk, engine, nlp=None, batch_size=DEFAULT_BATCH_SIZE, n_process=1, memo=None, cascade=None,
+                 schema=None, on_spans=None):
+    """Runs one detection engine over a DataFrame chunk and returns (pii, hii, row risk scores).
+
+    For descriptive data a CascadeDetector, if given, replaces running nlp on every row. A schema
+    from profiling.profile_frame adds the columns the engine does not read by name, each with the
+    detector it was routed to. on_spans(column, row_ids, spans) gets the SpanTable found in every
+    column scanned for spans, so redaction can reuse them instead of detecting again.
+    """
+    routes = {}
+    if schema is not None:
+        from profiling import routed_columns
+        routes = routed_columns(schema, engine)
+
+    if engine == "Tabular Data":
+        with stage("rule_based", len(chunk)):
+            if schema is None or any(p["known"] for p in schema["columns"].values()):
+                pii, hii, scores = detect_tabular_columns(chunk)
+            else:
+                # Nothing here is read by name, the routed columns below are the whole detection
+                pii, hii, scores = (pd.DataFrame(columns=["Entity", "Type"]), pd.DataFrame(columns=["Entity", "Type"]),
+                                    np.zeros(len(chunk), dtype=np.int64))
+            if routes:
+                pii, hii, scores = _add_routed(chunk, routes, pii, hii, scores, nlp, batch_size, n_process, memo,
+                                               on_spans)
+        return pii, hii, pd.Series(scores, index=chunk.index, name="Risk_Score")
+
+    if engine == "Descriptive Data":
+        texts = chunk[text_column(schema)].dropna().astype(str)
+        if cascade is not None:
+            # Times its screening and full-model passes as the cascade_screen and cascade_full stages
+            spans = cascade.detect_spans(texts, batch_size, n_process)
+        else:
+            with stage("ner" if nlp is not None else "patterns", len(texts)):
+                spans = detect_descriptive_spans(texts, nlp, batch_size=batch_size, n_process=n_process, memo=memo)
+        if on_spans:
+            on_spans(text_column(schema), texts.index, spans)
+        detected = spans.entity_lists(texts)
+        with stage("scoring", len(texts)):
+            pii = flatten_entity_lists(detected)
+            scores = pd.Series(score_entity_lists(detected), index=texts.index, name="Risk_Score", dtype=int)
+        hii = pd.DataFrame(columns=["Entity", "Type"])
+        if routes:
+            with stage("rule_based", len(chunk)):
+                pii, hii, routed = _add_routed(chunk, routes, pii, hii, np.zeros(len(chunk), dtype=np.int64),
+                                               on_spans=on_spans)
+            # Row scores stay aligned with the rows that have text
+            scores += pd.Series(routed, index=chunk.index).loc[texts.index].to_numpy()
+        return pii, hii, scores
+
+    raise ValueError(f"Unknown detection engine: {engine}")
+
+
+def _add_routed(chunk, routes, pii, hii, scores, nlp=None, batch_size=DEFAULT_BATCH_SIZE, n_process=1, memo=None,
+                on_spans=None):
+    from profiling import detect_routed_columns
+
+    entities, routed_scores = detect_routed_columns(chunk, routes, nlp, batch_size, n_process, memo, on_spans)
+    # Health columns routed by type stay HII, as they are in the tabular engine
+    is_hii = entities["Type"].isin(list(HII_COLUMNS)).to_numpy(dtype=bool)
+    return (_append_entities(pii, entities[~is_hii]), _append_entities(hii, entities[is_hii]),
+            np.asarray(scores) + routed_scores)
+
+
+def _append_entities(table, found):
+    if not len(found):
+        return table
+    found = found.reset_index(drop=True)
+    return pd.concat([table, found], ignore_index=True) if len(table) else found
+
+
+OUTPUT_FORMATS = {"csv": ".csv", "parquet": ".parquet", "jsonl": ".jsonl"}
+
+
+class ResultWriter:
+    """Appends DataFrame chunks to a single CSV, Parquet or JSONL file."""
+
+    def __init__(self, path, fmt="csv"):
+        if fmt not in OUTPUT_FORMATS:
+            raise ValueError(f"Unsupported output format: {fmt}")
+        self.path = path
+        self.fmt = fmt
+        self._first = True
+        self._parquet = None
+
+    def write(self, frame):
+        if self.fmt == "csv":
+            frame.to_csv(self.path, mode="w" if self._first else "a", header=self._first, index=False)
+        elif self.fmt == "jsonl":
+            with open(self.path, "w" if self._first else "a") as f:
+                frame.to_json(f, orient="records", lines=True)
+        else:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = parquet_table(frame)
+            if self._parquet is None:
+                # An empty first chunk has no inferable column types, store those as strings
+                schema = pa.schema([pa.field(f.name, pa.string()) if pa.types.is_null(f.type) else f
+                                    for f in table.schema])
+                self._parquet = pq.ParquetWriter(self.path, schema)
+            self._parquet.write_table(table.cast(self._parquet.schema))
+        self._first = False
+
+    def close(self):
+        if self._parquet is not None:
+            self._parquet.close()
+
+
+def scan_csv_streaming(file_path, engine, out_dir, nlp=None, chunksize=DEFAULT_CHUNKSIZE,
+                       batch_size=DEFAULT_BATCH_SIZE, n_process=1, on_chunk=None, fmt="csv", memo=None, cascade=None,
+                       schema=None):
+    """Scans a CSV chunk by chunk, appending entities and row risk scores to files in out_dir.
+
+    stats["risk_summary"] is the RiskSummary of the whole file, built chunk by chunk.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    paths = {name: os.path.join(out_dir, name + OUTPUT_FORMATS[fmt]) for name in ("pii", "hii", "risk_scores")}
+    writers = {name: ResultWriter(path, fmt) for name, path in paths.items()}
+    stats = {"rows": 0, "pii": 0, "hii": 0, "chunks": 0}
+    summary = RiskSummary()
+
+    try:
+        for chunk in timed_chunks("read_csv", pd.read_csv(file_path, chunksize=chunksize)):
+            if engine == "Descriptive Data" and text_column(schema) not in chunk.columns:
+                raise ValueError(f"Missing '{text_column(schema)}' column for descriptive NER detection.")
+
+            pii, hii, scores = detect_chunk(chunk, engine, nlp, batch_size, n_process, memo, cascade, schema)
+            for name, entities in (("pii", pii), ("hii", hii)):
+                writers[name].write(entities.assign(Risk_Score=entity_risk_scores(entities["Type"])))
+                stats[name] += len(entities)
+            writers["risk_scores"].write(scores.rename_axis("row").reset_index())
+            summary.add(pii, hii, scores, os.path.basename(file_path))
+
+            stats["rows"] += len(chunk)
+            stats["chunks"] += 1
+            if on_chunk:
+                on_chunk(stats)
+    finally:
+        for writer in writers.values():
+            writer.close()
+
+    stats["risk_summary"] = summary
+    return paths, stats
@@ -0,0 +1,218 @@
+"""Synthetic tabular and descriptive datasets with the sample files' schemas, for benchmarking."""
+import numpy as np
+import pandas as pd
+
+GENERATE_CHUNK_ROWS = 100_000
+
+TABULAR_COLUMNS = [
+    "id", "gender", "birthdate", "maiden_name", "lname", "fname", "address", "city", "state", "zip", "phone",
+    "email", "cc_type", "cc_number", "cc_cvc", "cc_expiredate", "blood_type", "weight_kg", "height_cm",
+    "allergies", "medical_conditions", "medications", "doctor_name", "hospital_name", "insurance_provider",
+]
+DESCRIPTIVE_COLUMNS = [
+    "document", "text", "tokens", "trailing_whitespace", "labels", "prompt", "prompt_id", "name", "email",
+    "phone", "job", "address", "username", "url", "hobby", "len",
+]
+# Columns blanked in rows generated without personal data
+TABULAR_PII_COLUMNS = ["id", "maiden_name", "lname", "fname", "address", "city", "state", "zip", "phone", "email",
+                       "cc_type", "cc_number", "cc_cvc", "cc_expiredate"]
+
+FIRST_NAMES = ["Robert", "Andrea", "Martin", "Priya", "Zayn", "Zachary", "Maria", "James", "Aisha", "Chen", "Olga",
+               "Diego", "Fatima", "Liam", "Noah", "Emma", "Sofia", "Hiro", "Amara", "Lucas", "Ingrid", "Omar",
+               "Grace", "Mateo", "Yuki", "Elena", "Kwame", "Sara", "Ivan", "Leila"]
+LAST_NAMES = ["Miller", "Juarez", "Kobayashi", "Yamada", "Vasilev", "Collins", "Griffith", "Nguyen", "Okafor",
+              "Schmidt", "Rossi", "Patel", "Haddad", "Larsen", "Moreau", "Silva", "Kowalski", "Tanaka", "Mensah",
+              "Novak", "Duarte", "Lindqvist", "Reyes", "Fischer", "Abara", "Petrov", "Walsh", "Chowdhury"]
+STREETS = ["Fox Underpass", "David Road", "Jed Road", "Nathan Key", "East 33rd Street", "Maple Avenue", "Oak Lane",
+           "Harbor Drive", "Pine Court", "Sunset Boulevard", "Mill Street", "River Way"]
+CITIES = ["Lewischester", "Amandashire", "Seattle", "Port Jessica", "Lake Brian", "North Kevin", "Springfield",
+          "Riverside", "Fairview", "Georgetown"]
+STATES = ["CO", "MO", "WA", "TX", "NY", "CA", "FL", "IL", "OH", "GA", "AZ", "MA"]
+DOMAINS = ["gmail.com", "hotmail.com", "yahoo.com", "outlook.com", "example.org", "mail.net"]
+BLOOD_TYPES = ["O+", "O-", "A+", "A-", "B+", "B-", "AB+", "AB-"]
+ALLERGIES = ["None", "Peanuts", "Penicillin", "Shellfish", "Latex", "Pollen", "Dust"]
+CONDITIONS = ["None", "Hypertension", "Diabetes", "Asthma", "Migraine", "Arthritis", "Depression"]
+MEDICATIONS = ["None", "Metformin", "Ibuprofen", "Lisinopril", "Albuterol", "Sertraline", "Atorvastatin"]
+DOCTORS = ["Dr. Taylor", "Dr. White", "Dr. Patel", "Dr. Smith", "Dr. Garcia", "Dr. Lee"]
+HOSPITALS = ["City Medical Center", "St. Mary's Hospital", "General Hospital", "Mercy Clinic", "Lakeside Health"]
+INSURERS = ["None", "Medicare", "Medicaid", "Aetna", "Blue Cross", "Cigna", "UnitedHealth"]
+JOBS = ["salesperson", "photographer", "nurse", "software engineer", "teacher", "accountant", "chef", "architect"]
+HOBBIES = ["Backpacking", "Weaving", "Furniture restoration", "Chess", "Gardening", "Cycling", "Pottery"]
+# Sentences without personal data; descriptive rows are padded with these
+FILLER = [
+    "The project started with weeks of research into what the customers actually needed.",
+    "Progress was slow at first, but the team met every milestone after the second month.",
+    "Regular updates kept everyone aligned on the goals and the remaining risks.",
+    "A new reporting process cut the time spent on manual reviews by almost half.",
+    "Several workshops helped the group agree on a shared set of priorities.",
+    "The final results surpassed the initial projections by a comfortable margin.",
+    "Feedback from the pilot phase shaped most of the changes in the second release.",
+    "Budget constraints meant that some features had to wait for the following quarter.",
+    "",
+]
+
+# Multipliers for the per-field hashes; any odd 64-bit constants work
+_GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+_MIX_1 = np.uint64(0xBF58476D1CE4E5B9)
+_MIX_2 = np.uint64(0x94D049BB133111EB)
+
+
+def _mix(seeds, salt):
+    # splitmix64 finalizer: every field of a row is a pure function of its seed, so duplicate rows match exactly
+    x = seeds.astype(np.uint64) * _GOLDEN + np.uint64(salt)
+    x = (x ^ (x >> np.uint64(30))) * _MIX_1
+    x = (x ^ (x >> np.uint64(27))) * _MIX_2
+    return x ^ (x >> np.uint64(31))
+
+
+def _pick(pool, seeds, salt):
+    return pd.Series(np.asarray(pool, dtype=object)[_mix(seeds, salt) % np.uint64(len(pool))])
+
+
+def _number(seeds, salt, low, high):
+    return (_mix(seeds, salt) % np.uint64(high - low)).astype(np.int64) + low
+
+
+def _digits(seeds, salt, width):
+    # Offsetting by 10**width keeps leading zeros without a zfill pass
+    return pd.Series(_number(seeds, salt, 10 ** width, 2 * 10 ** width)).astype(str).str[1:]
+
+
+def _card_numbers(seeds, salt):
+    # 16-digit, Luhn-valid numbers in four space-separated groups, so the pattern stage reports them
+    payload = np.column_stack([_number(seeds, salt + i, 0, 10) for i in range(15)])
+    doubled = payload[:, 0::2] * 2
+    total = payload[:, 1::2].sum(axis=1) + (doubled - 9 * (doubled > 9)).sum(axis=1)
+    digits = np.column_stack([payload, (10 - total % 10) % 10]).astype(np.uint8) + ord("0")
+    chars = np.full((len(seeds), 19), ord(" "), dtype=np.uint8)
+    for group in range(4):
+        chars[:, group * 5:group * 5 + 4] = digits[:, group * 4:group * 4 + 4]
+    return pd.Series(chars.view("S19").ravel().astype(str), dtype=object)
+
+
+def row_seeds(start, n, duplicate_rate=0.0, seed=0):
+    """Returns the seed of each row in [start, start + n); duplicated rows reuse the seed of an earlier row."""
+    seeds = np.arange(start, start + n, dtype=np.int64)
+    if duplicate_rate <= 0:
+        return seeds
+
+    def is_dup(k):
+        return ((_mix(k, seed + 101) % np.uint64(1_000_000)) < np.uint64(int(duplicate_rate * 1_000_000))) & (k > 0)
+
+    # Follow duplicate-of-duplicate chains back to an original row, which is always in the file
+    pending = is_dup(seeds)
+    while pending.any():
+        k = seeds[pending]
+        seeds[pending] = (_mix(k, seed + 102) % k.astype(np.uint64)).astype(np.int64)
+        pending[pending] = is_dup(seeds[pending])
+    return seeds
+
+
+def _has_pii(seeds, pii_rate, seed):
+    return (_mix(seeds, seed + 103) % np.uint64(1_000_000)) < np.uint64(int(pii_rate * 1_000_000))
+
+
+def tabular_frame(seeds, pii_rate=1.0, seed=0):
+    """Builds tabular rows (Tabular_PII_HII_Sample.csv columns) for the given row seeds."""
+    s = seed * 1000
+    fname, lname = _pick(FIRST_NAMES, seeds, s + 1), _pick(LAST_NAMES, seeds, s + 2)
+    frame = pd.DataFrame({
+        "id": _digits(seeds, s + 3, 3) + "-" + _digits(seeds, s + 4, 2) + "-" + _digits(seeds, s + 5, 4),
+        "gender": _pick(["m", "f"], seeds, s + 6),
+        "birthdate": (pd.Timestamp("1940-01-01") + pd.to_timedelta(_number(seeds, s + 7, 0, 60 * 365), "D"))
+        .strftime("%Y-%m-%d"),
+        "maiden_name": _pick(LAST_NAMES, seeds, s + 8),
+        "lname": lname,
+        "fname": fname,
+        "address": _number(seeds, s + 9, 1, 9999).astype(str) + " " + _pick(STREETS, seeds, s + 10),
+        "city": _pick(CITIES, seeds, s + 11),
+        "state": _pick(STATES, seeds, s + 12),
+        "zip": _digits(seeds, s + 13, 5),
+        "phone": "001-" + _digits(seeds, s + 14, 3) + "-" + _digits(seeds, s + 15, 3) + "-"
+        + _digits(seeds, s + 16, 4),
+        "email": fname.str.lower() + _number(seeds, s + 17, 1, 100).astype(str) + "@" + _pick(DOMAINS, seeds, s + 18),
+        "cc_type": _pick(["v", "m", "a"], seeds, s + 19),
+        "cc_number": _card_numbers(seeds, s + 20),
+        "cc_cvc": _digits(seeds, s + 40, 3),
+        "cc_expiredate": (_number(seeds, s + 41, 2015, 2030).astype(str) + "/"
+                          + pd.Series(_number(seeds, s + 42, 101, 113)).astype(str).str[1:]),
+        "blood_type": _pick(BLOOD_TYPES, seeds, s + 43),
+        "weight_kg": np.round(_number(seeds, s + 44, 450, 1200) / 10, 1),
+        "height_cm": np.round(_number(seeds, s + 45, 1450, 2000) / 10, 1),
+        "allergies": _pick(ALLERGIES, seeds, s + 46),
+        "medical_conditions": _pick(CONDITIONS, seeds, s + 47),
+        "medications": _pick(MEDICATIONS, seeds, s + 48),
+        "doctor_name": _pick(DOCTORS, seeds, s + 49),
+        "hospital_name": _pick(HOSPITALS, seeds, s + 50),
+        "insurance_provider": _pick(INSURERS, seeds, s + 51),
+    }, columns=TABULAR_COLUMNS)
+    if pii_rate < 1.0:
+        frame.loc[~_has_pii(seeds, pii_rate, seed), TABULAR_PII_COLUMNS] = None
+    return frame
+
+
+def descriptive_frame(seeds, pii_rate=1.0, seed=0):
+    """Builds descriptive rows (Descriptive_PII_HII_Sample.csv columns) for the given row seeds.
+
+    Rows with personal data mention a name, email, phone, address and sometimes a card number or
+    health details inside filler text; the rest are filler only.
+    """
+    s = seed * 1000 + 500
+    fname, lname = _pick(FIRST_NAMES, seeds, s + 1), _pick(LAST_NAMES, seeds, s + 2)
+    name = fname + " " + lname
+    email = fname.str.lower() + "." + lname.str.lower() + _number(seeds, s + 3, 1, 9999).astype(str) + "@" \
+        + _pick(DOMAINS, seeds, s + 4)
+    phone = "+1 " + _digits(seeds, s + 5, 3) + " " + _digits(seeds, s + 6, 3) + " " + _digits(seeds, s + 7, 4)
+    address = _number(seeds, s + 8, 1, 9999).astype(str) + " " + _pick(STREETS, seeds, s + 9)
+    job = _pick(JOBS, seeds, s + 10)
+
+    filler = _pick(FILLER, seeds, s + 11) + " " + _pick(FILLER, seeds, s + 12) + " " + _pick(FILLER, seeds, s + 13)
+    personal = (name + ", a " + job + ", recently led a project at work. " + filler.str.strip()
+                + " " + fname + " can be reached at " + email + " or by phone at " + phone
+                + " and lives at " + address + ", " + _pick(CITIES, seeds, s + 14) + ", "
+                + _pick(STATES, seeds, s + 15) + " " + _digits(seeds, s + 16, 5) + ".")
+    # A quarter of personal rows also carry a card number, another quarter health details
+    extra = _number(seeds, s + 17, 0, 4)
+    card = " The invoice was paid with card " + _card_numbers(seeds, s + 18) + "."
+    health = " " + fname + " has " + _pick(CONDITIONS[1:], seeds, s + 40).str.lower() + " and takes " \
+        + _pick(MEDICATIONS[1:], seeds, s + 41) + "."
+    personal = personal.where(extra != 0, personal + card).where(extra != 1, personal + health)
+
+    has_pii = _has_pii(seeds, pii_rate, seed)
+    text = personal.where(has_pii, ("The project was a success. " + filler).str.strip())
+    blank = pd.Series([None] * len(seeds), dtype=object)
+    return pd.DataFrame({
+        "document": _digits(seeds, s + 42, 8) + "-" + _digits(seeds, s + 43, 4) + "-" + _digits(seeds, s + 44, 12),
+        "text": text,
+        "tokens": blank,
+        "trailing_whitespace": blank,
+        "labels": blank,
+        "prompt": blank,
+        "prompt_id": _number(seeds, s + 45, 1, 5),
+        "name": name.where(has_pii, None),
+        "email": email.where(has_pii, None),
+        "phone": phone.where(has_pii, None),
+        "job": job,
+        "address": address.where(has_pii, None),
+        "username": blank,
+        "url": blank,
+        "hobby": _pick(HOBBIES, seeds, s + 46),
+        "len": text.str.count(" ") + 1,
+    }, columns=DESCRIPTIVE_COLUMNS)
+
+
+GENERATORS = {"tabular": tabular_frame, "descriptive": descriptive_frame}
+
+
+def write_dataset(path, kind, rows, duplicate_rate=0.0, pii_rate=1.0, seed=0, chunk_rows=GENERATE_CHUNK_ROWS):
+    """Writes rows synthetic rows of kind ("tabular" or "descriptive") to a CSV, chunk by chunk.
+
+    duplicate_rate is the fraction of rows that repeat an earlier row exactly; pii_rate is the
+    fraction of rows carrying personal data. The same arguments always produce the same file.
+    """
+    generate = GENERATORS[kind]
+    with open(path, "w", newline="") as f:
+        for start in range(0, max(rows, 1), chunk_rows):
+            seeds = row_seeds(start, min(chunk_rows, rows - start), duplicate_rate, seed)
+            generate(seeds, pii_rate, seed).to_csv(f, header=start == 0, index=False)
+    return path
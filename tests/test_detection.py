@@ -0,0 +1,40 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pandas.testing as pdt
+import pytest
+
+from detection import compute_risk_scores, detect_rule_based, detect_tabular_columns
+
+SAMPLE = os.path.join(os.path.dirname(__file__), "..", "sample_data", "Tabular_PII_HII_Sample.csv")
+
+
+def _row_based(df):
+    # The row-at-a-time engine detect_tabular_columns replaced
+    detected_pii, detected_hii = [], []
+    for row in df.to_dict(orient="records"):
+        pii, hii = detect_rule_based(row)
+        detected_pii.append(pii)
+        detected_hii.append(hii)
+    pii = pd.DataFrame([item for row in detected_pii for item in row if item[0]], columns=["Entity", "Type"])
+    hii = pd.DataFrame([item for row in detected_hii for item in row if item[0]], columns=["Entity", "Type"])
+    return pii, hii, compute_risk_scores(detected_pii, detected_hii)
+
+
+def _nan_heavy_frame():
+    rng = np.random.default_rng(0)
+    df = pd.read_csv(SAMPLE)
+    # Blank out about half the cells, and drop a few columns entirely
+    df = df.mask(rng.random(df.shape) < 0.5)
+    return df.drop(columns=["city", "cc_number", "allergies"])
+
+
+@pytest.mark.parametrize("frame", [lambda: pd.read_csv(SAMPLE), _nan_heavy_frame], ids=["sample", "nan_heavy"])
+def test_column_engine_matches_row_engine(frame):
+    df = frame()
+    expected_pii, expected_hii, expected_scores = _row_based(df)
+    pii, hii, scores = detect_tabular_columns(df)
+    for got, expected in ((pii, expected_pii), (hii, expected_hii)):
+        pdt.assert_frame_equal(got.astype(object), expected.astype(object))
+    assert scores.tolist() == expected_scores
@@ -0,0 +1,57 @@
+import os
+
+import pandas as pd
+import pandas.testing as pdt
+
+from profiling import profile_frame, routed_columns
+from streaming import detect_chunk
+
+SAMPLE = os.path.join(os.path.dirname(__file__), os.pardir, "sample_data", "Tabular_PII_HII_Sample.csv")
+DESCRIPTIVE_SAMPLE = os.path.join(os.path.dirname(__file__), os.pardir, "sample_data", "Descriptive_PII_HII_Sample.csv")
+
+
+def test_tabular_sample_needs_no_model():
+    schema = profile_frame(pd.read_csv(SAMPLE))
+    assert schema["engine"] == "Tabular Data"
+    assert not [name for name, p in schema["columns"].items() if p["route"] == "ner"]
+    assert schema["columns"]["maiden_name"]["route"] == "skip"
+
+
+def test_tabular_sample_output_unchanged_by_profile():
+    df = pd.read_csv(SAMPLE)
+    schema = profile_frame(df)
+    pii, hii, scores = detect_chunk(df, "Tabular Data", schema=schema)
+    plain_pii, plain_hii, plain_scores = detect_chunk(df, "Tabular Data")
+    pdt.assert_frame_equal(pii, plain_pii)
+    pdt.assert_frame_equal(hii, plain_hii)
+    pdt.assert_series_equal(scores, plain_scores)
+
+
+def test_unlisted_name_column_is_rule_name():
+    df = pd.DataFrame({"maiden_name": [f"Name{i}" for i in range(50)], "notes": ["ok"] * 50})
+    profile = profile_frame(df)["columns"]["maiden_name"]
+    assert (profile["route"], profile["type"]) == ("rule", "NAME")
+
+
+def test_name_column_kept_without_fname_lname():
+    df = pd.DataFrame({"email": [f"user{i}@example.com" for i in range(50)],
+                       "customer_name": [f"Name{i}" for i in range(50)]})
+    schema = profile_frame(df)
+    assert schema["engine"] == "Tabular Data"
+    assert (schema["columns"]["customer_name"]["route"], schema["columns"]["customer_name"]["type"]) == ("rule", "NAME")
+
+
+def test_capitalised_columns_not_called_names_are_not_names():
+    schema = profile_frame(pd.read_csv(DESCRIPTIVE_SAMPLE))
+    assert schema["columns"]["hobby"]["type"] != "NAME"
+    assert (schema["columns"]["name"]["route"], schema["columns"]["name"]["type"]) == ("rule", "NAME")
+    df = pd.DataFrame({"department": [f"Sales{i}" for i in range(50)], "email": ["a@example.com"] * 50})
+    assert profile_frame(df)["columns"]["department"]["route"] == "skip"
+
+
+def test_descriptive_free_text_columns_scanned_with_patterns():
+    schema = profile_frame(pd.read_csv(DESCRIPTIVE_SAMPLE))
+    routes = routed_columns(schema, "Descriptive Data")
+    assert schema["text_column"] == "text" and "text" not in routes
+    assert routes["prompt"]["route"] == "regex"
+    assert not [name for name, p in routes.items() if p["route"] == "ner"]
@@ -0,0 +1,28 @@
+import pandas as pd
+import pandas.testing as pdt
+
+from profiling import profile_frame
+from redaction import iter_redacted_chunks
+from streaming import detect_chunk
+
+
+def test_redaction_from_stored_spans_matches_detecting_again(tmp_path):
+    df = pd.DataFrame({
+        "text": [f"Write to user{i}@example.com or call 555-010-{i:04d} today please." for i in range(30)],
+        "notes": [None if i % 4 == 0 else f"card 4111 1111 1111 1111, ssn 123-45-{i:04d}" for i in range(30)],
+    })
+    path = tmp_path / "source.csv"
+    df.to_csv(path, index=False)
+    schema = profile_frame(df)
+    records = []
+    for chunk in pd.read_csv(path, chunksize=7):
+        detect_chunk(chunk, "Descriptive Data", schema=schema,
+                     on_spans=lambda column, row_ids, spans: records.append(spans.records(row_ids, column)))
+    spans = pd.concat(records, ignore_index=True).sort_values(["row", "start"], kind="stable", ignore_index=True)
+    assert set(spans["column"]) == {"text", "notes"}
+
+    types = ["EMAIL", "PHONE", "ID"]
+    stored = pd.concat(iter_redacted_chunks(path, "Descriptive Data", types, schema=schema, spans=spans, chunksize=5))
+    detected = pd.concat(iter_redacted_chunks(path, "Descriptive Data", types, schema=schema, chunksize=5))
+    pdt.assert_frame_equal(stored, detected)
+    assert "[REDACTED]" in stored["text"].iloc[0] and "example.com" not in stored["text"].iloc[0]
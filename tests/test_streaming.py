@@ -0,0 +1,18 @@
+import pandas as pd
+
+from profiling import profile_frame
+from streaming import detect_chunk
+
+
+def test_descriptive_routed_health_columns_are_hii():
+    df = pd.DataFrame({
+        "text": [f"Patient {i} was seen on Monday and is doing well today." for i in range(20)],
+        "medical_conditions": ["Asthma", "Diabetes"] * 10,
+        "blood_type": ["O+", "AB-"] * 10,
+    })
+    schema = profile_frame(df)
+    pii, hii, scores = detect_chunk(df, "Descriptive Data", schema=schema)
+    assert hii["Type"].value_counts().to_dict() == {"MEDICAL_CONDITIONS": 20, "BLOOD_TYPE": 20}
+    assert not pii["Type"].isin(["MEDICAL_CONDITIONS", "BLOOD_TYPE"]).any()
+    # MEDICAL_CONDITIONS scores 4 and BLOOD_TYPE 1 on every row
+    assert (scores >= 5).all()
@@ -0,0 +1,170 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+UPLOAD_DB = "tmp/uploads.db"
+LEGACY_METADATA_FILE = "uploaded_files.json"
+UPLOAD_TTL_SECONDS = 4 * 60 * 60
+SWEEP_INTERVAL_SECONDS = 10 * 60
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS uploads (
+    filename     TEXT PRIMARY KEY,
+    uploaded_at  REAL NOT NULL,
+    content_hash TEXT,
+    size_bytes   INTEGER,
+    row_count    INTEGER,
+    scan_status  TEXT NOT NULL DEFAULT 'uploaded'
+);
+CREATE INDEX IF NOT EXISTS idx_uploads_uploaded_at ON uploads (uploaded_at);
+CREATE INDEX IF NOT EXISTS idx_uploads_content_hash ON uploads (content_hash);
+"""
+
+COLUMNS = ("filename", "uploaded_at", "content_hash", "size_bytes", "row_count", "scan_status")
+
+
+class SQLiteStore:
+    """Base for stores in one SQLite file (WAL), safe to share between sessions, threads and processes."""
+
+    schema = ""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(self.schema)
+
+    def _connect(self):
+        # sqlite3 connections must stay on the thread that opened them, so keep one per thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+
+class UploadStore(SQLiteStore):
+    """Upload metadata, one row per file in the upload directory."""
+
+    schema = SCHEMA
+
+    def __init__(self, path=UPLOAD_DB):
+        super().__init__(path)
+
+    def record_upload(self, filename, content_hash=None, size_bytes=None, row_count=None, uploaded_at=None):
+        """Inserts or refreshes the metadata row for an uploaded file."""
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO uploads (filename, uploaded_at, content_hash, size_bytes, row_count) "
+                "VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (filename) DO UPDATE SET uploaded_at = excluded.uploaded_at, "
+                "content_hash = excluded.content_hash, size_bytes = excluded.size_bytes, "
+                "row_count = COALESCE(excluded.row_count, uploads.row_count)",
+                (filename, time.time() if uploaded_at is None else uploaded_at, content_hash, size_bytes, row_count),
+            )
+
+    def update(self, filename, **fields):
+        """Sets row_count and/or scan_status for filename."""
+        fields = {k: v for k, v in fields.items() if k in ("row_count", "scan_status")}
+        if not fields:
+            return
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._connect() as conn:
+            conn.execute(f"UPDATE uploads SET {assignments} WHERE filename = ?", (*fields.values(), filename))
+
+    def get(self, filename):
+        row = self._connect().execute("SELECT * FROM uploads WHERE filename = ?", (filename,)).fetchone()
+        return dict(row) if row else None
+
+    def find_by_hash(self, content_hash):
+        """Returns the most recent upload with this content, or None."""
+        row = self._connect().execute(
+            "SELECT * FROM uploads WHERE content_hash = ? ORDER BY uploaded_at DESC LIMIT 1", (content_hash,)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def sweep(self, upload_dir, ttl_seconds=UPLOAD_TTL_SECONDS):
+        """Deletes uploads older than ttl_seconds from disk and from the store; returns how many expired."""
+        cutoff = time.time() - ttl_seconds
+        conn = self._connect()
+        expired = [row["filename"] for row in
+                   conn.execute("SELECT filename FROM uploads WHERE uploaded_at < ?", (cutoff,))]
+        for filename in expired:
+            try:
+                os.remove(os.path.join(upload_dir, filename))
+            except FileNotFoundError:
+                pass
+        with conn:
+            conn.execute("DELETE FROM uploads WHERE uploaded_at < ?", (cutoff,))
+        return len(expired)
+
+    def import_legacy(self, metadata_file=LEGACY_METADATA_FILE):
+        """Moves entries from the old uploaded_files.json into the store, once."""
+        if not os.path.exists(metadata_file):
+            return 0
+        try:
+            with open(metadata_file) as f:
+                uploads = json.load(f)
+        except ValueError:
+            uploads = {}
+        for filename, meta in uploads.items():
+            self.record_upload(filename, uploaded_at=meta.get("timestamp"))
+        os.replace(metadata_file, f"{metadata_file}.imported")
+        return len(uploads)
+
+
+class UploadSweeper:
+    """Daemon thread that runs UploadStore.sweep every interval seconds.
+
+    Each pass also removes the job directories and redacted copies that outlived the same TTL.
+    """
+
+    def __init__(self, store, upload_dir, interval=SWEEP_INTERVAL_SECONDS, ttl_seconds=UPLOAD_TTL_SECONDS):
+        self.store = store
+        self.upload_dir = upload_dir
+        self.interval = interval
+        self.ttl_seconds = ttl_seconds
+        self.last_sweep = None
+        self.last_removed = 0
+        self.last_removed_jobs = 0
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        from jobs import sweep_jobs
+
+        while True:
+            try:
+                self.last_removed = self.store.sweep(self.upload_dir, self.ttl_seconds)
+                self.last_sweep = time.time()
+            except sqlite3.Error:
+                pass
+            try:
+                self.last_removed_jobs = sweep_jobs(self.ttl_seconds)
+            except OSError:
+                pass
+            time.sleep(self.interval)
+
+
+_store = None
+_sweeper = None
+_lock = threading.Lock()
+
+
+def get_upload_store(upload_dir, path=UPLOAD_DB):
+    """Returns the process-wide UploadStore, starting its sweeper on first use."""
+    global _store, _sweeper
+    if _store is None:
+        with _lock:
+            if _store is None:
+                store = UploadStore(path)
+                store.import_legacy()
+                _sweeper = UploadSweeper(store, upload_dir)
+                _store = store
+    return _store